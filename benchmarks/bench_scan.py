@@ -0,0 +1,237 @@
+"""
+Headless benchmarks of the acquisition loop of the custom TA scan (myDAQScanAcquisition)
+
+The scans are run without the dashboard, with the in-process mock actuator and detectors of mock_plugins.py, over
+the given numbers of points, numbers of averages and detector dimensionalities. For each run the following are
+measured:
+
+* points/s (including the averages) and the per-point overhead: elapsed time per point minus the move and exposure
+  times of the mock instruments
+* the memory growth: Python memory (tracemalloc, numpy arrays included) still allocated after the run and the peak
+  during the run
+* the step timings of the scan profiler and the size of the h5 file
+
+Results are written as JSON so that versions can be compared, for instance:
+
+    python benchmarks/bench_scan.py --points 10 100 --averages 1 4 --dims 0D 1D 2D --output bench.json
+    python benchmarks/bench_scan.py --set ta_options/pipelined=true --output bench_pipelined.json
+"""
+import argparse
+import datetime
+import gc
+import importlib.metadata
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from qtpy import QtWidgets
+
+from pymodaq.control_modules.daq_move import DAQ_Move
+from pymodaq.control_modules.daq_viewer import DAQ_Viewer
+from pymodaq.utils.managers.modules_manager import ModulesManager
+from pymodaq.utils.scanner.scanner import Scanner
+from pymodaq.utils.h5modules.saving import H5Saver
+from pymodaq.utils.h5modules import module_saving
+from pymodaq.utils.parameter import Parameter
+
+from pymodaq_plugins_mydaqscan.extensions.mydaqscan import mydaqscan, myDAQScanAcquisition
+
+sys.path.insert(0, str(Path(__file__).parent))
+import mock_plugins  # noqa: E402
+
+
+class _ScanModule:
+    """Minimal stand-in of the DAQScan extension needed by the ScanSaver"""
+
+    def __init__(self, modules_manager: ModulesManager, settings: Parameter):
+        self.modules_manager = modules_manager
+        self.settings = settings
+        self.title = 'DAQScan'
+
+
+def _wait(condition, timeout=10.):
+    tstart = time.perf_counter()
+    while not condition() and time.perf_counter() - tstart < timeout:
+        QtWidgets.QApplication.processEvents()
+        time.sleep(0.01)
+    if not condition():
+        raise TimeoutError('The mock module could not be initialized')
+
+
+def make_modules(dims, move_time=0., exposure=0., shapes=None):
+    """Create and initialize the mock actuator and one mock detector per dimensionality"""
+    actuator = DAQ_Move(None, title='bench_actuator')
+    actuator.actuator = 'BenchMock'
+    actuator.update_settings()
+    actuator.settings.child('move_settings', 'move_time').setValue(move_time)
+    actuator.init_hardware()
+    _wait(lambda: actuator.initialized_state)
+
+    detectors = []
+    for dim in dims:
+        detector = DAQ_Viewer(None, title=f'bench_{dim}')
+        detector.daq_type = f'DAQ{dim}'
+        detector.detector = 'BenchMock'
+        detector.settings.child('detector_settings', 'exposure').setValue(exposure)
+        if shapes is not None and dim in shapes:
+            detector.settings.child('detector_settings', 'shape').setValue(shapes[dim])
+        detector.init_hardware()
+        _wait(lambda: detector.initialized_state)
+        detectors.append(detector)
+    return actuator, detectors
+
+
+def run_scan(actuator: DAQ_Move, detectors: list, n_points: int, naverage: int, settings_update: dict,
+             path: Path) -> myDAQScanAcquisition:
+    """Run synchronously a linear 1D scan of the actuator and return the acquisition object"""
+    modules_manager = ModulesManager(detectors, [actuator])
+    modules_manager.selected_actuators_name = [actuator.title]
+    modules_manager.selected_detectors_name = [detector.title for detector in detectors]
+
+    scanner = Scanner(actuators=modules_manager.actuators)
+    scanner.set_scan_type_and_subtypes('Scan1D', 'Linear')
+    scanner.get_scanner_sub_settings().child('start').setValue(0.)
+    scanner.get_scanner_sub_settings().child('stop').setValue(n_points - 1)
+    scanner.get_scanner_sub_settings().child('step').setValue(1.)
+    scanner.set_scan()
+
+    settings = Parameter.create(name='settings', type='group', children=mydaqscan.params)
+    settings.child('scan_options', 'scan_average').setValue(naverage)
+    for param_path, value in settings_update.items():
+        settings.child(*param_path.split('/')).setValue(value)
+    modules_manager.get_det_data_list()
+    for dim in ('0D', '1D'):
+        data_list = modules_manager.settings['data_dimensions', f'det_data_list{dim}']
+        data_list['selected'] = data_list['all_items']
+        settings.child('plot_options', f'plot_{dim.lower()}').setValue(data_list)
+
+    h5saver = H5Saver()
+    h5saver.settings.child('current_h5_file').setValue(str(path))
+    h5saver.init_file(update_h5=True, addhoc_file_path=path)
+    module_saver = module_saving.ScanSaver(_ScanModule(modules_manager, settings))
+    module_saver.h5saver = h5saver
+    module_saver.get_set_node(new=True)
+
+    acquisition = myDAQScanAcquisition(settings, scanner, h5saver.settings, modules_manager,
+                                       module_saver=module_saver)
+    acquisition.start_acquisition()
+    QtWidgets.QApplication.processEvents()
+    acquisition.h5saver.close_file()
+    h5saver.close_file()
+    return acquisition
+
+
+def benchmark(points, averages, dims, move_time=0., exposure=0., shapes=None, settings_update=None,
+              repeat=1) -> list:
+    """Run the scans of every combination and return the list of the results (dict)"""
+    mock_plugins.register()
+    results = []
+    tmp_dir = Path(tempfile.mkdtemp())
+    for dim in dims:
+        actuator, detectors = make_modules([dim], move_time, exposure, shapes)
+        try:
+            for n_points in points:
+                for naverage in averages:
+                    for ind_repeat in range(repeat):
+                        path = tmp_dir.joinpath(f'bench_{dim}_{n_points}_{naverage}_{ind_repeat}.h5')
+                        gc.collect()
+                        tracemalloc.start()
+                        memory_start = tracemalloc.get_traced_memory()[0]
+                        tstart = time.perf_counter()
+                        acquisition = run_scan(actuator, detectors, n_points, naverage, settings_update or {},
+                                               path)
+                        elapsed = time.perf_counter() - tstart
+                        summary = acquisition._profiler.summary()
+                        dead_time = acquisition._profiler.dead_time_fraction()
+                        del acquisition
+                        gc.collect()
+                        memory_end, memory_peak = tracemalloc.get_traced_memory()
+                        tracemalloc.stop()
+
+                        n_total = n_points * naverage
+                        results.append(dict(
+                            dim=dim, n_points=n_points, naverage=naverage, repeat=ind_repeat,
+                            elapsed_s=elapsed, points_per_s=n_total / elapsed,
+                            overhead_per_point_ms=(elapsed / n_total - move_time / 1000 - exposure / 1000) * 1000,
+                            memory_growth_bytes=memory_end - memory_start,
+                            memory_peak_bytes=memory_peak - memory_start,
+                            file_size_bytes=path.stat().st_size,
+                            dead_time_fraction=dead_time,
+                            step_timings_ms={phase: dict(mean=mean * 1000, p95=p95 * 1000, max=max_ * 1000)
+                                             for phase, (mean, p95, max_) in summary.items()}))
+                        print(f"{dim} {n_points:6d} points x {naverage:3d} averages: "
+                              f"{results[-1]['points_per_s']:8.1f} points/s, "
+                              f"overhead {results[-1]['overhead_per_point_ms']:6.2f} ms/point, "
+                              f"memory growth {results[-1]['memory_growth_bytes'] / 1024:8.1f} kB")
+        finally:
+            actuator.quit_fun()
+            for detector in detectors:
+                detector.quit_fun()
+            # let the modules stop their hardware threads before the next ones (or the end of the application)
+            tstart = time.perf_counter()
+            while time.perf_counter() - tstart < 1.:
+                QtWidgets.QApplication.processEvents()
+                time.sleep(0.01)
+    return results
+
+
+def _get_version(package: str):
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _parse_value(value: str):
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--points', type=int, nargs='+', default=[10, 100],
+                        help='numbers of points of the scans')
+    parser.add_argument('--averages', type=int, nargs='+', default=[1, 4], help='numbers of averages')
+    parser.add_argument('--dims', nargs='+', default=['0D', '1D', '2D'], choices=['0D', '1D', '2D'],
+                        help='dimensionalities of the mock detector')
+    parser.add_argument('--shape', action='append', default=[],
+                        help='shape of the data of a detector, for instance 1D=2048 or 2D=512x512')
+    parser.add_argument('--move-time', type=float, default=0., help='move time of the mock actuator in ms')
+    parser.add_argument('--exposure', type=float, default=0., help='exposure of the mock detectors in ms')
+    parser.add_argument('--set', action='append', default=[], dest='settings',
+                        help='scan setting to change, for instance ta_options/pipelined=true')
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs of each combination')
+    parser.add_argument('--output', default='bench_scan.json', help='path of the JSON file of the results')
+    args = parser.parse_args(argv)
+
+    settings_update = dict([(setting.split('=', 1)[0], _parse_value(setting.split('=', 1)[1]))
+                            for setting in args.settings])
+    shapes = dict([shape.split('=', 1) for shape in args.shape])
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    results = benchmark(args.points, args.averages, args.dims, args.move_time, args.exposure, shapes,
+                        settings_update, args.repeat)
+
+    output = dict(
+        metadata=dict(date=datetime.datetime.now().isoformat(timespec='seconds'),
+                      package_version=_get_version('pymodaq_plugins_mydaqscan'),
+                      pymodaq_version=_get_version('pymodaq'), python=platform.python_version(),
+                      platform=platform.platform(), move_time_ms=args.move_time, exposure_ms=args.exposure,
+                      shapes=shapes, settings=settings_update),
+        results=results)
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f'Results written in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
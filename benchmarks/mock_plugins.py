@@ -0,0 +1,189 @@
+"""
+In-process mock instrument plugins used by the scan benchmarks
+
+They follow the package templates (daq_move_Template, daq_xDviewer_Template) but their fake hardware only waits a
+configurable time and returns precomputed data, so that the benchmarks measure the overhead of the acquisition loop.
+`register` makes them available to DAQ_Move and DAQ_Viewer without installing them as plugins.
+"""
+import time
+import types
+
+import numpy as np
+from pymodaq.control_modules.move_utility_classes import DAQ_Move_base, comon_parameters_fun, DataActuatorType,\
+    DataActuator
+from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters
+from pymodaq.utils.data import DataFromPlugins, DataToExport
+from pymodaq.utils.parameter import Parameter
+
+
+class MockStage:
+    """Fake actuator reaching its target after a fixed move time"""
+
+    def __init__(self):
+        self.position = 0.
+        self.move_time = 0.
+
+    def move_abs(self, value: float):
+        if self.move_time > 0:
+            time.sleep(self.move_time)
+        self.position = value
+
+
+class MockCamera:
+    """Fake detector returning a precomputed frame (scaled by a random factor) after a fixed exposure time"""
+
+    def __init__(self, shape=(1,)):
+        self.exposure = 0.
+        self.frame = np.random.random_sample(shape)
+
+    def grab(self) -> np.ndarray:
+        if self.exposure > 0:
+            time.sleep(self.exposure)
+        return self.frame * (1 + 1e-3 * np.random.standard_normal())
+
+
+class DAQ_Move_BenchMock(DAQ_Move_base):
+    """ Mock actuator of the benchmarks, its move time is set with the move_time parameter (ms)"""
+    _controller_units = 'mm'
+    is_multiaxes = False
+    _axis_names = ['Axis1']
+    _epsilon = 1e-6
+    data_actuator_type = DataActuatorType['DataActuator']
+
+    params = [{'title': 'Move time (ms):', 'name': 'move_time', 'type': 'float', 'value': 0., 'min': 0.},
+              ] + comon_parameters_fun(is_multiaxes, axis_names=_axis_names, epsilon=_epsilon)
+
+    def ini_attributes(self):
+        self.controller: MockStage = None
+
+    def get_actuator_value(self):
+        """Get the current value from the hardware with scaling conversion."""
+        pos = DataActuator(data=self.controller.position)
+        pos = self.get_position_with_scaling(pos)
+        return pos
+
+    def close(self):
+        """Terminate the communication protocol"""
+        pass
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings"""
+        if param.name() == 'move_time':
+            self.controller.move_time = param.value() / 1000
+
+    def ini_stage(self, controller=None):
+        """Actuator communication initialization"""
+        self.controller = self.ini_stage_init(old_controller=controller, new_controller=MockStage())
+        self.controller.move_time = self.settings['move_time'] / 1000
+        return 'Mock stage of the benchmarks', True
+
+    def move_abs(self, value: DataActuator):
+        """ Move the actuator to the absolute target defined by value"""
+        value = self.check_bound(value)
+        self.target_value = value
+        value = self.set_position_with_scaling(value)
+        self.controller.move_abs(value.value())
+
+    def move_rel(self, value: DataActuator):
+        """ Move the actuator to the relative target actuator value defined by value"""
+        value = self.check_bound(self.current_position + value) - self.current_position
+        self.target_value = value + self.current_position
+        value = self.set_position_relative_with_scaling(value)
+        self.controller.move_abs(self.controller.position + value.value())
+
+    def move_home(self):
+        """Call the reference method of the controller"""
+        self.controller.move_abs(0.)
+
+    def poll_moving(self):
+        """The moves are synchronous: emit move_done without waiting for the poll timer"""
+        self.move_done(self.get_actuator_value())
+
+    def stop_motion(self):
+        """Stop the actuator and emits move_done signal"""
+        self.move_done()
+
+
+class _DAQ_Viewer_BenchMock(DAQ_Viewer_base):
+    """ Mock detector of the benchmarks, its exposure is set with the exposure parameter (ms)"""
+    dim = 'Data0D'
+    params = comon_parameters + [
+        {'title': 'Exposure (ms):', 'name': 'exposure', 'type': 'float', 'value': 0., 'min': 0.},
+        {'title': 'Shape:', 'name': 'shape', 'type': 'str', 'value': '1',
+         'tip': 'Shape of the data, for instance 1024 or 256x256'},
+    ]
+
+    def ini_attributes(self):
+        self.controller: MockCamera = None
+
+    def _get_shape(self):
+        return tuple(int(size) for size in self.settings['shape'].split('x'))
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings"""
+        if param.name() == 'exposure':
+            self.controller.exposure = param.value() / 1000
+        elif param.name() == 'shape':
+            self.controller.frame = np.random.random_sample(self._get_shape())
+
+    def ini_detector(self, controller=None):
+        """Detector communication initialization"""
+        self.ini_detector_init(old_controller=controller, new_controller=MockCamera(self._get_shape()))
+        self.controller.exposure = self.settings['exposure'] / 1000
+        return 'Mock detector of the benchmarks', True
+
+    def close(self):
+        """Terminate the communication protocol"""
+        pass
+
+    def grab_data(self, Naverage=1, **kwargs):
+        """Start a grab from the detector"""
+        self.dte_signal.emit(DataToExport('BenchMock', data=[DataFromPlugins(name='BenchMock',
+                                                                             data=[self.controller.grab()],
+                                                                             dim=self.dim, labels=['mock'])]))
+
+    def stop(self):
+        """Stop the current grab hardware wise if necessary"""
+        return ''
+
+
+class DAQ_0DViewer_BenchMock(_DAQ_Viewer_BenchMock):
+    dim = 'Data0D'
+
+
+class DAQ_1DViewer_BenchMock(_DAQ_Viewer_BenchMock):
+    dim = 'Data1D'
+    params = comon_parameters + [child if child['name'] != 'shape' else dict(child, value='1024')
+                                 for child in _DAQ_Viewer_BenchMock.params[len(comon_parameters):]]
+
+
+class DAQ_2DViewer_BenchMock(_DAQ_Viewer_BenchMock):
+    dim = 'Data2D'
+    params = comon_parameters + [child if child['name'] != 'shape' else dict(child, value='256x256')
+                                 for child in _DAQ_Viewer_BenchMock.params[len(comon_parameters):]]
+
+
+def _plugin_module(name: str, class_: type) -> types.ModuleType:
+    """Fake plugins module holding a fake plugin module holding the plugin class, as looked up by PyMoDAQ"""
+    module = types.ModuleType(name)
+    setattr(module, class_.__name__, class_)
+    parent_module = types.ModuleType('mock_plugins')
+    parent_module.__package__ = 'pymodaq_plugins_mydaqscan'  # where the plugin config is looked for
+    setattr(parent_module, name, module)
+    return parent_module
+
+
+def register():
+    """Add the mock plugins to the lists of plugins known by DAQ_Move and DAQ_Viewer (under the BenchMock name)"""
+    from pymodaq.control_modules import daq_move
+    from pymodaq.control_modules.utils import DET_TYPES
+
+    if 'BenchMock' not in daq_move.ACTUATOR_TYPES:
+        daq_move.DAQ_Move_Actuators.append({'name': 'BenchMock', 'type': 'daq_move',
+                                            'module': _plugin_module('daq_move_BenchMock', DAQ_Move_BenchMock)})
+        daq_move.ACTUATOR_TYPES.append('BenchMock')
+    for dim, class_ in zip(('0D', '1D', '2D'), (DAQ_0DViewer_BenchMock, DAQ_1DViewer_BenchMock,
+                                                DAQ_2DViewer_BenchMock)):
+        if 'BenchMock' not in [det['name'] for det in DET_TYPES[f'DAQ{dim}']]:
+            DET_TYPES[f'DAQ{dim}'].append({'name': 'BenchMock', 'type': f'daq_{dim}viewer',
+                                           'module': _plugin_module(f'daq_{dim}viewer_BenchMock', class_)})
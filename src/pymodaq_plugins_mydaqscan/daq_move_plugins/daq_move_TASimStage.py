@@ -0,0 +1,116 @@
+from pymodaq.control_modules.move_utility_classes import DAQ_Move_base, comon_parameters_fun, main, DataActuatorType,\
+    DataActuator  # common set of parameters for all actuators
+from pymodaq.utils.daq_utils import ThreadCommand # object used to send info back to the main thread
+from pymodaq.utils.parameter import Parameter
+
+from pymodaq_plugins_mydaqscan.hardware.ta_simulator import SimulatedDelayLine, DELAY_LINE
+
+
+class DAQ_Move_TASimStage(DAQ_Move_base):
+    """ Simulated delay line moving at constant velocity
+
+    The delay line is shared with the DAQ_1DViewer_TASimSpectrometer plugin so that the simulated transient
+    absorption signal depends on its position, even while it is moving (fly scans).
+    """
+    _controller_units = 'mm'
+    is_multiaxes = False
+    _axis_names = ['Delay']
+    _epsilon = 0.0001
+    data_actuator_type = DataActuatorType['DataActuator']
+
+    params = [
+        {'title': 'Velocity (mm/s):', 'name': 'velocity', 'type': 'float', 'value': 10., 'min': 0.},
+        {'title': 'Readback noise (mm):', 'name': 'noise', 'type': 'float', 'value': 1e-5, 'min': 0.},
+                ] + comon_parameters_fun(is_multiaxes, axis_names=_axis_names, epsilon=_epsilon)
+
+    def ini_attributes(self):
+        self.controller: SimulatedDelayLine = None
+
+    def get_actuator_value(self):
+        """Get the current value from the hardware with scaling conversion.
+
+        Returns
+        -------
+        float: The position obtained after scaling conversion.
+        """
+        pos = DataActuator(data=self.controller.get_position())
+        pos = self.get_position_with_scaling(pos)
+        return pos
+
+    def close(self):
+        """Terminate the communication protocol"""
+        self.controller.stop()
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been changed by the user
+        """
+        if param.name() == 'velocity':
+            self.controller.velocity = param.value()
+        elif param.name() == 'noise':
+            self.controller.noise = param.value()
+
+    def ini_stage(self, controller=None):
+        """Actuator communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one actuator by controller (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.controller = self.ini_stage_init(old_controller=controller, new_controller=DELAY_LINE)
+        self.controller.velocity = self.settings['velocity']
+        self.controller.noise = self.settings['noise']
+
+        info = "Simulated delay line"
+        initialized = True
+        return info, initialized
+
+    def move_abs(self, value: DataActuator):
+        """ Move the actuator to the absolute target defined by value
+
+        Parameters
+        ----------
+        value: (float) value of the absolute target positioning
+        """
+
+        value = self.check_bound(value)  #if user checked bounds, the defined bounds are applied here
+        self.target_value = value
+        value = self.set_position_with_scaling(value)  # apply scaling if the user specified one
+        self.controller.move_abs(value.value())
+
+    def move_rel(self, value: DataActuator):
+        """ Move the actuator to the relative target actuator value defined by value
+
+        Parameters
+        ----------
+        value: (float) value of the relative target positioning
+        """
+        value = self.check_bound(self.current_position + value) - self.current_position
+        self.target_value = value + self.current_position
+        value = self.set_position_relative_with_scaling(value)
+        self.controller.move_abs(self.controller.target + value.value())
+
+    def move_home(self):
+        """Call the reference method of the controller"""
+        self.target_value = DataActuator(data=0.)
+        self.controller.move_abs(0.)
+
+    def stop_motion(self):
+        """Stop the actuator and emits move_done signal"""
+        self.controller.stop()
+        self.move_done()
+
+
+if __name__ == '__main__':
+    main(__file__)
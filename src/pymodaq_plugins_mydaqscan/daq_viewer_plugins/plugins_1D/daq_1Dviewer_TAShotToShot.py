@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+from pymodaq.utils.daq_utils import ThreadCommand
+from pymodaq.utils.data import DataFromPlugins, Axis, DataToExport
+from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
+from pymodaq.utils.parameter import Parameter
+
+from pymodaq_plugins_mydaqscan.hardware.ta_simulator import SimulatedTASpectrometer, DELAY_LINE
+from pymodaq_plugins_mydaqscan.processing.shot_to_shot import transient_signal
+
+
+class DAQ_1DViewer_TAShotToShot(DAQ_Viewer_base):
+    """ Shot-to-shot transient absorption from a block of chopped spectrometer shots
+
+    Each grab acquires a block of single shots (shots, pixels) with their chopper phase, pairs pumped and unpumped
+    shots and computes dOD (or dT/T) with outlier rejection, all as batched numpy operations (see
+    processing.shot_to_shot). The signal, its standard error and the fraction of rejected values are emitted in a
+    single DataToExport.
+
+    The shots are given by the simulated spectrometer (see DAQ_1DViewer_TASimSpectrometer), a real spectrometer
+    wrapper should only provide the same `grab_shots` method.
+    """
+    params = comon_parameters+[
+        {'title': 'Shots per grab:', 'name': 'nshots', 'type': 'int', 'value': 1000, 'min': 2},
+        {'title': 'Signal:', 'name': 'mode', 'type': 'list', 'limits': ['dOD', 'dT/T']},
+        {'title': 'Rejection threshold:', 'name': 'threshold', 'type': 'float', 'value': 5., 'min': 0.,
+         'tip': 'Outlier rejection threshold in robust standard deviations, 0 to disable'},
+        {'title': 'Simulation:', 'name': 'simulation', 'type': 'group', 'children': [
+            {'title': 'Rep. rate (Hz):', 'name': 'rep_rate', 'type': 'float', 'value': 1000., 'min': 1.},
+            {'title': 'Npixels:', 'name': 'npixels', 'type': 'int', 'value': 256, 'min': 2},
+            {'title': 'Outliers probability:', 'name': 'outliers', 'type': 'float', 'value': 0.01, 'min': 0.,
+             'max': 1.},
+            {'title': 'Time zero (mm):', 'name': 'time_zero', 'type': 'float', 'value': 0.},
+        ]},
+        ]
+
+    def ini_attributes(self):
+        self.controller: SimulatedTASpectrometer = None
+        self.x_axis = None
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been changed by the user
+        """
+        if param.name() == 'npixels':
+            self.controller = self._new_spectrometer()
+            self.x_axis = Axis(data=self.controller.wavelengths, label='Wavelength', units='nm', index=0)
+        elif param.name() == 'time_zero':
+            self.controller.time_zero = param.value()
+
+    def _new_spectrometer(self) -> SimulatedTASpectrometer:
+        return SimulatedTASpectrometer(DELAY_LINE, npixels=self.settings['simulation', 'npixels'],
+                                       time_zero=self.settings['simulation', 'time_zero'])
+
+    def ini_detector(self, controller=None):
+        """Detector communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one actuator/detector by controller
+            (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.ini_detector_init(old_controller=controller, new_controller=self._new_spectrometer())
+
+        self.x_axis = Axis(data=self.controller.wavelengths, label='Wavelength', units='nm', index=0)
+        self.dte_signal_temp.emit(self._get_dte(np.zeros_like(self.controller.wavelengths),
+                                                np.zeros_like(self.controller.wavelengths), 0.))
+
+        info = "Shot-to-shot transient absorption (simulated spectrometer)"
+        initialized = True
+        return info, initialized
+
+    def _get_dte(self, signal: np.ndarray, stderr: np.ndarray, rejected: float) -> DataToExport:
+        mode = self.settings['mode']
+        return DataToExport('TAShotToShot',
+                            data=[DataFromPlugins(name=mode, data=[signal], dim='Data1D', labels=[mode],
+                                                  axes=[self.x_axis]),
+                                  DataFromPlugins(name='Noise', data=[stderr], dim='Data1D',
+                                                  labels=[f'{mode} stderr'], axes=[self.x_axis]),
+                                  DataFromPlugins(name='Rejected', data=[np.array([rejected])], dim='Data0D',
+                                                  labels=['Rejected fraction'])])
+
+    def close(self):
+        """Terminate the communication protocol"""
+        pass
+
+    def grab_data(self, Naverage=1, **kwargs):
+        """Start a grab from the detector
+
+        Parameters
+        ----------
+        Naverage: int
+            Number of hardware averaging (if hardware averaging is possible, self.hardware_averaging should be set to
+            True in class preamble and you should code this implementation)
+        kwargs: dict
+            others optionals arguments
+        """
+        shots, pumped, timestamp = self.controller.grab_shots(self.settings['nshots'],
+                                                              self.settings['simulation', 'rep_rate'],
+                                                              self.settings['simulation', 'outliers'])
+        signal, stderr, rejected = transient_signal(shots, pumped, self.settings['mode'], self.settings['threshold'])
+        dte = self._get_dte(signal, stderr, rejected)
+        for dwa in dte:
+            dwa.timestamp = time.time() - (time.perf_counter() - timestamp)
+        self.dte_signal.emit(dte)
+
+    def stop(self):
+        """Stop the current grab hardware wise if necessary"""
+        return ''
+
+
+if __name__ == '__main__':
+    main(__file__)
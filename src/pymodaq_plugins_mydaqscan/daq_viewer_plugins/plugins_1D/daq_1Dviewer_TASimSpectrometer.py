@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+from pymodaq.utils.daq_utils import ThreadCommand
+from pymodaq.utils.data import DataFromPlugins, Axis, DataToExport
+from pymodaq.control_modules.viewer_utility_classes import DAQ_Viewer_base, comon_parameters, main
+from pymodaq.utils.parameter import Parameter
+
+from pymodaq_plugins_mydaqscan.hardware.ta_simulator import SimulatedTASpectrometer, DELAY_LINE
+from pymodaq_plugins_mydaqscan.hardware.ring_buffer import get_ring_buffer
+
+
+class DAQ_1DViewer_TASimSpectrometer(DAQ_Viewer_base):
+    """ Simulated transient absorption spectrometer
+
+    The signal is computed at the delay of the simulated delay line (see DAQ_Move_TASimStage) averaged over the
+    exposure. The timestamp of the middle of the exposure is sent along the data (as the `timestamp` attribute of the
+    DataFromPlugins) for fly scans.
+
+    If the ring buffer is enabled, the spectra are written in place in a preallocated ring buffer named after the
+    detector and only the frame sequence number is emitted (see hardware.ring_buffer).
+    """
+    params = comon_parameters+[
+        {'title': 'Exposure (ms):', 'name': 'exposure', 'type': 'float', 'value': 10., 'min': 0.},
+        {'title': 'Npixels:', 'name': 'npixels', 'type': 'int', 'value': 256, 'min': 2},
+        {'title': 'Noise (OD):', 'name': 'noise', 'type': 'float', 'value': 1e-4, 'min': 0.},
+        {'title': 'Time zero (mm):', 'name': 'time_zero', 'type': 'float', 'value': 0.},
+        {'title': 'Number of passes:', 'name': 'n_passes', 'type': 'int', 'value': 1, 'min': 1},
+        {'title': 'Ring buffer:', 'name': 'ring_buffer', 'type': 'bool', 'value': False},
+        {'title': 'Ring buffer slots:', 'name': 'nslots', 'type': 'int', 'value': 64, 'min': 2},
+        ]
+
+    def ini_attributes(self):
+        self.controller: SimulatedTASpectrometer = None
+        self.x_axis = None
+
+    def commit_settings(self, param: Parameter):
+        """Apply the consequences of a change of value in the detector settings
+
+        Parameters
+        ----------
+        param: Parameter
+            A given parameter (within detector_settings) whose value has been changed by the user
+        """
+        if param.name() == 'exposure':
+            self.controller.exposure = param.value() / 1000
+        elif param.name() in ['noise', 'time_zero', 'n_passes']:
+            setattr(self.controller, param.name(), param.value())
+        elif param.name() == 'npixels':
+            self.controller = self._new_spectrometer()
+            self.x_axis = Axis(data=self.controller.wavelengths, label='Wavelength', units='nm', index=0)
+
+    def _new_spectrometer(self) -> SimulatedTASpectrometer:
+        return SimulatedTASpectrometer(DELAY_LINE, npixels=self.settings['npixels'],
+                                       time_zero=self.settings['time_zero'], n_passes=self.settings['n_passes'],
+                                       exposure=self.settings['exposure'] / 1000, noise=self.settings['noise'])
+
+    def ini_detector(self, controller=None):
+        """Detector communication initialization
+
+        Parameters
+        ----------
+        controller: (object)
+            custom object of a PyMoDAQ plugin (Slave case). None if only one actuator/detector by controller
+            (Master case)
+
+        Returns
+        -------
+        info: str
+        initialized: bool
+            False if initialization failed otherwise True
+        """
+        self.ini_detector_init(old_controller=controller, new_controller=self._new_spectrometer())
+
+        self.x_axis = Axis(data=self.controller.wavelengths, label='Wavelength', units='nm', index=0)
+        self.dte_signal_temp.emit(DataToExport(name='TASim',
+                                               data=[DataFromPlugins(name='TASim',
+                                                                     data=[np.zeros_like(self.controller.wavelengths)],
+                                                                     dim='Data1D', labels=['dOD'],
+                                                                     axes=[self.x_axis])]))
+
+        info = "Simulated transient absorption spectrometer"
+        initialized = True
+        return info, initialized
+
+    def close(self):
+        """Terminate the communication protocol"""
+        pass
+
+    def grab_data(self, Naverage=1, **kwargs):
+        """Start a grab from the detector
+
+        Parameters
+        ----------
+        Naverage: int
+            Number of hardware averaging (if hardware averaging is possible, self.hardware_averaging should be set to
+            True in class preamble and you should code this implementation)
+        kwargs: dict
+            others optionals arguments
+        """
+        if self.settings['ring_buffer']:
+            buffer = get_ring_buffer(self._title, self.settings['nslots'], self.controller.wavelengths.shape,
+                                     overwrite=True)
+            slot = buffer.acquire_write(timeout=1.)
+            spectrum, timestamp = self.controller.grab(out=slot.data)
+            seq = buffer.commit(slot)
+            dfp = DataFromPlugins(name='Frame', data=[np.array([float(seq)])], dim='Data0D', labels=['Frame'],
+                                  ring_buffer=self._title)
+        else:
+            spectrum, timestamp = self.controller.grab()
+            dfp = DataFromPlugins(name='TASim', data=[spectrum], dim='Data1D', labels=['dOD'], axes=[self.x_axis])
+        dfp.timestamp = time.time() - (time.perf_counter() - timestamp)  # epoch, as the readbacks of actuators
+        self.dte_signal.emit(DataToExport('TASim', data=[dfp]))
+
+    def stop(self):
+        """Stop the current grab hardware wise if necessary"""
+        return ''
+
+
+if __name__ == '__main__':
+    main(__file__)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Exporter of custom TA scans into memory-mappable numpy arrays indexed by a JSON file
+
+Every array below the exported node (data, axes, measured positions, statistics, timings...) is written as a .npy
+file within a directory named after the JSON index, streaming blocks of the first dimension so that the h5 file is
+never loaded at once. The index describes each array (h5 path, shape, dtype, attributes) and sorts them as:
+
+* nav_axes: the setpoint navigation axes of the scan (and the Average axis)
+* measured_axes: the readback of the actuators at each step of each average (measured_ arrays) and their deviation
+* datasets: the data arrays with their signal axes
+
+Arrays are then opened without reading them with `np.load(path, mmap_mode='r')`.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+
+from pymodaq.utils.h5modules.backends import H5Backend, Node
+from pymodaq.utils.h5modules.exporter import ExporterFactory, H5Exporter
+from pymodaq.utils.logger import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+INDEX_FORMAT = 'pymodaq_ta_npy'
+INDEX_VERSION = 1
+BLOCK_BYTES = 64 * 1024 ** 2  # size of the blocks copied from the h5 file to the npy files
+
+
+def _to_json(value):
+    """Convert an attribute value to a JSON compatible one, None if not possible"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    elif isinstance(value, np.ndarray):
+        value = value.tolist()
+    elif isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    elif isinstance(value, (list, tuple)):
+        value = [_to_json(val) for val in value]
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_attrs(node: Node) -> dict:
+    attrs = dict([])
+    for key in node.attrs.attrs_name:
+        if key in ('settings', 'CLASS', 'VERSION', 'TITLE'):  # xml settings are not needed for the analysis
+            continue
+        value = _to_json(node.attrs[key])
+        if value is not None:
+            attrs[key] = value
+    return attrs
+
+
+def stream_to_npy(array, path: Path, block_bytes: int = BLOCK_BYTES):
+    """Copy a h5 array (tables or h5py node) into a .npy file block by block along its first dimension"""
+    shape = tuple(array.shape)
+    dtype = np.dtype(array.dtype)
+    npy = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    if len(shape) == 0:
+        npy[...] = array[()]
+    elif npy.size != 0:
+        row_bytes = max(int(np.prod(shape[1:])) * dtype.itemsize, 1)
+        nrows = max(block_bytes // row_bytes, 1)
+        for start in range(0, shape[0], nrows):
+            npy[start:start + nrows] = array[start:start + nrows]
+    npy.flush()
+    del npy
+
+
+def export_node(node: Node, filename: Union[str, Path], block_bytes: int = BLOCK_BYTES) -> dict:
+    """Export all the arrays below a node into .npy files and write their JSON index
+
+    Parameters
+    ----------
+    node: Node
+        the node to be exported, usually a scan group (/RawData/Scan000) or the whole RawData group
+    filename: str or Path
+        path of the JSON index, the arrays are written in the directory of the same name (without the extension)
+    block_bytes: int
+        size of the blocks copied at once
+
+    Returns
+    -------
+    dict: the index
+    """
+    filename = Path(filename).with_suffix('.json')
+    array_dir = filename.with_suffix('')
+    array_dir.mkdir(parents=True, exist_ok=True)
+    h5backend: H5Backend = node.to_h5_backend()
+
+    index = dict(format=INDEX_FORMAT, version=INDEX_VERSION, source=str(Path(h5backend.filename).resolve()), node=node.path,
+                 attrs=_get_attrs(node), nav_axes=[], measured_axes=[], datasets=[], arrays=[])
+    datasets: Dict[str, dict] = dict([])
+    signal_axes: Dict[str, list] = dict([])
+    for child in h5backend.walk_nodes(node):
+        if 'ARRAY' not in child.attrs['CLASS'] or child.attrs['CLASS'] == 'VLARRAY':
+            continue
+        if np.dtype(child.node.dtype).kind not in 'biufc':
+            continue
+        file = f'{len(index["arrays"]):04d}_{child.name}.npy'
+        stream_to_npy(child.node, array_dir.joinpath(file), block_bytes)
+        entry = dict(path=child.path, file=f'{array_dir.name}/{file}', shape=[int(size) for size in child.node.shape],
+                     dtype=np.dtype(child.node.dtype).str, title=child.title, attrs=_get_attrs(child))
+        index['arrays'].append(entry)
+
+        parent = child.parent_node
+        data_type = child.attrs['data_type'] if 'data_type' in child.attrs.attrs_name else ''
+        if parent.name == 'NavAxes':
+            index['nav_axes'].append(entry)
+        elif parent.name == 'MeasuredPositions':
+            index['measured_axes'].append(entry)
+        elif data_type == 'axis':
+            signal_axes.setdefault(parent.path, []).append(entry)
+        elif data_type in ('data', 'bkg'):
+            datasets[child.path] = dict(entry, group=parent.path)
+        logger.debug(f'{child.path} exported in {file}')
+
+    for dataset in datasets.values():
+        dataset['axes'] = signal_axes.get(dataset.pop('group'), [])
+        index['datasets'].append(dataset)
+    with open(filename, 'w') as f:
+        json.dump(index, f, indent=1)
+    return index
+
+
+def export_file(h5_path: Union[str, Path], filename: Union[str, Path], node_path: str = '/RawData',
+                block_bytes: int = BLOCK_BYTES) -> dict:
+    """Export a node of a h5 file given its path, see export_node"""
+    h5backend = H5Backend()
+    h5backend.open_file(str(h5_path), 'r')
+    try:
+        return export_node(h5backend.get_node(node_path), filename, block_bytes)
+    finally:
+        h5backend.close_file()
+
+
+@ExporterFactory.register_exporter()
+class H5TANpyExporter(H5Exporter):
+    """ Exporter of a node and its children as memory-mappable npy arrays with a JSON index"""
+
+    FORMAT_DESCRIPTION = "TA scan as numpy arrays with a JSON index"
+    FORMAT_EXTENSION = "json"
+
+    def export_data(self, node: Node, filename: str) -> None:
+        export_node(node, filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export a custom TA scan into numpy arrays with a JSON index')
+    parser.add_argument('h5_file', help='the h5 file saved by the custom TA scan')
+    parser.add_argument('index', help='path of the JSON index, arrays are written in the directory of the same name')
+    parser.add_argument('--node', default='/RawData', help='path of the node to be exported, for instance'
+                                                           ' /RawData/Scan000')
+    args = parser.parse_args(argv)
+    index = export_file(args.h5_file, args.index, args.node)
+    print(f"{len(index['arrays'])} arrays exported, index written in {Path(args.index).with_suffix('.json')}")
+
+
+if __name__ == '__main__':
+    main()
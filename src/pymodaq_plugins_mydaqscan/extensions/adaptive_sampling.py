@@ -0,0 +1,136 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+
+class AdaptiveSampler1D:
+    """Choose the next position of a 1D scan from the values already measured
+
+    Each measured value may be a scalar (0D channel) or a vector (1D channel such as a spectrum). The candidates are:
+
+    * the middle of each interval between two measured positions, with a loss made of the interval length in
+      normalized coordinates plus a curvature term (area of the triangles formed with the neighbouring points)
+    * each measured position itself (to measure it again), with a loss given by the standard error of its mean. The
+      standard error is estimated from the repeated measurements of this position or, if there are none, from the
+      noise level estimated on the whole trace (second differences)
+
+    The candidate with the largest loss is asked next. Positions and values are normalized by the scan range and the
+    peak-to-peak amplitude of the trace so that the losses are dimensionless.
+
+    Parameters
+    ----------
+    bounds: tuple of float
+        (start, stop) of the scan
+    max_points: int
+        point budget: maximum number of measurements
+    loss_goal: float
+        the sampling is done when the largest loss is below this value
+    curvature_weight: float
+        weight of the curvature term in the interval losses
+    uncertainty_weight: float
+        weight of the standard error in the position losses, 0 to never measure a position again
+    min_step: float
+        intervals smaller than this are never split
+    """
+
+    def __init__(self, bounds: Tuple[float, float], max_points: int = 100, loss_goal: float = 0.01,
+                 curvature_weight: float = 1., uncertainty_weight: float = 1., min_step: float = 0.):
+        self.bounds = (min(bounds), max(bounds))
+        self.max_points = max_points
+        self.loss_goal = loss_goal
+        self.curvature_weight = curvature_weight
+        self.uncertainty_weight = uncertainty_weight
+        self.min_step = min_step
+
+        self._x = []
+        self._y = []
+
+    @property
+    def npoints(self) -> int:
+        """Number of measurements told to the sampler"""
+        return len(self._x)
+
+    def tell(self, x: float, y: Union[float, np.ndarray]):
+        """Add a measured value at position x"""
+        self._x.append(float(x))
+        self._y.append(np.atleast_1d(np.asarray(y, dtype=float)).ravel())
+
+    def get_statistics(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Get the unique positions with the mean, the standard error and the number of measurements at each of them
+
+        Returns
+        -------
+        x: ndarray of shape (N,)
+        mean: ndarray of shape (N, M)
+        stderr: ndarray of shape (N, M), NaN where a single measurement has been made
+        count: ndarray of shape (N,)
+        """
+        x, inverse, count = np.unique(np.asarray(self._x), return_inverse=True, return_counts=True)
+        y = np.asarray(self._y)
+        mean = np.zeros((len(x), y.shape[1]))
+        sq = np.zeros_like(mean)
+        np.add.at(mean, inverse, y)
+        np.add.at(sq, inverse, y ** 2)
+        mean /= count[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (sq / count[:, None] - mean ** 2) * count[:, None] / (count[:, None] - 1)
+            stderr = np.sqrt(np.clip(var, 0, None) / count[:, None])
+        return x, mean, stderr, count
+
+    def _losses(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        x, mean, stderr, count = self.get_statistics()
+        scale_x = self.bounds[1] - self.bounds[0]
+        scale_y = np.ptp(mean, axis=0)
+        scale_y[scale_y == 0] = 1.
+        xn = (x - self.bounds[0]) / scale_x
+        yn = mean / scale_y
+
+        dx = np.diff(xn)
+        dy = np.diff(yn, axis=0)
+        interval_losses = np.sqrt(dx ** 2 + np.mean(dy ** 2, axis=1))
+
+        if len(x) > 2:
+            # area of the triangle made by each point and its two neighbours, averaged over the channels
+            areas = 0.5 * np.abs((xn[1:-1] - xn[:-2])[:, None] * (yn[2:] - yn[:-2]) -
+                                 (xn[2:] - xn[:-2])[:, None] * (yn[1:-1] - yn[:-2]))
+            areas = np.sqrt(np.mean(areas ** 2, axis=1))
+            curvature = np.zeros_like(interval_losses)
+            curvature[:-1] = np.maximum(curvature[:-1], areas)
+            curvature[1:] = np.maximum(curvature[1:], areas)
+            interval_losses += self.curvature_weight * np.sqrt(curvature)
+
+            noise = np.median(np.abs(np.diff(yn, 2, axis=0)), axis=0) / np.sqrt(6)
+        else:
+            noise = np.zeros((yn.shape[1],))
+        interval_losses[dx * scale_x < self.min_step] = 0.
+
+        stderr_n = stderr / scale_y
+        single = count == 1
+        stderr_n[single] = noise
+        stderr_n[~single] = np.where(np.isnan(stderr_n[~single]), noise, stderr_n[~single])
+        point_losses = self.uncertainty_weight * np.sqrt(np.mean(stderr_n ** 2, axis=1))
+        return x, interval_losses, point_losses
+
+    def loss(self) -> float:
+        """Largest loss among all candidates (inf if less than two positions have been measured)"""
+        if len(np.unique(self._x)) < 2:
+            return np.inf
+        _, interval_losses, point_losses = self._losses()
+        return float(max(np.max(interval_losses, initial=0.), np.max(point_losses, initial=0.)))
+
+    def done(self) -> bool:
+        """True if the point budget is spent or the loss goal is reached"""
+        return self.npoints >= self.max_points or self.loss() < self.loss_goal
+
+    def ask(self) -> float:
+        """Get the next position to be measured"""
+        x_measured = np.unique(self._x)
+        for bound in self.bounds:
+            if bound not in x_measured:
+                return bound
+        x, interval_losses, point_losses = self._losses()
+        ind_interval = int(np.argmax(interval_losses))
+        ind_point = int(np.argmax(point_losses))
+        if point_losses[ind_point] > interval_losses[ind_interval]:
+            return float(x[ind_point])
+        return float((x[ind_interval] + x[ind_interval + 1]) / 2)
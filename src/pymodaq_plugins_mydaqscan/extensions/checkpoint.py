@@ -0,0 +1,121 @@
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+from pymodaq.utils.h5modules.backends import GROUP, H5Backend, Node
+
+
+class ScanCheckpoint:
+    """State of a custom TA scan acquisition saved in its scan node to resume the scan after an interruption
+
+    The Checkpoint group of the scan node holds the progress of the acquisition as attributes (current average, number
+    of steps acquired during its sweep, last scan index), the settings of the scan and of the scanner as XML strings,
+    the titles of the selected modules, the order of the scan indexes in a sweep and the readback of the actuators at
+    the steps already acquired.
+
+    Parameters
+    ----------
+    measured: ndarray
+        readback of the actuators of shape (Naverage, Npoints, Naxes), NaN for the steps not acquired
+    order: ndarray of int
+        the scan indexes in their acquisition order (before the reversal of the serpentine averages)
+    scan_settings: str
+        XML string of the settings of the scan (averages, time flow, custom TA options)
+    scanner_settings: str
+        XML string of the settings of the scanner (scan type and subtype)
+    scanner_parameters: str
+        XML string of the parameters of the selected scanner (start, stop, step...)
+    actuators: list of str
+        titles of the selected actuators
+    detectors: list of str
+        titles of the selected detectors
+    """
+    group_name = 'Checkpoint'
+
+    def __init__(self, measured: np.ndarray, order: Iterable[int], scan_settings: str = '',
+                 scanner_settings: str = '', scanner_parameters: str = '', actuators: List[str] = (),
+                 detectors: List[str] = ()):
+        self.measured = np.asarray(measured, dtype=float)
+        self.order = np.asarray(order, dtype=int)
+        self.scan_settings = scan_settings
+        self.scanner_settings = scanner_settings
+        self.scanner_parameters = scanner_parameters
+        self.actuators = list(actuators)
+        self.detectors = list(detectors)
+        self.ind_average = 0
+        self.ind_step = 0  # number of steps acquired during the sweep of the current average
+        self.ind_scan = -1
+        self.n_steps = 0
+
+    @property
+    def naverage(self) -> int:
+        return self.measured.shape[0]
+
+    @property
+    def npoints(self) -> int:
+        return self.measured.shape[1]
+
+    def set_step(self, ind_average: int, ind_step: int, ind_scan: int, n_steps: int):
+        """Record that ind_step steps of the sweep of the given average are acquired, the last one at ind_scan"""
+        self.ind_average = int(ind_average)
+        self.ind_step = int(ind_step)
+        self.ind_scan = int(ind_scan)
+        self.n_steps = int(n_steps)
+
+    def next_step(self) -> Tuple[int, int]:
+        """Get the average and the index within its sweep of the first step not acquired"""
+        if self.ind_step >= self.npoints:
+            return self.ind_average + 1, 0
+        return self.ind_average, self.ind_step
+
+    @property
+    def is_complete(self) -> bool:
+        return self.next_step()[0] >= self.naverage
+
+    def get_state(self) -> dict:
+        """Get the progress of the acquisition, to be saved with save"""
+        return dict(ind_average=self.ind_average, ind_step=self.ind_step, ind_scan=self.ind_scan,
+                    n_steps=self.n_steps)
+
+    def save(self, h5saver: H5Backend, where: Union[Node, str], state: dict = None,
+             averages: Iterable[int] = None):
+        """Write the checkpoint in the Checkpoint group of the scan node (created at the first call)
+
+        Parameters
+        ----------
+        h5saver: H5Backend
+        where: Node or str
+            the scan node
+        state: dict
+            progress of the acquisition as given by get_state when the checkpoint was taken, the current one if None
+        averages: iterable of int
+            averages whose measured positions are written, all of them if None
+        """
+        group = h5saver.get_set_group(where, self.group_name, title='State of the acquisition to resume the scan')
+        if not h5saver.is_node_in_group(group, 'Measured'):
+            h5saver.create_carray(group, 'Measured', obj=self.measured, title='measured positions')
+            h5saver.create_carray(group, 'Order', obj=self.order, title='order of the scan indexes')
+            group.attrs['scan_settings'] = self.scan_settings
+            group.attrs['scanner_settings'] = self.scanner_settings
+            group.attrs['scanner_parameters'] = self.scanner_parameters
+            group.attrs['actuators'] = self.actuators
+            group.attrs['detectors'] = self.detectors
+        else:
+            measured = h5saver.get_node(group, 'Measured')
+            for ind_average in (range(self.naverage) if averages is None else averages):
+                measured[ind_average] = self.measured[ind_average]
+        for key, value in (self.get_state() if state is None else state).items():
+            group.attrs[key] = value
+
+    @classmethod
+    def load(cls, h5saver: H5Backend, where: Union[Node, str]) -> Union['ScanCheckpoint', None]:
+        """Read the checkpoint of a scan node, None if it has none"""
+        if not h5saver.is_node_in_group(where, cls.group_name):
+            return None
+        group: GROUP = h5saver.get_node(where, cls.group_name)
+        attrs = group.attrs
+        checkpoint = cls(h5saver.get_node(group, 'Measured').read(), h5saver.get_node(group, 'Order').read(),
+                         scan_settings=attrs['scan_settings'], scanner_settings=attrs['scanner_settings'],
+                         scanner_parameters=attrs['scanner_parameters'], actuators=attrs['actuators'],
+                         detectors=attrs['detectors'])
+        checkpoint.set_step(attrs['ind_average'], attrs['ind_step'], attrs['ind_scan'], attrs['n_steps'])
+        return checkpoint
@@ -0,0 +1,96 @@
+import time
+from typing import Iterable
+
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.running_statistics import RunningStatistics
+
+CRITERIA = ('Standard error', 'SNR')
+
+
+class EarlyStopping:
+    """Decide which scan points still need averaging from the running statistics of a probed signal
+
+    The values of the probed channel (a 0D value or a spectrum) are accumulated at each scan point. The noise of a
+    point is the RMS over the values of their standard error, its signal the RMS of their mean. A point is converged
+    once it has been measured at least min_averages times and its noise is below the target (standard error
+    criterion) or its signal to noise ratio above it (SNR criterion). The scan is done when all the points are
+    converged, all the averages are done or the time budget is spent.
+
+    Parameters
+    ----------
+    naverage: int
+        maximum number of averages
+    npoints: int
+        number of scan points
+    target: float
+        maximum standard error or minimum signal to noise ratio
+    criterion: str
+        'Standard error' or 'SNR'
+    min_averages: int
+        number of averages of each point before it may be converged (at least 2 to estimate the noise)
+    time_budget: float
+        maximum duration of the scan in seconds from start(), 0 for none
+    """
+
+    def __init__(self, naverage: int, npoints: int, target: float, criterion: str = 'Standard error',
+                 min_averages: int = 3, time_budget: float = 0.):
+        if criterion not in CRITERIA:
+            raise ValueError(f'Unknown criterion {criterion}, possible ones are {CRITERIA}')
+        self.naverage = naverage
+        self.npoints = npoints
+        self.target = target
+        self.criterion = criterion
+        self.min_averages = max(min_averages, 2)
+        self.time_budget = time_budget
+        self.acquired = np.zeros((naverage, npoints), dtype=bool)
+        self._statistics = RunningStatistics((npoints,))
+        self._tstart: float = None
+        self.start()
+
+    def start(self, now: float = None):
+        self._tstart = time.perf_counter() if now is None else now
+
+    def update(self, ind_average: int, ind_scan: int, values: np.ndarray):
+        """Add the probed values measured at a scan point during an average"""
+        self.acquired[ind_average, ind_scan] = True
+        self._statistics.update((ind_scan,), 'probe', np.ravel(values))
+
+    @property
+    def count(self) -> np.ndarray:
+        """Number of averages acquired at each scan point"""
+        return np.count_nonzero(self.acquired, axis=0)
+
+    def noise(self) -> np.ndarray:
+        """RMS of the standard error of the probed values at each scan point, NaN if measured less than twice"""
+        if 'probe' not in self._statistics.names:
+            return np.full((self.npoints,), np.nan)
+        return np.sqrt(np.mean(self._statistics.stderr('probe') ** 2, axis=-1))
+
+    def snr(self) -> np.ndarray:
+        """Signal to noise ratio at each scan point, NaN if measured less than twice"""
+        if 'probe' not in self._statistics.names:
+            return np.full((self.npoints,), np.nan)
+        signal = np.sqrt(np.mean(self._statistics.mean('probe') ** 2, axis=-1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return signal / self.noise()
+
+    def converged(self) -> np.ndarray:
+        """Tell for each scan point if it has reached the target"""
+        with np.errstate(invalid='ignore'):
+            reached = self.noise() <= self.target if self.criterion == 'Standard error' else self.snr() >= self.target
+        return np.logical_and(self.count >= self.min_averages, reached)
+
+    def pending(self, order: Iterable[int]) -> np.ndarray:
+        """Get the scan indexes of the order that are not converged yet"""
+        order = np.asarray(order, dtype=int)
+        return order[np.logical_not(self.converged()[order])]
+
+    def elapsed(self, now: float = None) -> float:
+        return (time.perf_counter() if now is None else now) - self._tstart
+
+    def is_timed_out(self, now: float = None) -> bool:
+        return self.time_budget > 0 and self.elapsed(now) >= self.time_budget
+
+    def is_done(self, now: float = None) -> bool:
+        return bool(np.all(self.converged())) or self.is_timed_out(now)
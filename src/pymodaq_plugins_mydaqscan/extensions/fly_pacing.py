@@ -0,0 +1,71 @@
+import time
+from typing import Iterable
+
+import numpy as np
+
+WAIT = 'wait'
+DUE = 'due'
+MISSED = 'missed'
+
+
+class FlyPacer:
+    """Decide from the readbacks of a sweeping actuator when to grab the frame of each step of a fly scan
+
+    The position of the actuator is extrapolated from its last two readbacks (at the velocity they give), up to the
+    end of the sweep. A step is due once the actuator has reached its setpoint along the sweep direction. It is missed
+    if the actuator is already past half way to the setpoint of the next step, its frame would then be grabbed closer
+    to the next setpoint (the actuator is too fast for the detectors). The last step is never missed, it is due once
+    a readback (not an extrapolation) reached the end of the sweep or once the actuator stopped (within its own
+    tolerance of the end). Once the actuator is stopped, its position is its last readback.
+
+    Parameters
+    ----------
+    setpoints: iterable of float
+        positions of the steps in the order of the sweep
+    """
+
+    def __init__(self, setpoints: Iterable[float]):
+        self.setpoints = np.asarray(list(setpoints), dtype=float)
+        self.direction = 1. if self.setpoints[-1] >= self.setpoints[0] else -1.
+        self._limits = (self.setpoints[1:] + self.setpoints[:-1]) / 2  # beyond them the previous step is missed
+        self.stopped = False
+        self._last: tuple = None
+        self._previous: tuple = None
+
+    def add_readback(self, timestamp: float, position: float):
+        """Add a readback of the actuator, the timestamps have to be in the same time base as `now`"""
+        if self._last is not None and timestamp <= self._last[0]:
+            return
+        self._previous = self._last
+        self._last = (timestamp, position)
+
+    def stop(self):
+        """Tell that the actuator stopped (move done), its position is not extrapolated anymore"""
+        self.stopped = True
+
+    def position(self, now: float = None, extrapolate=True) -> float:
+        """Get the estimated position of the actuator (the last readback if not extrapolate), NaN before the first
+        readback"""
+        if self._last is None:
+            return np.nan
+        timestamp, position = self._last
+        if self.stopped or self._previous is None or not extrapolate:
+            return position
+        velocity = (position - self._previous[1]) / (timestamp - self._previous[0])
+        now = time.time() if now is None else now
+        position += velocity * max(0., now - timestamp)
+        return min(position * self.direction, self.setpoints[-1] * self.direction) * self.direction
+
+    def state(self, ind_step: int, now: float = None) -> str:
+        """Tell if the frame of a step should be grabbed now (DUE), later (WAIT) or skipped (MISSED)"""
+        if ind_step == len(self._limits):
+            if self.stopped:
+                return DUE
+            position = self.position(now, extrapolate=False)
+        else:
+            position = self.position(now)
+        if np.isnan(position) or (position - self.setpoints[ind_step]) * self.direction < 0:
+            return WAIT
+        if ind_step < len(self._limits) and (position - self._limits[ind_step]) * self.direction > 0:
+            return MISSED
+        return DUE
@@ -0,0 +1,133 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Tuple
+
+import numpy as np
+
+
+def find_hot_pixels(frame: np.ndarray, sigma: float = 5.) -> np.ndarray:
+    """Find the pixels deviating from the median of their 3x3 neighbourhood by more than sigma robust deviations
+
+    Parameters
+    ----------
+    frame: ndarray
+        2D frame, usually a dark frame
+    sigma: float
+        threshold in robust standard deviations (1.4826 x median absolute deviation)
+
+    Returns
+    -------
+    ndarray of bool: True for the hot pixels
+    """
+    frame = np.asarray(frame, dtype=float)
+    padded = np.pad(frame, 1, mode='edge')
+    neighbours = np.lib.stride_tricks.sliding_window_view(padded, (3, 3))
+    deviation = frame - np.median(neighbours, axis=(-2, -1))
+    mad = 1.4826 * np.median(np.abs(deviation - np.median(deviation)))
+    if mad == 0:
+        return deviation != 0
+    return np.abs(deviation) > sigma * mad
+
+
+def reduce_frame(frame: np.ndarray, rows: Tuple[int, int] = None, dark: np.ndarray = None,
+                 mask: np.ndarray = None) -> np.ndarray:
+    """Subtract the dark frame and bin the rows of a region of interest, ignoring masked pixels
+
+    The bins are the sums over the rows of the ROI, the masked pixels of a column are replaced by the mean of the
+    others (NaN if all of them are masked).
+
+    Parameters
+    ----------
+    frame: ndarray
+        2D frame (rows, columns)
+    rows: (int, int)
+        first and last (excluded) rows of the ROI, None for all rows
+    dark: ndarray
+        dark frame to be subtracted, same shape as the frame
+    mask: ndarray of bool
+        True for the pixels to be ignored (hot pixels), same shape as the frame
+
+    Returns
+    -------
+    ndarray: the 1D binned data (columns,)
+    """
+    frame = np.asarray(frame, dtype=float)
+    roi = slice(*rows) if rows is not None else slice(None)
+    frame = frame[roi]
+    if dark is not None:
+        frame = frame - np.asarray(dark)[roi]
+    if mask is None:
+        return np.sum(frame, axis=0)
+    valid = np.logical_not(np.asarray(mask)[roi])
+    counts = np.sum(valid, axis=0)
+    sums = np.sum(np.where(valid, frame, 0.), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums * frame.shape[0] / counts, np.nan)
+
+
+_worker_state = dict([])
+
+
+def _init_worker(rows, dark, mask):
+    _worker_state.update(rows=rows, dark=dark, mask=mask)
+
+
+def _reduce_in_worker(frame: np.ndarray) -> np.ndarray:
+    return reduce_frame(frame, **_worker_state)
+
+
+def _ping():
+    return None
+
+
+class FrameReducer:
+    """Reduce 2D frames to 1D binned data in a pool of processes
+
+    The ROI, dark frame and mask are sent once to each process of the pool when it starts, frames are then sent with
+    each reduction. Processes are spawned (not forked) to be safe with the threads of the application.
+
+    Parameters
+    ----------
+    rows: (int, int)
+        first and last (excluded) rows of the ROI, None for all rows
+    dark: ndarray
+        dark frame to be subtracted
+    mask: ndarray of bool
+        True for the pixels to be ignored
+    processes: int
+        number of processes of the pool, 0 to reduce the frames in the calling thread
+    """
+
+    def __init__(self, rows: Tuple[int, int] = None, dark: np.ndarray = None, mask: np.ndarray = None,
+                 processes: int = 2):
+        self.rows = rows
+        self.dark = dark
+        self.mask = mask
+        self.processes = processes
+        self._executor: ProcessPoolExecutor = None
+
+    def start(self):
+        """Start the processes of the pool, blocking until they are ready"""
+        if self.processes > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker,
+                                                 initargs=(self.rows, self.dark, self.mask))
+            for future in [self._executor.submit(_ping) for _ in range(self.processes)]:
+                future.result()
+
+    def submit(self, frame: np.ndarray) -> Future:
+        """Start the reduction of a frame, the result (or exception) is given by the returned future"""
+        if self._executor is not None:
+            return self._executor.submit(_reduce_in_worker, frame)
+        future = Future()
+        try:
+            future.set_result(reduce_frame(frame, self.rows, self.dark, self.mask))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def stop(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
@@ -0,0 +1,190 @@
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+from pymodaq.utils.daq_utils import set_logger, get_module_name
+from pymodaq.utils.h5modules.backends import CARRAY, EARRAY, Node
+from pymodaq.utils.h5modules.saving import H5Saver
+
+logger = set_logger(get_module_name(__file__))
+
+
+class H5Layout:
+    """Chunk shape and compression filters of the arrays of a TA scan
+
+    Scan arrays have the shape [Naverage] + scan shape + data shape. Their chunks hold one average, the whole data of
+    the detector (split along its first dimensions if bigger than the chunk size, so that rows of frames are kept
+    whole) and as many consecutive scan points as fit within the chunk size, the last scan dimension first.
+    Consecutive steps are thus written in the same chunk and kinetic traces are read from few chunks.
+
+    Parameters
+    ----------
+    scan_shape: tuple of int
+        shape of the scanner (without the averages)
+    chunk_bytes: int
+        target size in bytes of the chunks of the scan arrays, 0 for the automatic chunking of the backend
+    compression: list of str
+        lossless filters tried in order, the first one available in the backend is used, for instance 'zlib', 'lzf',
+        'blosc:zstd' or 'blosc2:lz4' (blosc compressed files need the blosc HDF5 plugin to be read). Empty for no
+        compression
+    level: int
+        compression level from 1 to 9
+    shuffle: bool
+        apply the byte shuffle filter before compression
+    """
+
+    def __init__(self, scan_shape: Iterable[int], chunk_bytes: int = 512 * 1024,
+                 compression: Union[str, List[str]] = ('zlib',), level: int = 4, shuffle: bool = True):
+        self.scan_shape = tuple(scan_shape)
+        self.chunk_bytes = int(chunk_bytes)
+        self.compression = [compression] if isinstance(compression, str) else list(compression)
+        self.level = level
+        self.shuffle = shuffle
+
+    @classmethod
+    def from_config(cls, scan_shape: Iterable[int], config: dict) -> 'H5Layout':
+        return cls(scan_shape, chunk_bytes=config['chunk_kbytes'] * 1024, compression=config['compression'],
+                   level=config['level'], shuffle=config['shuffle'])
+
+    def chunk_shape(self, shape: Tuple[int], itemsize: int) -> Union[Tuple[int], None]:
+        """Get the chunk shape of an array, None if it is not a scan array or if the chunking is automatic"""
+        shape = tuple(shape)
+        nscan = len(self.scan_shape)
+        if self.chunk_bytes <= 0 or nscan == 0:
+            return None
+        for nouter in (1, 0):  # with or without a leading average dimension
+            if len(shape) >= nouter + nscan and shape[nouter:nouter + nscan] == self.scan_shape:
+                break
+        else:
+            return None
+
+        data_chunk = list(shape[nouter + nscan:])
+        for ind in range(len(data_chunk)):
+            other_bytes = int(np.prod(data_chunk[ind + 1:])) * itemsize
+            data_chunk[ind] = int(max(min(data_chunk[ind], self.chunk_bytes // other_bytes), 1))
+            if data_chunk[ind] > 1 or other_bytes <= self.chunk_bytes:
+                break
+
+        scan_chunk = [1] * (nouter + nscan)
+        budget = self.chunk_bytes // max(int(np.prod(data_chunk)) * itemsize, 1)
+        for ind in reversed(range(nouter, nouter + nscan)):
+            if budget <= 1:
+                break
+            scan_chunk[ind] = int(min(shape[ind], budget))
+            budget //= scan_chunk[ind]
+        return tuple(scan_chunk + data_chunk)
+
+    def get_filters(self, backend: str = 'tables'):
+        """Get the compression filters of the backend from the first available compression of the list
+
+        Returns
+        -------
+        tables.Filters for the tables backend, dict of the create_dataset compression keywords for h5py, None if none
+        of the compressions is available
+        """
+        for compression in self.compression:
+            library = compression.split(':')[0]
+            if backend == 'tables':
+                import tables
+                if library == 'gzip':
+                    compression = library = 'zlib'
+                try:
+                    if tables.which_lib_version(library) is not None:
+                        return tables.Filters(complevel=self.level, complib=compression, shuffle=self.shuffle)
+                except ValueError:  # unknown library
+                    pass
+            elif backend == 'h5py':
+                if library in ('zlib', 'gzip'):
+                    return dict(compression='gzip', compression_opts=self.level, shuffle=self.shuffle)
+                elif library == 'lzf':
+                    return dict(compression='lzf', shuffle=self.shuffle)
+                elif library.startswith('blosc'):
+                    try:
+                        import hdf5plugin
+                    except ImportError:
+                        continue
+                    blosc = hdf5plugin.Blosc2 if library == 'blosc2' else hdf5plugin.Blosc
+                    cname = compression.split(':')[1] if ':' in compression else 'lz4'
+                    return dict(blosc(cname=cname, clevel=self.level,
+                                      filters=blosc.SHUFFLE if self.shuffle else blosc.NOSHUFFLE))
+            logger.warning(f'The compression {compression} is not available with the {backend} backend')
+        if len(self.compression) != 0:
+            logger.warning(f'None of the compressions {self.compression} is available, data are not compressed')
+        return None
+
+    def describe(self, backend: str = 'tables') -> str:
+        filters = self.get_filters(backend)
+        if filters is None:
+            compression = 'no compression'
+        elif backend == 'tables':
+            compression = f'compression {filters.complib} level {filters.complevel}'
+        else:
+            compression = f"compression {filters['compression']}"
+        chunks = f'chunks of {self.chunk_bytes // 1024} kB' if self.chunk_bytes > 0 else 'automatic chunks'
+        return f'HDF5 layout: {chunks}, {compression}'
+
+
+class LayoutH5Saver(H5Saver):
+    """H5Saver creating its arrays with the chunk shape and compression of a H5Layout
+
+    Arrays initialized with zeros (scan arrays) are created without writing them, unwritten chunks are not stored in
+    the file. Enlargeable arrays (reference data) are compressed the same way, chunked by the backend.
+    """
+
+    def __init__(self, *args, layout: H5Layout = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.layout = layout
+        self._filters = None
+
+    def set_layout(self, layout: H5Layout):
+        self.layout = layout
+        self._filters = layout.get_filters(self.backend) if layout is not None else None
+
+    def create_carray(self, where, name, obj=None, title=''):
+        if self.layout is None or obj is None or obj.ndim == 0 or obj.size == 0 or obj.dtype.kind not in 'biufc':
+            return super().create_carray(where, name, obj=obj, title=title)
+        if isinstance(where, Node):
+            where = where.node
+        chunks = self.layout.chunk_shape(obj.shape, obj.dtype.itemsize)
+        empty = not np.any(obj)
+        if self.backend == 'tables':
+            import tables
+            content = dict(atom=tables.Atom.from_dtype(obj.dtype), shape=obj.shape) if empty else dict(obj=obj)
+            array = CARRAY(self._h5file.create_carray(where, name, title=title, filters=self._filters,
+                                                      chunkshape=chunks, **content), self.backend)
+        else:
+            content = dict(shape=obj.shape, dtype=obj.dtype) if empty else dict(data=obj)
+            content.update(self._filters or dict([]))
+            array = CARRAY(self.get_node(where).node.create_dataset(
+                name, chunks=chunks if chunks is not None else True, **content), self.backend)
+            array.array.attrs['TITLE'] = title
+            array.array.attrs['CLASS'] = 'CARRAY'
+        array.attrs['shape'] = obj.shape
+        array.attrs['dtype'] = obj.dtype.name
+        array.attrs['subdtype'] = ''
+        array.attrs['backend'] = self.backend
+        return array
+
+    def create_earray(self, where, name, dtype, data_shape=None, title=''):
+        """Create enlargeable arrays (along their first dimension) with the compression of the layout"""
+        if self.layout is None:
+            return super().create_earray(where, name, dtype, data_shape=data_shape, title=title)
+        if isinstance(where, Node):
+            where = where.node
+        dtype = np.dtype(dtype)
+        shape = tuple([0] + list(data_shape if data_shape is not None else []))
+        if self.backend == 'tables':
+            import tables
+            array = EARRAY(self._h5file.create_earray(where, name, tables.Atom.from_dtype(dtype), shape=shape,
+                                                      title=title, filters=self._filters), self.backend)
+        else:
+            array = EARRAY(self.get_node(where).node.create_dataset(
+                name, shape=shape, dtype=dtype, maxshape=(None,) + shape[1:], chunks=True,
+                **(self._filters or dict([]))), self.backend)
+            array.array.attrs['TITLE'] = title
+            array.array.attrs['CLASS'] = 'EARRAY'
+            array.array.attrs['EXTDIM'] = 0
+        array.attrs['shape'] = shape
+        array.attrs['dtype'] = dtype.name
+        array.attrs['subdtype'] = ''
+        array.attrs['backend'] = self.backend
+        return array
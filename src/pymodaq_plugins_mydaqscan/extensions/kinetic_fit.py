@@ -0,0 +1,245 @@
+import threading
+import time
+from typing import Callable, Iterable, List, Tuple
+
+import numpy as np
+from scipy.optimize import least_squares
+from scipy.special import erfc, erfcx
+
+from pymodaq.utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+def kinetics(delays: np.ndarray, taus: Iterable[float], t0: float = 0., irf: float = 0.) -> np.ndarray:
+    """Exponential decays starting at t0, convolved with a gaussian IRF of standard deviation irf if not 0
+
+    Returns
+    -------
+    ndarray: the decays of shape (len(delays), len(taus)), of amplitude 1 at t0 without IRF
+    """
+    t = np.asarray(delays, dtype=float)[:, None] - t0
+    taus = np.asarray(taus, dtype=float)[None, :]
+    with np.errstate(over='ignore', invalid='ignore'):
+        if irf <= 0:
+            return np.where(t >= 0, np.exp(-np.maximum(t, 0.) / taus), 0.)
+        # 0.5 * exp(-t / tau + irf**2 / (2 * tau**2)) * erfc(x), written with erfcx where this product overflows
+        x = (irf ** 2 / taus - t) / (np.sqrt(2) * irf)
+        return np.where(x >= 0, 0.5 * np.exp(-t ** 2 / (2 * irf ** 2)) * erfcx(x),
+                        0.5 * np.exp(-t / taus + (irf / taus) ** 2 / 2) * erfc(x))
+
+
+class GlobalKineticFit:
+    """Global multi-exponential fit of transient absorption data, updated point by point
+
+    All the wavelengths share the time constants (and the time zero and IRF width if fitted), the amplitudes of each
+    component at each wavelength (decay associated spectra) are linear parameters. They are eliminated by a single
+    least squares solve over all the wavelengths for each set of nonlinear parameters (variable projection), so that
+    the nonlinear fit only has the time constants to optimize whatever the number of pixels.
+
+    The measured values are averaged per scan point as they arrive (update). Each fit starts from the parameters of
+    the previous one and is limited to max_nfev evaluations, so that refitting as points come in stays cheap. The
+    uncertainties are the standard deviations given by the jacobian of the projected residuals.
+
+    Parameters
+    ----------
+    npoints: int
+        number of scan points
+    taus: iterable of float
+        initial time constants, in the units of the delays
+    irf: float
+        standard deviation of the gaussian IRF (initial value if fit_irf), 0 for none
+    t0: float
+        time zero (initial value if fit_irf)
+    fit_irf: bool
+        also fit the time zero and the IRF width
+    max_nfev: int
+        maximum number of evaluations of the residuals per fit
+    """
+
+    def __init__(self, npoints: int, taus: Iterable[float], irf: float = 0., t0: float = 0., fit_irf: bool = False,
+                 max_nfev: int = 20):
+        self.npoints = npoints
+        self.ntaus = len(list(taus))
+        if self.ntaus == 0 or np.any(np.asarray(taus) <= 0):
+            raise ValueError('The initial time constants should be positive')
+        self.fit_irf = fit_irf and irf > 0
+        self.max_nfev = max_nfev
+
+        self._delays = np.full((npoints,), np.nan)
+        self._sum: np.ndarray = None
+        self._count = np.zeros((npoints,), dtype=int)
+
+        self._params = np.log(np.asarray(taus, dtype=float))
+        if self.fit_irf:
+            self._params = np.concatenate((self._params, [t0, np.log(irf)]))
+        self.taus = np.sort(np.asarray(taus, dtype=float))
+        self.taus_std = np.full((self.ntaus,), np.nan)
+        self.t0 = t0
+        self.irf = irf
+        self.t0_std = np.nan
+        self.irf_std = np.nan
+        self.amplitudes: np.ndarray = None
+        self.chi2 = np.nan
+        self.history: List[Tuple[int, np.ndarray, np.ndarray]] = []  # (points, taus, taus_std) after each fit
+
+    @property
+    def n_measured(self) -> int:
+        """Number of scan points measured at least once"""
+        return int(np.count_nonzero(self._count))
+
+    def update(self, ind_scan: int, delay: float, values: np.ndarray):
+        """Add the values (a spectrum or a scalar) measured at a scan point"""
+        values = np.ravel(values)
+        if self._sum is None:
+            self._sum = np.zeros((self.npoints, values.size))
+        self._delays[ind_scan] = delay
+        self._sum[ind_scan] += values
+        self._count[ind_scan] += 1
+
+    def get_data(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the delays and the averaged values of shape (npoints measured, nvalues) of the measured points"""
+        measured = self._count > 0
+        if self._sum is None:
+            return np.zeros((0,)), np.zeros((0, 0))
+        return self._delays[measured], self._sum[measured] / self._count[measured, None]
+
+    def _split(self, params: np.ndarray) -> Tuple[np.ndarray, float, float]:
+        if self.fit_irf:
+            return np.exp(params[:self.ntaus]), params[self.ntaus], np.exp(params[self.ntaus + 1])
+        return np.exp(params), self.t0, self.irf
+
+    def _solve(self, params: np.ndarray, delays: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the amplitudes of shape (ntaus, nvalues) and the residuals of the linear problem"""
+        basis = kinetics(delays, *self._split(params))
+        amplitudes = np.linalg.lstsq(basis, values, rcond=None)[0]
+        return amplitudes, values - basis @ amplitudes
+
+    def _residuals(self, params: np.ndarray, delays: np.ndarray, values: np.ndarray) -> np.ndarray:
+        return self._solve(params, delays, values)[1].ravel()
+
+    def fit(self, delays: np.ndarray = None, values: np.ndarray = None, max_nfev: int = None) -> bool:
+        """Refit the data (the measured ones if not given) starting from the current parameters
+
+        Returns
+        -------
+        bool: False if there are not enough points to fit or if the fit failed
+        """
+        if delays is None:
+            delays, values = self.get_data()
+        nparams = self._params.size
+        if len(delays) <= nparams + self.ntaus:
+            return False
+        try:
+            result = least_squares(self._residuals, self._params, args=(delays, values), method='trf',
+                                   max_nfev=self.max_nfev if max_nfev is None else max_nfev)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            logger.warning(f'Kinetic fit failed: {str(e)}')
+            return False
+        if not np.all(np.isfinite(result.x)):
+            return False
+
+        params = result.x.copy()
+        std = np.full((nparams,), np.nan)
+        dof = result.fun.size - nparams - self.ntaus * values.shape[1]
+        if dof > 0:
+            cov = np.linalg.pinv(result.jac.T @ result.jac) * 2 * result.cost / dof
+            std = np.sqrt(np.abs(np.diag(cov)))
+        order = np.argsort(params[:self.ntaus])  # keep the components sorted by time constant
+        params[:self.ntaus] = params[order]
+        amplitudes, residuals = self._solve(params, delays, values)
+
+        taus, t0, irf = self._split(params)
+        self._params = params
+        self.taus = taus
+        self.taus_std = taus * std[order]  # std of log(tau)
+        if self.fit_irf:
+            self.t0, self.irf = t0, irf
+            self.t0_std, self.irf_std = std[self.ntaus], irf * std[self.ntaus + 1]
+        self.amplitudes = amplitudes
+        self.chi2 = float(np.mean(residuals ** 2))
+        self.history.append((len(delays), taus.copy(), self.taus_std.copy()))
+        return True
+
+    @property
+    def n_fits(self) -> int:
+        return len(self.history)
+
+    def is_stable(self, rtol: float = 0.01, n_fits: int = 5) -> bool:
+        """Tell if the time constants changed by less than rtol (relative) over the last n_fits fits"""
+        if self.n_fits < max(n_fits, 2):
+            return False
+        taus = np.array([fit[1] for fit in self.history[-n_fits:]])
+        return bool(np.all(np.abs(taus - taus[-1]) <= rtol * taus[-1]))
+
+    def format(self) -> str:
+        text = ', '.join([f'tau{ind} = {tau:.4g} ± {std:.2g}'
+                          for ind, (tau, std) in enumerate(zip(self.taus, self.taus_std))])
+        if self.fit_irf:
+            text += f', t0 = {self.t0:.4g} ± {self.t0_std:.2g}, irf = {self.irf:.4g} ± {self.irf_std:.2g}'
+        return text
+
+
+class KineticFitWorker:
+    """Background thread refitting a GlobalKineticFit whenever new points have been told
+
+    The points told while a fit is running are all taken into account by the next one, so that the worker never
+    lags behind the acquisition by more than one fit.
+
+    Parameters
+    ----------
+    fit: GlobalKineticFit
+    min_interval: float
+        minimum time in seconds between the start of two fits
+    status: Callable
+        called from the worker thread with the fit after each successful fit
+    """
+
+    def __init__(self, fit: GlobalKineticFit, min_interval: float = 0., status: Callable = None):
+        self.fit = fit
+        self.min_interval = min_interval
+        self._status = status
+        self._lock = threading.Lock()
+        self._new_data = threading.Event()
+        self._stopping = False
+        self._thread: threading.Thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.is_running:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='KineticFit', daemon=True)
+            self._thread.start()
+
+    def tell(self, ind_scan: int, delay: float, values: np.ndarray):
+        """Add the values measured at a scan point, the fit is updated in the background"""
+        with self._lock:
+            self.fit.update(ind_scan, delay, values)
+        self._new_data.set()
+
+    def stop(self):
+        """Stop the worker once its current fit is done"""
+        if self.is_running:
+            self._stopping = True
+            self._new_data.set()
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._new_data.wait()
+            if self._stopping:
+                break
+            self._new_data.clear()
+            tstart = time.perf_counter()
+            with self._lock:
+                delays, values = self.fit.get_data()
+            try:
+                if self.fit.fit(delays, values) and self._status is not None:
+                    self._status(self.fit)
+            except Exception as e:
+                logger.exception(str(e))
+            time.sleep(max(0., self.min_interval - (time.perf_counter() - tstart)))
@@ -0,0 +1,108 @@
+import math
+import threading
+import time
+from typing import Callable, List
+
+from pyqtgraph.parametertree import Parameter
+
+
+class LiveDataCoalescer:
+    """Merge the live data of several scan steps into batches sent to the user interface at a given refresh rate
+
+    The selected channels (plot_0d and plot_1d in the plot_options of the scan settings) are read once and cached
+    until these settings change.
+
+    A batch is emitted when the previous one has been acknowledged by the user interface and the refresh period is
+    elapsed. While the user interface is busy, the steps pile up: above `max_pending` steps, the oldest ones are
+    dropped (except the first step added, whose processing writes the navigation axes). Only the live display is
+    affected, the saved data are complete.
+
+    Parameters
+    ----------
+    settings: Parameter
+        the settings of the scan extension
+    emit: Callable
+        called with the list of pending objects to be sent and a bool telling if its first object is the first one
+        added (typically a Qt signal emit)
+    refresh_rate: float
+        target rate in Hz of the emissions
+    max_pending: int
+        maximum number of steps waiting for the user interface
+    """
+
+    def __init__(self, settings: Parameter, emit: Callable[[list, bool], None], refresh_rate: float = 10.,
+                 max_pending: int = 1000):
+        self._settings = settings
+        self._emit = emit
+        self.refresh_period = 1 / refresh_rate if refresh_rate > 0 else 0.
+        self.max_pending = max(1, max_pending)
+
+        self._full_names: List[str] = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._in_flight = False
+        self._last_emission = -math.inf  # the first batch is always due
+        self.n_added = 0
+        self.n_emitted = 0
+        self.n_dropped = 0
+
+        self._settings.child('plot_options').sigTreeStateChanged.connect(self.invalidate)
+
+    def disconnect(self):
+        self._settings.child('plot_options').sigTreeStateChanged.disconnect(self.invalidate)
+
+    def invalidate(self, *args):
+        """Forget the cached selection of channels"""
+        self._full_names = None
+
+    @property
+    def full_names(self) -> List[str]:
+        """Full names of the channels selected for the live plots"""
+        full_names = self._full_names
+        if full_names is None:
+            full_names = self._settings['plot_options', 'plot_0d']['selected'][:]
+            full_names.extend(self._settings['plot_options', 'plot_1d']['selected'][:])
+            self._full_names = full_names
+        return full_names
+
+    def add(self, item):
+        """Add the live data of a step, emitting the pending batch if due
+
+        The first item added is never dropped, whatever the order of the steps (reordered or resumed scans).
+        """
+        with self._lock:
+            self._pending.append((self.n_added == 0, item))
+            self.n_added += 1
+            if len(self._pending) > self.max_pending:
+                for ind, (keep, _) in enumerate(self._pending):
+                    if not keep:
+                        self._pending.pop(ind)
+                        self.n_dropped += 1
+                        break
+        self.emit_if_due()
+
+    def emit_if_due(self, force=False):
+        """Emit the pending batch if the previous one has been acknowledged and the refresh period is elapsed
+
+        Parameters
+        ----------
+        force: bool
+            emit the pending batch whatever the state of the user interface (at the end of a scan for instance)
+        """
+        with self._lock:
+            if len(self._pending) == 0:
+                return
+            if not force and (self._in_flight or time.perf_counter() - self._last_emission < self.refresh_period):
+                return
+            batch = [item for _, item in self._pending]
+            is_first = self.n_emitted == 0
+            self._pending = []
+            self._in_flight = True
+            self._last_emission = time.perf_counter()
+            self.n_emitted += len(batch)
+        self._emit(batch, is_first)
+
+    def acknowledge(self):
+        """To be called by the user interface once a batch has been processed"""
+        with self._lock:
+            self._in_flight = False
@@ -5,13 +5,37 @@ from pymodaq.utils import daq_utils as utils
 from pymodaq.utils.scanner.scanner import Scanner
 from pymodaq.utils.managers.modules_manager import ModulesManager
 from pymodaq.utils.h5modules import module_saving
+from pymodaq.utils.h5modules.saving import DataType
+from pymodaq.utils.h5modules.data_saving import SPECIAL_GROUP_NAMES
 from pymodaq.extensions.daq_scan import DAQScan, DAQScanAcquisition, ScanDataTemp
 from pyqtgraph.parametertree import Parameter, ParameterTree
-from pymodaq.utils.parameter import pymodaq_ptypes
+from pymodaq.utils.parameter import pymodaq_ptypes, ioxml
+from pymodaq.utils.parameter import utils as putils
+from pymodaq.utils.messenger import messagebox
 from qtpy import QtWidgets, QtCore
-from qtpy.QtCore import QThread
+from qtpy.QtCore import QThread, Signal
 
 import numpy as np
+import time
+from typing import List, Union
+
+from pymodaq_plugins_mydaqscan.extensions.scan_writer import ScanWriter
+from pymodaq_plugins_mydaqscan.extensions.adaptive_sampling import AdaptiveSampler1D
+from pymodaq_plugins_mydaqscan.extensions.running_statistics import RunningStatistics
+from pymodaq_plugins_mydaqscan.extensions.live_data import LiveDataCoalescer
+from pymodaq_plugins_mydaqscan.extensions.step_profiler import StepProfiler
+from pymodaq_plugins_mydaqscan.extensions.settling import SettlingMonitor
+from pymodaq_plugins_mydaqscan.extensions.point_scheduler import PointScheduler, MotionModel, sweep_order
+from pymodaq_plugins_mydaqscan.extensions.frame_reduction import FrameReducer, find_hot_pixels
+from pymodaq_plugins_mydaqscan.extensions.h5_layout import H5Layout, LayoutH5Saver
+from pymodaq_plugins_mydaqscan.extensions.checkpoint import ScanCheckpoint
+from pymodaq_plugins_mydaqscan.extensions.early_stopping import EarlyStopping, CRITERIA
+from pymodaq_plugins_mydaqscan.extensions.kinetic_fit import GlobalKineticFit, KineticFitWorker
+from pymodaq_plugins_mydaqscan.extensions.reference_cache import ReferenceCache
+from pymodaq_plugins_mydaqscan.extensions.fly_pacing import FlyPacer, WAIT, DUE, MISSED
+from pymodaq_plugins_mydaqscan.scanners.mydaqscanner import Scan1DTAAdaptive
+from pymodaq_plugins_mydaqscan.hardware.ring_buffer import get_ring_buffer, Slot
+from pymodaq_plugins_mydaqscan import config as plugin_config
 
 config = utils.load_config()
 logger = utils.set_logger(utils.get_module_name(__file__))
@@ -22,17 +46,223 @@ CLASS_NAME = 'mydaqscan'
 
 class mydaqscan(DAQScan):
     # list of dicts enabling the settings tree on the user interface
-    params = DAQScan.params + []
+    params = DAQScan.params + [
+        {'title': 'Custom TA options:', 'name': 'ta_options', 'type': 'group', 'children': [
+            {'title': 'Pipelined saving:', 'name': 'pipelined', 'type': 'bool', 'value': False,
+             'tip': 'Save and emit the data of a step in a background worker while the actuators move to the'
+                    ' next step'},
+            {'title': 'Background writer:', 'name': 'writer', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Queue size:', 'name': 'queue_size', 'type': 'int', 'value': 64, 'min': 1,
+                 'tip': 'Maximum number of pending jobs before the acquisition waits for the writer'},
+                {'title': 'Flush every N points:', 'name': 'flush_points', 'type': 'int', 'value': 16, 'min': 1},
+                {'title': 'Flush every T (s):', 'name': 'flush_interval', 'type': 'float', 'value': 5., 'min': 0.},
+                {'title': 'Chunk aligned:', 'name': 'chunk_aligned', 'type': 'bool', 'value': True,
+                 'tip': 'Round the number of points per batch to a multiple of the h5 arrays chunk length'},
+            ]},
+            {'title': 'Checkpoint every N points:', 'name': 'checkpoint_points', 'type': 'int', 'value': 10, 'min': 0,
+             'tip': 'Save the progress of the acquisition in the scan node every N points (and after each average)'
+                    ' so that an interrupted scan can be resumed, 0 to disable (not for adaptive, fly and running'
+                    ' statistics scans)'},
+            {'title': 'Point ordering:', 'name': 'ordering', 'type': 'list', 'value': 'Scan order',
+             'limits': ['Scan order', 'Minimal travel time'],
+             'tip': 'Order in which the points are acquired, minimal travel time uses the motion models of the'
+                    ' actuators from the plugin configuration file, the data are saved in the scan order anyway'
+                    ' (not for adaptive and fly scans)'},
+            {'title': 'Serpentine averages:', 'name': 'serpentine', 'type': 'bool', 'value': False,
+             'tip': 'Reverse the sweep direction on alternate averages to avoid the return trip to the first position,'
+                    ' the data are saved in the scan order anyway (not for adaptive scans)'},
+            {'title': 'Fly scan:', 'name': 'fly_scan', 'type': 'bool', 'value': False,
+             'tip': 'Sweep the actuator from the first to the last position of a 1D scan while grabbing the detectors.'
+                    ' The frame of each step is grabbed once the readback of the actuator reaches its position, the'
+                    ' steps the actuator already passed (too fast for the detectors) are skipped and saved as NaN'},
+            {'title': 'Settling:', 'name': 'settling', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Wait for readback:', 'name': 'enabled', 'type': 'bool', 'value': False,
+                 'tip': 'After each move, poll the actuators readback until it is within tolerance of the setpoint'
+                        ' and stable, instead of waiting the fixed "Wait time between"'},
+                {'title': 'Tolerance:', 'name': 'tolerance', 'type': 'float', 'value': 0., 'min': 0.,
+                 'tip': 'Maximum deviation from the setpoint in the units of the actuators, 0 to use the epsilon of'
+                        ' each actuator'},
+                {'title': 'Stable window (ms):', 'name': 'window', 'type': 'int', 'value': 50, 'min': 0,
+                 'tip': 'Time during which the readbacks have to stay within tolerance'},
+                {'title': 'Poll interval (ms):', 'name': 'poll_interval', 'type': 'int', 'value': 10, 'min': 1},
+                {'title': 'Timeout (ms):', 'name': 'timeout', 'type': 'int', 'value': 2000, 'min': 0,
+                 'tip': 'Continue the scan if the actuators have not settled after this time'},
+            ]},
+            {'title': 'Averaging:', 'name': 'averaging', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Running statistics:', 'name': 'running', 'type': 'bool', 'value': False,
+                 'tip': 'Save the running mean, variance and count over the averages of each scan point instead of'
+                        ' every average sweep'},
+                {'title': 'Checkpoint every N averages:', 'name': 'checkpoint_every', 'type': 'int', 'value': 1,
+                 'min': 1, 'tip': 'Write the statistics to the file every N completed averages (and at the end)'},
+                {'title': 'Keep raw sweep every N:', 'name': 'raw_every', 'type': 'int', 'value': 0, 'min': 0,
+                 'tip': 'Also save the raw data of one average sweep out of N, 0 to save none'},
+                {'title': 'Early stopping:', 'name': 'early_stop', 'type': 'bool', 'value': False,
+                 'tip': 'Skip in the next sweeps the scan points whose probed signal (see probe_data in the modules'
+                        ' selector panel) has reached the target, the scan stops once all of them have or when the'
+                        ' time budget is spent (not for adaptive and fly scans)'},
+                {'title': 'Criterion:', 'name': 'criterion', 'type': 'list', 'value': CRITERIA[0],
+                 'limits': list(CRITERIA)},
+                {'title': 'Target:', 'name': 'target', 'type': 'float', 'value': 1e-4, 'min': 0.,
+                 'tip': 'Maximum standard error (in the units of the probed data) or minimum signal to noise ratio'
+                        ' of each scan point'},
+                {'title': 'Min averages:', 'name': 'min_averages', 'type': 'int', 'value': 3, 'min': 2,
+                 'tip': 'Number of averages of each scan point before it may be skipped'},
+                {'title': 'Time budget (s):', 'name': 'time_budget', 'type': 'float', 'value': 0., 'min': 0.,
+                 'tip': 'Stop the scan after this duration, 0 for no limit'},
+            ]},
+            {'title': 'Live kinetic fit:', 'name': 'kinetic_fit', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Fit during the scan:', 'name': 'enabled', 'type': 'bool', 'value': False,
+                 'tip': 'Global multi-exponential fit of the probed signal (see probe_data in the modules selector'
+                        ' panel) updated in the background as the points come in (1D step by step scans only)'},
+                {'title': 'Initial time constants:', 'name': 'taus', 'type': 'str', 'value': '500, 20000',
+                 'tip': 'One per component, separated with commas, in the units of the delays (fs for delay grid'
+                        ' scans, units of the actuator otherwise)'},
+                {'title': 'IRF width:', 'name': 'irf', 'type': 'float', 'value': 0., 'min': 0.,
+                 'tip': 'Standard deviation of the gaussian instrument response function, 0 for none'},
+                {'title': 'Time zero:', 'name': 't0', 'type': 'float', 'value': 0.},
+                {'title': 'Fit IRF and time zero:', 'name': 'fit_irf', 'type': 'bool', 'value': False,
+                 'tip': 'Also fit the IRF width and the time zero (only with a non zero IRF width)'},
+                {'title': 'Evaluations per fit:', 'name': 'max_nfev', 'type': 'int', 'value': 20, 'min': 1,
+                 'tip': 'Each fit starts from the previous parameters and is limited to this number of evaluations'},
+                {'title': 'Stop when stable:', 'name': 'stop_when_stable', 'type': 'bool', 'value': False,
+                 'tip': 'End the scan once the time constants are stable'},
+                {'title': 'Relative tolerance:', 'name': 'rtol', 'type': 'float', 'value': 0.01, 'min': 0.,
+                 'tip': 'The time constants are stable when they changed by less than this over the last fits'},
+                {'title': 'Stable fits:', 'name': 'n_stable', 'type': 'int', 'value': 10, 'min': 2},
+            ]},
+            {'title': '2D frames reduction:', 'name': 'reduction', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Reduce frames:', 'name': 'enabled', 'type': 'bool', 'value': False,
+                 'tip': 'Save the binned rows of the ROI of the 2D frames (dark subtracted, hot pixels masked)'
+                        ' instead of the frames, reductions run in a pool of processes'},
+                {'title': 'ROI first row:', 'name': 'row_start', 'type': 'int', 'value': 0, 'min': 0},
+                {'title': 'ROI last row:', 'name': 'row_stop', 'type': 'int', 'value': 0, 'min': 0,
+                 'tip': 'Excluded, 0 for all the rows after the first one'},
+                {'title': 'Dark frame file:', 'name': 'dark_file', 'type': 'browsepath', 'value': '',
+                 'filetype': True, 'tip': 'Numpy (.npy) file of the dark frame to be subtracted, empty for none'},
+                {'title': 'Hot pixels threshold:', 'name': 'hot_pixel_sigma', 'type': 'float', 'value': 0.,
+                 'min': 0., 'tip': 'Pixels of the dark frame deviating from their neighbours by more than this number'
+                                   ' of robust standard deviations are masked, 0 to mask none'},
+                {'title': 'Processes:', 'name': 'processes', 'type': 'int', 'value': 2, 'min': 0,
+                 'tip': 'Number of processes reducing the frames, 0 to reduce them in the acquisition thread'},
+                {'title': 'Keep raw frame every N:', 'name': 'raw_every', 'type': 'int', 'value': 0, 'min': 0,
+                 'tip': 'Also save the raw frames of one scan step out of N, 0 to save none'},
+            ]},
+            {'title': 'Reference data:', 'name': 'references', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Subtract references:', 'name': 'enabled', 'type': 'bool', 'value': False,
+                 'tip': 'Grab the detectors at the reference positions (pump-blocked or dark conditions) when the'
+                        ' references are stale and subtract them from the data of each scan step, the references'
+                        ' are saved so that the corrections can be redone (not for fly scans)'},
+                {'title': 'Reference positions:', 'name': 'positions', 'type': 'str', 'value': '',
+                 'tip': 'Positions of the actuators during the reference grabs, one per actuator separated with'
+                        ' commas, for instance a delay before time zero'},
+                {'title': 'Grabs per reference:', 'name': 'grabs', 'type': 'int', 'value': 1, 'min': 1,
+                 'tip': 'Number of grabs averaged into each reference'},
+                {'title': 'Every N points:', 'name': 'every_points', 'type': 'int', 'value': 0, 'min': 0,
+                 'tip': 'Take the references again after this number of scan points, 0 for no limit'},
+                {'title': 'Every T (s):', 'name': 'every_seconds', 'type': 'float', 'value': 60., 'min': 0.,
+                 'tip': 'Take the references again after this duration, 0 for no limit'},
+                {'title': 'On settings change:', 'name': 'on_settings', 'type': 'bool', 'value': True,
+                 'tip': 'Take the references again when the settings of a detector changed'},
+            ]},
+            {'title': 'Live data:', 'name': 'live', 'type': 'group', 'expanded': False, 'children': [
+                {'title': 'Coalesce:', 'name': 'coalesce', 'type': 'bool', 'value': False,
+                 'tip': 'Send the live data of several steps at once to the user interface, at most at the refresh'
+                        ' rate and only once the previous batch has been plotted'},
+                {'title': 'Refresh rate (Hz):', 'name': 'refresh_rate', 'type': 'float', 'value': 10., 'min': 0.},
+                {'title': 'Max pending steps:', 'name': 'max_pending', 'type': 'int', 'value': 1000, 'min': 1,
+                 'tip': 'Above this number of steps waiting for the user interface, the oldest ones are not'
+                        ' displayed (they are saved anyway)'},
+            ]},
+        ]},
+    ]
     
     def __init__(self, dockarea, dashboard):
         super().__init__(dockarea, dashboard)
+        self.ui.add_action('resume', 'Resume Scan', 'Refresh2', 'Resume the interrupted last scan of a file from its'
+                                                                ' checkpoint', menu=self.ui.action_menu)
+        self.ui.connect_action('resume', self.resume_scan)
+
+    def set_scan(self, scan=None) -> bool:
+        res = super().set_scan(scan)
+        if res and (self.settings['ta_options', 'averaging', 'early_stop'] or
+                    self.settings['ta_options', 'kinetic_fit', 'enabled']) and \
+                len(self.modules_manager.get_selected_probed_data('0D') +
+                    self.modules_manager.get_selected_probed_data('1D')) == 0:
+            messagebox(text="With early stopping or the live kinetic fit, you have to pick the 0D or 1D signal they"
+                            " use, see 'probe_data' in the modules selector panel")
+            self.ui.enable_start_stop(False)
+            return False
+        if res and self.scanner.scan_sub_type == Scan1DTAAdaptive.scan_subtype:
+            if len(self.modules_manager.get_selected_probed_data('0D') +
+                   self.modules_manager.get_selected_probed_data('1D')) == 0:
+                messagebox(text="In adaptive mode, you have to pick a 0D or 1D signal from which the algorithm will"
+                                " determine the next positions to scan, see 'probe_data' in the modules selector"
+                                " panel")
+                self.ui.enable_start_stop(False)
+                return False
+        return res
     
+    def resume_scan(self):
+        """Resume the interrupted last scan of a h5 file from its checkpoint
+
+        The settings of the scan and of the scanner are restored from the checkpoint, the same actuators and detectors
+        have to be selected. The acquisition then goes on from the step following the last checkpoint within the same
+        scan node.
+        """
+        try:
+            filename = gutils.select_file(start_path=self.h5saver.settings['current_h5_file'], save=False, ext='h5')
+            if filename == '' or filename is None:
+                return
+            if self.h5saver.h5_file is not None:
+                self.h5saver.close_file()
+            self.h5saver.init_file(addhoc_file_path=filename)
+            self.module_and_data_saver.h5saver = self.h5saver
+            scan_node = self.module_and_data_saver.get_last_node()
+            checkpoint = ScanCheckpoint.load(self.h5saver, scan_node) if scan_node is not None else None
+            if checkpoint is None:
+                messagebox(text=f'The last scan of {filename} has no checkpoint, it cannot be resumed')
+                return
+            if checkpoint.is_complete:
+                messagebox(text=f'The last scan of {filename} is complete, there is nothing to resume')
+                return
+            actuators = [act.title for act in self.modules_manager.actuators]
+            detectors = [det.title for det in self.modules_manager.detectors]
+            if actuators != checkpoint.actuators or detectors != checkpoint.detectors:
+                messagebox(text=f'Select the actuators {checkpoint.actuators} and the detectors'
+                                f' {checkpoint.detectors} of the interrupted scan to resume it')
+                return
+
+            scan_settings = ioxml.XML_string_to_pobject(checkpoint.scan_settings)
+            for name in ('scan_options', 'time_flow', 'ta_options'):
+                putils.set_param_from_param(self.settings.child(name), scan_settings.child(name))
+            self.scanner.set_scan_from_settings(ioxml.XML_string_to_pobject(checkpoint.scanner_settings),
+                                                ioxml.XML_string_to_pobject(checkpoint.scanner_parameters))
+            scan_node.attrs['scan_done'] = False  # so that start_scan goes on within this scan node
+            self.start_scan(resume=checkpoint)
+        except Exception as e:
+            logger.exception(str(e))
+
+    def _check_resume(self, checkpoint: ScanCheckpoint) -> bool:
+        """Check that the scan set from the restored settings is the one of the checkpoint"""
+        if len(self.scanner.positions) != checkpoint.npoints or \
+                self.settings['scan_options', 'scan_average'] != checkpoint.naverage:
+            messagebox(text=f'The restored scan has {len(self.scanner.positions)} points and'
+                            f' {self.settings["scan_options", "scan_average"]} averages instead of'
+                            f' {checkpoint.npoints} and {checkpoint.naverage}, it cannot be resumed')
+            return False
+        return True
+
     #Copy pasted from parent class, with scan_acquisition changed for my own class myDAQScanAcquisition
-    def start_scan(self):
+    def start_scan(self, resume: ScanCheckpoint = None):
         """
             Start an acquisition calling the set_scan function.
             Emit the command_DAQ signal "start_acquisition".
 
+            Parameters
+            ----------
+            resume: ScanCheckpoint
+                checkpoint of the interrupted last scan node to be resumed, None to start a new scan
+
             See Also
             --------
             set_scan
@@ -44,6 +274,8 @@ class mydaqscan(DAQScan):
             self.ui.get_action('move_at').trigger()
 
         res = self.set_scan()
+        if res and resume is not None:
+            res = self._check_resume(resume)
         if res:
             # deactivate module controls using remote_control
             if hasattr(self.dashboard, 'remote_manager'):
@@ -53,7 +285,8 @@ class mydaqscan(DAQScan):
             self.module_and_data_saver.h5saver = self.h5saver
             new_scan = self.module_and_data_saver.get_last_node().attrs['scan_done'] # get_last_node
             scan_node = self.module_and_data_saver.get_set_node(new=new_scan)
-            self.save_metadata(scan_node, 'scan_info')
+            if resume is None:
+                self.save_metadata(scan_node, 'scan_info')
 
             self._init_live()
 
@@ -71,11 +304,13 @@ class mydaqscan(DAQScan):
             scan_acquisition = myDAQScanAcquisition(self.settings, self.scanner, self.h5saver.settings,
                                                   self.modules_manager,
                                                   module_saver=self.module_and_data_saver)
+            scan_acquisition.set_resume(resume)
             
             if config['scan']['scan_in_thread']:
                 scan_acquisition.moveToThread(self.scan_thread)
             self.command_daq_signal[utils.ThreadCommand].connect(scan_acquisition.queue_command)
             scan_acquisition.scan_data_tmp[ScanDataTemp].connect(self.save_temp_live_data)
+            scan_acquisition.scan_data_batch[list, bool].connect(self.save_temp_live_batch)
             scan_acquisition.status_sig[list].connect(self.thread_status)
 
             self.scan_thread.scan_acquisition = scan_acquisition
@@ -87,17 +322,100 @@ class mydaqscan(DAQScan):
             if not self.settings['plot_options', 'plot_at_each_step']:
                 self.live_timer.start(self.settings['plot_options', 'refresh_live'])
             self.command_daq_signal.emit(utils.ThreadCommand('start_acquisition'))
-            self.ui.set_permanent_status('Running acquisition')
-            logger.info('Running acquisition')
+            self.ui.set_permanent_status('Resuming acquisition' if resume is not None else 'Running acquisition')
+            logger.info('Resuming acquisition' if resume is not None else 'Running acquisition')
+
+    def save_temp_live_batch(self, batch: List[ScanDataTemp], is_first: bool):
+        """Save a batch of coalesced scan steps in the live h5 file, then update the plots only once
+
+        Same as save_temp_live_data for each step, the acquisition is told when the batch has been processed. The
+        navigation axes are saved with the first step acquired (is_first), whatever its scan index.
+        """
+        try:
+            for ind, scan_data in enumerate(batch):
+                if is_first and ind == 0:
+                    nav_axes = self.scanner.get_nav_axes()
+                    Naverage = self.settings['scan_options', 'scan_average']
+                    if Naverage > 1:
+                        for nav_axis in nav_axes:
+                            nav_axis.index += 1
+                        nav_axes.append(data_mod.Axis('Average', data=np.linspace(0, Naverage - 1, Naverage),
+                                                      index=0))
+                    self.extended_saver.add_nav_axes(self.h5temp.raw_group, nav_axes)
+
+                self.extended_saver.add_data(self.h5temp.raw_group, scan_data.data, scan_data.indexes,
+                                             distribution=self.scanner.distribution)
+            if self.settings['plot_options', 'plot_at_each_step'] and len(batch) != 0:
+                self.update_live_plots()
+        except Exception as e:
+            logger.exception(str(e))
+        finally:
+            if self.scan_thread is not None:
+                self.scan_thread.scan_acquisition.acknowledge_live_data()
 
 
 class myDAQScanAcquisition(DAQScanAcquisition):
-    
+    scan_data_batch = Signal(list, bool)
+
     def __init__(self, scan_settings: Parameter = None, scanner: Scanner = None,
                  h5saver_settings: Parameter = None, modules_manager: ModulesManager = None,
                  module_saver: module_saving.ScanSaver = None):
         DAQScanAcquisition.__init__(self, scan_settings, scanner, h5saver_settings, modules_manager, module_saver)
+        if plugin_config['h5', 'optimized_layout']:
+            # same as the parent class but with a saver choosing the chunks and compression of the arrays
+            self.h5saver.close_file()
+            self.h5saver = LayoutH5Saver()
+            self.h5saver.settings.restoreState(h5saver_settings.saveState())
+            self.h5saver.init_file(addhoc_file_path=self.h5saver.settings['current_h5_file'])
+            self.h5saver.set_layout(H5Layout.from_config(self.scanner.get_scan_shape(), plugin_config['h5']))
+            self.module_and_data_saver.h5saver = self.h5saver
+        self._writer: ScanWriter = None
+        self._measured_positions: np.ndarray = None
+        self.isadaptive = self.scanner.scan_sub_type == Scan1DTAAdaptive.scan_subtype
+        self.isfly = False
+        self._fly_readbacks: list = []
+        self._fly_move_done = False
+        self._fly_pacer: FlyPacer = None
+        self._fly_tlast = 0.  # time of the last readback received
+        self._fly_acquired: np.ndarray = None
+        self._sampler: AdaptiveSampler1D = None
+        self._ring_arrays: dict = {}
+        self._ring_seqs: dict = {}  # last frame sequence number received from each ring buffer
+        self._ring_dropped: dict = {}
+        self._live: LiveDataCoalescer = None
+        self._profiler: StepProfiler = None
+        self._settle_readbacks: dict = {}
+        self._scan_order: np.ndarray = None
+        self._reducer: FrameReducer = None
+        self._reductions: list = []
+        self._reduced_arrays: dict = {}
+        self._raw_frames: np.ndarray = None
+        self._n_steps = 0
+        self._checkpoint: ScanCheckpoint = None
+        self._resume: ScanCheckpoint = None
+        self._early_stop: EarlyStopping = None
+        self._fitter: KineticFitWorker = None
+        self._references: ReferenceCache = None
+        self._reference_index: np.ndarray = None
+        self._reference_nodes: dict = {}
+        self._reference_history = None
+        self._settings_slot = None
+
+        # running statistics: the detectors only save the sampled raw sweeps
+        self._statistics: RunningStatistics = None
+        self._statistics_arrays: dict = {}
+        self.isrunning_stats = self.Naverage > 1 and self.scan_settings['ta_options', 'averaging', 'running']
+        if self.isrunning_stats:
+            self.scan_shape = list(self.scanner.get_scan_shape())
+            if self.scan_settings['ta_options', 'averaging', 'raw_every'] > 0:
+                self.scan_shape = [len(self._get_saved_averages())] + self.scan_shape
+            for det in self.modules_manager.detectors:
+                det.module_and_data_saver = module_saving.DetectorExtendedSaver(det, self.scan_shape)
+            self.module_and_data_saver.h5saver = self.h5saver
 
+    def set_resume(self, checkpoint: Union[ScanCheckpoint, None]):
+        """Set the checkpoint from which the next acquisition resumes the scan, None to start from the first step"""
+        self._resume = checkpoint
     
     def start_acquisition(self):
         ###Copy pasted from parent class
@@ -108,76 +426,171 @@ class myDAQScanAcquisition(DAQScanAcquisition):
             self.modules_manager.connect_detectors()
 
             self.stop_scan_flag = False
+            self._ring_arrays = {}
+            self._ring_seqs = {}
+            self._ring_dropped = {}
+            self._statistics_arrays = {}
+            self._reduced_arrays = {}
+            self._reference_nodes = {}
+            self._reference_history = None
+            self._reference_index = None
+            self._reductions = []
+            self._n_steps = 0
+            self._live = LiveDataCoalescer(self.scan_settings, self.scan_data_batch.emit,
+                                           refresh_rate=self.scan_settings['ta_options', 'live', 'refresh_rate'],
+                                           max_pending=self.scan_settings['ta_options', 'live', 'max_pending'])
+            if self.isrunning_stats:
+                self._statistics = RunningStatistics(self.scanner.get_scan_shape())
+
+            if self.scan_settings['ta_options', 'reduction', 'enabled']:
+                self._reducer = self._get_reducer()
+                self._reducer.start()
 
             Naxes = self.scanner.n_axes
             scan_type = self.scanner.scan_type
             self.navigation_axes = self.scanner.get_nav_axes()
-            self._actual_nav_axes = self.scanner.get_nav_axes()     #1st modif : init actual axes
-            for actual_axis in self._actual_nav_axes:
-                actual_axis.label = 'measured_' + actual_axis.label
-                actual_axis.data = self.scanner.positions.flatten()
+            # 1st modif: readback of the actuators at each step of each average, saved once at the end
+            self._measured_positions = np.full((self.Naverage, len(self.scanner.positions), Naxes), np.nan)
+            # pipelined scans only queue the data, the writer thread is timed on its own (see _save_writer_timings)
+            save_phase = 'enqueue' if self.scan_settings['ta_options', 'pipelined'] else 'save'
+            self._profiler = StepProfiler(['reference', 'move', 'wait_between', 'grab', save_phase, 'live',
+                                           'checkpoint', 'wait_step'], (self.Naverage, len(self.scanner.positions)))
+            if self.isadaptive:
+                self._sampler = self._get_sampler()
+            self.isfly = self.scan_settings['ta_options', 'fly_scan']
+            if self.isfly and (Naxes != 1 or self.isadaptive):
+                self.isfly = False
+                self.status_sig.emit(["Update_Status", "Fly scans are only possible for non adaptive 1D scans,"
+                                                       " using step by step acquisition", 'log'])
+            if self.isfly:
+                self._fly_acquired = np.zeros((self.Naverage, len(self.scanner.positions)), dtype=bool)
+            self._raw_frames = np.zeros((self.Naverage, len(self.scanner.positions)), dtype=bool) \
+                if self._reducer is not None else None
+            start_average, start_step = 0, 0
+            if self._resume is not None:
+                self._measured_positions = self._resume.measured.copy()
+                self._scan_order = self._resume.order
+                self._n_steps = self._resume.n_steps
+                self._restore_arrays()
+                start_average, start_step = self._resume.next_step()
+                self.status_sig.emit(["Update_Status", f"Resuming the scan at step {start_step} of average"
+                                                       f" {start_average}", 'log'])
+            else:
+                self._scan_order = self._get_scan_order()
+            self._early_stop = self._get_early_stopping()
+            self._fitter = self._get_kinetic_fit()
+            self._references = self._get_reference_cache()
+            self._checkpoint = self._get_checkpoint()
+            if isinstance(self.h5saver, LayoutH5Saver):
+                self.status_sig.emit(["Update_Status", self.h5saver.layout.describe(self.h5saver.backend), 'log'])
+            if self.scan_settings['ta_options', 'pipelined']:
+                # from now on the file is only accessed from the writer thread, until it is stopped
+                self._writer = ScanWriter(
+                    maxsize=self.scan_settings['ta_options', 'writer', 'queue_size'],
+                    flush_points=self.scan_settings['ta_options', 'writer', 'flush_points'],
+                    flush_interval=self.scan_settings['ta_options', 'writer', 'flush_interval'],
+                    flush=self.h5saver.flush,
+                    chunk_points=self._get_chunk_points if self.scan_settings['ta_options', 'writer',
+                                                                              'chunk_aligned'] else None,
+                    status=self._writer_status)
+                self._writer.start()
             self.status_sig.emit(["Update_Status", "Acquisition has started", 'log'])
 
             self.timeout_scan_flag = False
-            for ind_average in range(self.Naverage):
+            for ind_average in range(start_average, self.Naverage):
+                if self._early_stop is not None and self._early_stop.is_done() or self._is_fit_stable():
+                    break
                 self.ind_average = ind_average
-                self.ind_scan = -1
+                if self.isfly:
+                    self._fly_sweep()
+                    self._checkpoint_statistics()
+                    continue
+                sweep = self._get_sweep_order(ind_average)
+                if self._early_stop is not None:
+                    sweep = self._early_stop.pending(sweep)
+                    self.status_sig.emit(["Update_Status", f"Average {ind_average}: {len(sweep)} points above the"
+                                                           f" target", 'log'])
+                ind_step = start_step - 1 if ind_average == start_average else -1
                 while True:
-                    self.ind_scan += 1
+                    ind_step += 1
                     if not self.isadaptive:
-                        if self.ind_scan >= len(self.scanner.positions):
+                        if ind_step >= len(sweep):
                             break
+                        self.ind_scan = int(sweep[ind_step])  # scan index of the step, saving uses this one
                         positions = self.scanner.positions_at(self.ind_scan)  # get positions
                     else:
-                        pass
-                        #todo update for v4
-                        # positions = learner.ask(1)[0][-1]  # next point to probe
-                        # if self.scanner.scan_type == 'Tabular':  # translate normalized curvilinear position to real coordinates
-                        #     self.curvilinear = positions
-                        #     length = 0.
-                        #     for v in self.scanner.vectors:
-                        #         length += v.norm()
-                        #         if length >= self.curvilinear:
-                        #             vec = v
-                        #             frac_curvilinear = (self.curvilinear - (length - v.norm())) / v.norm()
-                        #             break
-                        #
-                        #     position = (vec.vectorize() * frac_curvilinear).translate_to(vec.p1()).p2()
-                        #     positions = [position.x(), position.y()]
+                        self.ind_scan = ind_step
+                        positions = self._ask_adaptive_positions()
+                        if positions is None:
+                            break
 
                     self.status_sig.emit(["Update_scan_index", [self.ind_scan, ind_average]])
 
                     if self.stop_scan_flag or self.timeout_scan_flag:
                         break
+                    if self._early_stop is not None and self._early_stop.is_timed_out() or self._is_fit_stable():
+                        break
+                    self._profiler.start_step(ind_average, self.ind_scan)
+                    if self._references is not None:
+                        self._update_references()
+                        self._profiler.mark('reference')
 
                     #move motors of modules and wait for move completion
+                    setpoints = positions
                     positions = self.modules_manager.order_positions(self.modules_manager.move_actuators(positions))
+                    self._profiler.mark('move')
 
-                    QThread.msleep(self.scan_settings['time_flow', 'wait_time_between'])
+                    if self.scan_settings['ta_options', 'settling', 'enabled']:
+                        positions = self._settle(setpoints, positions)
+                    else:
+                        QThread.msleep(self.scan_settings['time_flow', 'wait_time_between'])
+                    self._profiler.mark('wait_between')
 
                     #grab datas and wait for grab completion
-                    self.det_done(self.modules_manager.grab_datas(positions=positions), positions)
-
-                    if self.isadaptive:
-                        #todo update for v4
-                        # det_channel = self.modules_manager.get_selected_probed_data()
-                        # det, channel = det_channel[0].split('/')
-                        # if self.scanner.scan_type == 'Tabular':
-                        #     self.curvilinear_array.append(np.array([self.curvilinear]))
-                        #     new_positions = self.curvilinear
-                        # elif self.scanner.scan_type == 'Scan1D':
-                        #     new_positions = positions[0]
-                        # else:
-                        #     new_positions = positions[:]
-                        # learner.tell(new_positions, self.modules_manager.det_done_datas[det]['data0D'][channel]['data'])
-                        pass
+                    det_done_datas = self.modules_manager.grab_datas(positions=positions)
+                    self._profiler.mark('grab')
+                    self.det_done(det_done_datas, positions)
+                    self._update_checkpoint(ind_average, ind_step + 1)
+                    self._profiler.mark('checkpoint')
 
                     # daq_scan wait time
                     QThread.msleep(self.scan_settings.child('time_flow', 'wait_time').value())
-                    
-                #2nd modif
-                self.module_and_data_saver.add_nav_axes(self._actual_nav_axes)
-                
+                    self._profiler.mark('wait_step')
+
+                self._checkpoint_statistics()
+                self._update_checkpoint(force=True)
+                self._profiler.mark('checkpoint')  # counted in the last step of the average
+            self._collect_reductions(wait=True)
+            if self.isadaptive:
+                # positions of the adaptive scan are only known now
+                self._write(self._save_adaptive_axes, self._get_nav_axes(), self._measured_positions.copy())
+            if self._raw_frames is not None:
+                self._write(self._save_raw_frames, self._raw_frames.copy(), fill=True)
+            if self._statistics is not None:
+                self._write(self._save_statistics, self._statistics.snapshot(), self.ind_average + 1)
+            if self._early_stop is not None:
+                self._log_early_stopping()
+                self._write(self._save_early_stopping)
+            if self.isfly:
+                self._write(self._fill_missing_steps, self._fly_acquired)
+            if self._fitter is not None:
+                self._stop_kinetic_fit()
+                self._write(self._save_kinetic_fit, self._fitter.fit)
+            if self._references is not None:
+                self._stop_references()
+                self._write(self._save_reference_index, self._reference_index.copy())
+            self._write(self._save_measured_positions)
+            self._write(self._save_timings)
+            self.status_sig.emit(["Update_Status", self._profiler.format_summary(), 'log'])
+            for name, n_dropped in self._ring_dropped.items():
+                self.status_sig.emit(["Update_Status", f"{n_dropped} frames of the ring buffer {name} were dropped"
+                                                       f" during the scan", 'log'])
+            if self._writer is not None:
+                self._writer.stop()  # the file is accessed from this thread again
+                self._save_writer_timings(self._writer)
+            self._stop_writer()
+            self._stop_live()
+            self._stop_reducer()
             self.h5saver.flush()
             self.modules_manager.connect_actuators(False)
             self.modules_manager.connect_detectors(False)
@@ -187,45 +600,1099 @@ class myDAQScanAcquisition(DAQScanAcquisition):
 
         except Exception as e:
             logger.exception(str(e))
+            self._stop_writer()
+            self._stop_live()
+            self._stop_reducer()
+            self._stop_kinetic_fit()
+            self._stop_references()
             # self.status_sig.emit(["Update_Status", getLineInfo() + str(e), 'log'])
 
+    def _get_checkpoint(self) -> Union[ScanCheckpoint, None]:
+        """Get the checkpoint of the acquisition (the resumed one if any), None if checkpoints are disabled"""
+        if self.scan_settings['ta_options', 'checkpoint_points'] == 0:
+            return None
+        if self.isadaptive or self.isfly or self.isrunning_stats or self._early_stop is not None:
+            self.status_sig.emit(["Update_Status", "No checkpoint for adaptive, fly, running statistics and early"
+                                                   " stopping scans, they cannot be resumed", 'log'])
+            return None
+        if self._resume is not None:
+            return self._resume
+        checkpoint = ScanCheckpoint(self._measured_positions, self._scan_order,
+                                    scan_settings=ioxml.parameter_to_xml_string(self.scan_settings).decode(),
+                                    scanner_settings=ioxml.parameter_to_xml_string(self.scanner.settings).decode(),
+                                    scanner_parameters=ioxml.parameter_to_xml_string(
+                                        self.scanner.scanner.settings).decode(),
+                                    actuators=[act.title for act in self.modules_manager.actuators],
+                                    detectors=[det.title for det in self.modules_manager.detectors])
+        self._write(self._save_checkpoint, checkpoint, checkpoint.get_state(), None)
+        return checkpoint
+
+    def _get_early_stopping(self) -> Union[EarlyStopping, None]:
+        settings = self.scan_settings.child('ta_options', 'averaging')
+        if not settings['early_stop']:
+            return None
+        if self.isadaptive or self.isfly or self.Naverage == 1:
+            self.status_sig.emit(["Update_Status", "Early stopping is only possible for averaged step by step"
+                                                   " scans, all the averages are acquired", 'log'])
+            return None
+        return EarlyStopping(self.Naverage, len(self.scanner.positions), settings['target'],
+                             criterion=settings['criterion'], min_averages=settings['min_averages'],
+                             time_budget=settings['time_budget'])
+
+    def _get_kinetic_fit(self) -> Union[KineticFitWorker, None]:
+        settings = self.scan_settings.child('ta_options', 'kinetic_fit')
+        if not settings['enabled']:
+            return None
+        if self.scanner.n_axes != 1 or self.isfly:
+            self.status_sig.emit(["Update_Status", "The live kinetic fit is only possible for 1D step by step scans",
+                                  'log'])
+            return None
+        try:
+            fit = GlobalKineticFit(len(self.scanner.positions), [float(tau) for tau in settings['taus'].split(',')],
+                                   irf=settings['irf'], t0=settings['t0'], fit_irf=settings['fit_irf'],
+                                   max_nfev=settings['max_nfev'])
+        except ValueError as e:
+            self.status_sig.emit(["Update_Status", f"No live kinetic fit: {str(e)}", 'log'])
+            return None
+        refresh_rate = self.scan_settings['ta_options', 'live', 'refresh_rate']
+        fitter = KineticFitWorker(fit, min_interval=1 / refresh_rate if refresh_rate > 0 else 0.,
+                                  status=self._kinetic_fit_status)
+        fitter.start()
+        return fitter
+
+    def _kinetic_fit_status(self, fit: GlobalKineticFit):
+        self.status_sig.emit(["Update_Status", f"Kinetic fit ({fit.history[-1][0]} points): {fit.format()}"])
+
+    def _get_delay(self, position: float) -> float:
+        """Get the delay of an actuator position, converted in time by the scanner if it can"""
+        if hasattr(self.scanner.scanner, 'positions_to_delays'):
+            return float(self.scanner.scanner.positions_to_delays(position))
+        return position
+
+    def _is_fit_stable(self) -> bool:
+        """Tell if the scan should end because the time constants of the live kinetic fit are stable"""
+        settings = self.scan_settings.child('ta_options', 'kinetic_fit')
+        return self._fitter is not None and settings['stop_when_stable'] and \
+            self._fitter.fit.is_stable(settings['rtol'], settings['n_stable'])
+
+    def _stop_kinetic_fit(self):
+        """Stop the fitting worker and refit all the data to convergence"""
+        if self._fitter is not None and self._fitter.is_running:
+            self._fitter.stop()
+            fit = self._fitter.fit
+            if fit.fit(max_nfev=100 * fit.max_nfev):
+                self.status_sig.emit(["Update_Status", f"Kinetic fit: {fit.format()}"
+                                                       f"{' (stable)' if self._is_fit_stable() else ''}", 'log'])
+
+    def _save_kinetic_fit(self, fit: GlobalKineticFit):
+        """Save the time constants, the decay associated spectra and the history of the live kinetic fit"""
+        if fit.n_fits == 0:
+            return
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'KineticFit',
+                                           title='Global multi-exponential fit of the probed data')
+        metadata = dict(label='taus', taus_std=fit.taus_std.tolist(), t0=fit.t0, t0_std=fit.t0_std, irf=fit.irf,
+                        irf_std=fit.irf_std, fit_irf=fit.fit_irf, chi2=fit.chi2, n_fits=fit.n_fits)
+        self.h5saver.add_array(group, 'taus', DataType['data'], array_to_save=fit.taus, data_dimension='Data1D',
+                               title='taus', metadata=metadata)
+        self.h5saver.add_array(group, 'amplitudes', DataType['data'], array_to_save=fit.amplitudes,
+                               data_dimension='Data2D', title='decay associated spectra',
+                               metadata=dict(label='amplitudes'))
+        history = np.array([np.concatenate(([npoints], taus, taus_std)) for npoints, taus, taus_std in fit.history])
+        self.h5saver.add_array(group, 'history', DataType['data'], array_to_save=history, data_dimension='Data2D',
+                               title='history', metadata=dict(label='history',
+                                                              columns='points, taus, taus_std'))
+
+    def _get_reference_cache(self) -> Union[ReferenceCache, None]:
+        settings = self.scan_settings.child('ta_options', 'references')
+        if not settings['enabled']:
+            return None
+        if self.isfly:
+            self.status_sig.emit(["Update_Status", "No reference data for fly scans", 'log'])
+            return None
+        try:
+            positions = [float(position) for position in settings['positions'].split(',')]
+        except ValueError:
+            positions = []
+        if len(positions) != self.scanner.n_axes:
+            self.status_sig.emit(["Update_Status", f"No reference data: {self.scanner.n_axes} reference positions"
+                                                   f" are needed, one per actuator", 'log'])
+            return None
+        if self._reference_index is None:
+            self._reference_index = np.full((self.Naverage, len(self.scanner.positions)), -1, dtype=int)
+        references = ReferenceCache(every_points=settings['every_points'], every_seconds=settings['every_seconds'])
+        if self._reference_history is not None:
+            # resumed scan: the new references follow the saved ones in the history, taken again before the first step
+            references.index = self._reference_history.attrs['shape'][0] - 1
+            references.invalidate('resume')
+        if settings['on_settings']:
+            # slot of the acquisition object: queued and received in its thread through processEvents, as the
+            # settling readbacks, while the actuators are moved and the detectors grabbed
+            self._settings_slot = self._invalidate_references
+            for det in self.modules_manager.detectors:
+                det.settings.child('detector_settings').sigTreeStateChanged.connect(self._settings_slot)
+        return references
+
+    def _stop_references(self):
+        if self._settings_slot is not None:
+            for det in self.modules_manager.detectors:
+                try:
+                    det.settings.child('detector_settings').sigTreeStateChanged.disconnect(self._settings_slot)
+                except TypeError:
+                    pass
+            self._settings_slot = None
+
+    def _invalidate_references(self, param, changes):
+        """Make the reference data stale when a detector setting value changed"""
+        if self._references is not None and any(change == 'value' for _, change, _ in changes):
+            self._references.invalidate()
+
+    def _update_references(self):
+        """Grab the reference data at the reference positions if the current ones are stale"""
+        reason = self._references.staleness()
+        if reason == '':
+            return
+        settings = self.scan_settings.child('ta_options', 'references')
+        dte_act = data_mod.DataToExport('references', data=[
+            data_mod.DataActuator(act.title, data=float(position))
+            for act, position in zip(self.scanner.actuators, settings['positions'].split(','))])
+        readback = self.modules_manager.order_positions(self.modules_manager.move_actuators(dte_act))
+        QThread.msleep(self.scan_settings['time_flow', 'wait_time_between'])
+        grabs = []
+        for ind in range(settings['grabs']):
+            dte = self.modules_manager.grab_datas(positions=readback)
+            self._check_ring_sequence(dte)
+            grabs.append({dwa.get_full_name(): [np.array(array) for array in dwa.data] for dwa in dte
+                          if 'ring_buffer' not in dwa.extra_attributes})
+        references = ReferenceCache.average(grabs)
+        index = self._references.set(references)
+        self.status_sig.emit(["Update_Status", f"Reference data {index} taken ({reason})", 'log'])
+        self._write(self._save_references, references,
+                    [self._n_steps, self._profiler.elapsed] + [pos.data[0][0] for pos in readback])
+
+    def _correct_references(self, det_done_datas: data_mod.DataToExport) -> data_mod.DataToExport:
+        """Get copies of the grabbed data from which the current references are subtracted
+
+        The data of the detectors are left unchanged, the corrected copies are the ones saved, displayed and probed.
+        """
+        corrected = data_mod.DataToExport(det_done_datas.name, data=[
+            dwa if 'ring_buffer' in dwa.extra_attributes else
+            dwa.deepcopy_with_new_data(self._references.correct(dwa.get_full_name(), dwa.data), source=dwa.source,
+                                       keep_dim=True)
+            for dwa in det_done_datas])
+        self._reference_index[self.ind_average, self.ind_scan] = self._references.index
+        self._references.count()
+        return corrected
+
+    def _save_references(self, references: dict, history: List[float]):
+        """Append the reference data to their enlargeable arrays in the References group
+
+        The arrays are created with the first references, the data missing from later ones are NaN. The history holds
+        for each of them the number of steps already acquired, the time since the first step and the readback of the
+        actuators.
+        """
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'References',
+                                           title='Reference data subtracted from the detectors data')
+        if len(self._reference_nodes) == 0:
+            for key, arrays in references.items():
+                for ind, array in enumerate(arrays):
+                    self._reference_nodes[(key, ind)] = self.h5saver.add_array(
+                        group, f'Reference{len(self._reference_nodes):02d}', DataType['data'], data_shape=array.shape,
+                        array_type=array.dtype, data_dimension=f'Data{min(array.ndim, 2)}D', enlargeable=True,
+                        title=f'{key}/{ind}', metadata=dict(label=key, index=ind))
+            self._reference_history = self.h5saver.add_array(
+                group, 'History', DataType['data'], data_shape=(len(history),), array_type=np.float64,
+                data_dimension='Data1D', enlargeable=True, title='history',
+                metadata=dict(label='history', columns='steps, time (s), readback of the actuators'))
+        for (key, ind), node in self._reference_nodes.items():
+            array = references[key][ind] if key in references and len(references[key]) > ind else None
+            if array is None or array.shape != tuple(node.attrs['shape'][1:]):
+                array = np.full(node.attrs['shape'][1:], np.nan)
+            node.append(np.asarray(array, dtype=node.attrs['dtype']))
+        self._reference_history.append(np.array(history, dtype=float))
+
+    def _save_reference_index(self, index: np.ndarray):
+        """Save the index of the references subtracted at each step of each average, -1 for the steps not acquired
+
+        The array is created at the first call and overwritten at the next ones (checkpoints and end of the scan).
+        """
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'References',
+                                           title='Reference data subtracted from the detectors data')
+        if self.h5saver.is_node_in_group(group, 'Index'):
+            self.h5saver.get_node(group, 'Index')[:] = index
+        else:
+            self.h5saver.add_array(group, 'index', DataType['data'], array_to_save=index, data_dimension='Data2D',
+                                   title='reference index', metadata=dict(label='index'))
+
+    def _log_early_stopping(self):
+        early_stop = self._early_stop
+        converged = np.count_nonzero(early_stop.converged())
+        reason = 'time budget spent' if early_stop.is_timed_out() else \
+            'all points converged' if converged == early_stop.npoints else 'all averages done'
+        self.status_sig.emit(["Update_Status", f"Early stopping ({reason}): {converged}/{early_stop.npoints} points"
+                                               f" converged, {np.count_nonzero(early_stop.acquired)} steps acquired"
+                                               f" out of {early_stop.acquired.size} in {early_stop.elapsed():.0f} s",
+                              'log'])
+
+    def _save_early_stopping(self):
+        """Save the averages acquired at each scan point in the EarlyStopping group and mark the missing ones
+
+        The group holds the (Naverage, Npoints) acquired flags, the number of averages, the noise and the signal to
+        noise ratio of each scan point. The steps not acquired are NaN in the floating point data arrays of the
+        detectors, ring buffers and reduced frames (integer arrays keep zeros, see the acquired flags).
+        """
+        early_stop = self._early_stop
+        settings = self.scan_settings.child('ta_options', 'averaging')
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'EarlyStopping',
+                                           title='Averages acquired at each scan point')
+        metadata = dict(label='acquired', criterion=settings['criterion'], target=settings['target'],
+                        min_averages=settings['min_averages'], time_budget=settings['time_budget'],
+                        elapsed=early_stop.elapsed(), n_converged=int(np.count_nonzero(early_stop.converged())))
+        self.h5saver.add_array(group, 'acquired', DataType['data'], array_to_save=early_stop.acquired.astype(np.uint8),
+                               data_dimension='Data2D', title='acquired', metadata=metadata)
+        for name, array in (('count', early_stop.count), ('noise', early_stop.noise()), ('snr', early_stop.snr())):
+            self.h5saver.add_array(group, name, DataType['data'], array_to_save=array, data_dimension='Data1D',
+                                   title=name, metadata=dict(label=name))
+        self._fill_missing_steps(early_stop.acquired)
+
+    def _fill_missing_steps(self, acquired: np.ndarray, dim: str = None, attributes: dict = None):
+        """Write NaN at the steps not acquired in the floating point scan arrays of the detectors
+
+        Parameters
+        ----------
+        acquired: ndarray of bool
+            (Naverage, Npoints) flags of the steps acquired
+        dim: str
+            only fill the arrays of the detectors of this dimensionality (for instance 'Data2D'), None to fill those
+            of every detector, ring buffer and reduced frames
+        attributes: dict
+            attributes set to the filled arrays (integer arrays included)
+        """
+        saved = self._get_saved_averages()
+        missing = [(row, np.flatnonzero(np.logical_not(acquired[ind_average])))
+                   for row, ind_average in enumerate(saved) if not np.all(acquired[ind_average])]
+        if len(missing) == 0 and attributes is None:
+            return
+        scan_shape = tuple(self.scanner.get_scan_shape())
+        outer_shape = (len(saved),) + scan_shape if self.Naverage > 1 else scan_shape
+        for node in self.h5saver.walk_nodes(self.module_and_data_saver.module_group):
+            if not ('data_type' in node.attrs and node.attrs['data_type'] == 'data' and
+                    'ARRAY' in node.attrs['CLASS']):
+                continue
+            if dim is not None and not ('/Detector' in node.path and f'/{dim}/' in node.path):
+                continue
+            if not ('/Detector' in node.path or node.parent_node.name in ('RingBuffers', 'ReducedFrames')):
+                continue
+            if tuple(node.attrs['shape'][:len(outer_shape)]) != outer_shape:
+                continue
+            for key, value in (attributes or dict([])).items():
+                node.attrs[key] = value
+            if np.dtype(node.attrs['dtype']).kind != 'f':
+                continue
+            for row, ind_scans in missing:  # only the missing steps, not the whole average
+                for ind_scan in ind_scans:
+                    node[((row,) if self.Naverage > 1 else ()) +
+                         tuple(self.scanner.get_indexes_from_scan_index(ind_scan))] = np.nan
+
+    def _update_checkpoint(self, ind_average: int = None, ind_step: int = None, force: bool = False):
+        """Record the steps acquired and save the checkpoint every N points (or if forced)
+
+        Parameters
+        ----------
+        ind_average: int
+            the current average, None to only save the checkpoint
+        ind_step: int
+            the number of steps acquired during the sweep of the average
+        force: bool
+            save the checkpoint whatever the number of points since the last one
+        """
+        if self._checkpoint is None:
+            return
+        if ind_average is not None:
+            self._checkpoint.measured = self._measured_positions
+            self._checkpoint.set_step(ind_average, ind_step, self.ind_scan, self._n_steps)
+            force = force or ind_step % self.scan_settings['ta_options', 'checkpoint_points'] == 0
+        if force:
+            # the reduced frames of the steps have to be saved before the checkpoint tells they are acquired
+            self._collect_reductions(wait=True)
+            if self._references is not None:
+                self._write(self._save_reference_index, self._reference_index.copy())
+            if self._raw_frames is not None:
+                self._write(self._save_raw_frames, self._raw_frames.copy())
+            self._write(self._save_checkpoint, self._checkpoint, self._checkpoint.get_state(),
+                        [self._checkpoint.ind_average])
+
+    def _save_checkpoint(self, checkpoint: ScanCheckpoint, state: dict, averages: Union[List[int], None]):
+        """Save the checkpoint in the scan node and flush the file, so that the data of the steps are on disk"""
+        checkpoint.save(self.h5saver, self.module_and_data_saver.module_group, state, averages)
+        self.h5saver.flush()
+
+    def _restore_arrays(self):
+        """Get the arrays of the ring buffers, reduced frames and references already created in the resumed scan
+        node, and the index of the references subtracted at the steps already acquired"""
+        for group_name, arrays in (('RingBuffers', self._ring_arrays), ('ReducedFrames', self._reduced_arrays)):
+            if self.h5saver.is_node_in_group(self.module_and_data_saver.module_group, group_name):
+                group = self.h5saver.get_node(self.module_and_data_saver.module_group, group_name)
+                for name, node in group.children().items():
+                    if name == 'Raw_frames':
+                        if self._raw_frames is not None:
+                            self._raw_frames = np.array(node[:], dtype=bool)
+                    elif 'ARRAY' in node.attrs['CLASS']:
+                        arrays[node.title] = node
+        if self.h5saver.is_node_in_group(self.module_and_data_saver.module_group, 'References'):
+            group = self.h5saver.get_node(self.module_and_data_saver.module_group, 'References')
+            for name, node in group.children().items():
+                if name.startswith('Reference'):
+                    self._reference_nodes[(node.attrs['label'], int(node.attrs['index']))] = node
+                elif name == 'History':
+                    self._reference_history = node
+                elif name == 'Index':
+                    self._reference_index = np.array(node[:], dtype=int)
+
+    def _write(self, func, *args, **kwargs):
+        """Execute a h5 writing function in the background writer if pipelined saving is on, otherwise directly"""
+        if self._writer is not None:
+            self._writer.write(func, *args, n_points=0, **kwargs)
+        else:
+            func(*args, **kwargs)
+
+    def _fly_sweep(self):
+        """Sweep the actuator from the first to the last scan position while grabbing the detectors
+
+        With serpentine averages, odd averages sweep from the last to the first position. The frame of the first step
+        is grabbed at the start position before the sweep, the frame of each next step once the actuator reaches the
+        setpoint of the step, as estimated from its readbacks (see FlyPacer). Frames are saved at the scan index of
+        their step. The steps the actuator passed before they could be grabbed are
+        skipped, they are NaN in the saved data. Detector frames and actuator readbacks are timestamped independently
+        (timestamps of the data objects created by the plugins), the measured position of each frame is interpolated
+        from the readbacks at the end of the sweep.
+        """
+        actuator = self.modules_manager.actuators[0]
+        sweep = self._get_sweep_order(self.ind_average)
+        timeout = self.scan_settings['time_flow', 'timeout'] / 1000
+
+        self._fly_readbacks = []
+        self._fly_move_done = False
+        self._fly_pacer = FlyPacer(self.scanner.positions[sweep, 0])
+        actuator.current_value_signal.connect(self._fly_readback)
+        actuator.move_done_signal.connect(self._fly_done)
+        frame_times = np.full((len(self.scanner.positions),), np.nan)
+        sweeping = False
+        try:
+            # the modules manager may time out before the move back to the start is done (long sweeps): wait for the
+            # move done of the actuator itself
+            self.modules_manager.move_actuators(self.scanner.positions_at(int(sweep[0])))
+            if not self._wait_fly_move(timeout, self.scanner.positions[int(sweep[0]), 0]):
+                self.status_sig.emit(["Update_Status", f"Fly scan: the actuator did not reach the start of the"
+                                                       f" sweep, average {self.ind_average} skipped", 'log'])
+                return
+            self._fly_readbacks = self._fly_readbacks[-1:]  # the readbacks of the sweep only
+            self._fly_pacer = FlyPacer(self.scanner.positions[sweep, 0])
+            self._fly_pacer.add_readback(*self._fly_readbacks[-1])
+            self._fly_move_done = False
+
+            n_missed = 0
+            for ind_step, ind_scan in enumerate(sweep):
+                ind_scan = int(ind_scan)
+                self.ind_scan = ind_scan
+                self.status_sig.emit(["Update_scan_index", [self.ind_scan, self.ind_average]])
+                if self.stop_scan_flag or self.timeout_scan_flag:
+                    break
+                state = DUE if ind_step == 0 else self._wait_fly_step(ind_step, timeout)
+                if state == MISSED:
+                    n_missed += 1
+                    continue
+                elif state != DUE:
+                    break
+                tstart = time.time()
+                self._profiler.start_step(self.ind_average, ind_scan)
+                det_done_datas = self.modules_manager.grab_datas()
+                self._profiler.mark('grab')
+                timestamps = [dwa.timestamp for dwa in det_done_datas]
+                frame_times[ind_scan] = np.mean(timestamps) if len(timestamps) != 0 else tstart
+                self.det_done(det_done_datas, self.scanner.positions_at(ind_scan))
+                self._fly_acquired[self.ind_average, ind_scan] = True
+                if ind_step == 0:
+                    # the actuator stays at the start until the sweep is commanded
+                    start = (time.time(), self._fly_readbacks[-1][1])
+                    self._fly_readbacks.append(start)
+                    self._fly_pacer.add_readback(*start)
+                    actuator.move_abs(self.scanner.positions_at(int(sweep[-1]))[0])
+                    sweeping = True
+            if n_missed != 0:
+                self.status_sig.emit(["Update_Status", f"Fly scan: {n_missed} steps skipped during average"
+                                                       f" {self.ind_average}, the actuator is too fast for the"
+                                                       f" detectors", 'log'])
+        finally:
+            if sweeping and not self._fly_move_done:
+                if self.stop_scan_flag or self.timeout_scan_flag:
+                    actuator.stop_motion()
+                self._wait_fly_move(timeout)
+            actuator.current_value_signal.disconnect(self._fly_readback)
+            actuator.move_done_signal.disconnect(self._fly_done)
+
+        if len(self._fly_readbacks) != 0:
+            readbacks = np.array(sorted(self._fly_readbacks))
+            # the actuator stays at its last readback once its move is done
+            self._measured_positions[self.ind_average, :, 0] = np.interp(
+                frame_times, readbacks[:, 0], readbacks[:, 1], left=np.nan,
+                right=readbacks[-1, 1] if self._fly_move_done else np.nan)
+
+    def _wait_fly_step(self, ind_step: int, timeout: float) -> str:
+        """Wait for the actuator to reach the setpoint of a step of the sweep, as long as it sends readbacks
+
+        Returns
+        -------
+        str: the state of the step (see FlyPacer), an empty string if the scan was stopped or on timeout
+        """
+        self._fly_tlast = time.perf_counter()
+        while not (self.stop_scan_flag or self.timeout_scan_flag):
+            QtWidgets.QApplication.processEvents()  # receive the readbacks
+            state = self._fly_pacer.state(ind_step)
+            if state != WAIT:
+                return state
+            if time.perf_counter() - self._fly_tlast > timeout:
+                self.status_sig.emit(["Update_Status", f"Fly scan: the actuator did not reach the step {ind_step}"
+                                                       f" of the sweep", 'log'])
+                break
+            QThread.msleep(1)
+        return ''
+
+    def _wait_fly_move(self, timeout: float, target: float = None) -> bool:
+        """Wait for the move done of the actuator of the fly scan, as long as it sends readbacks
+
+        Parameters
+        ----------
+        timeout: float
+            maximum time in seconds without readback
+        target: float
+            if given, the move done signals of the actuator away from the target (late ones of a previous move) are
+            ignored
+
+        Returns
+        -------
+        bool: True if the move is done
+        """
+        actuator = self.modules_manager.actuators[0]
+        self._fly_tlast = time.perf_counter()
+        while time.perf_counter() - self._fly_tlast < timeout:
+            QtWidgets.QApplication.processEvents()  # receive the readbacks and the move done signal
+            if self._fly_move_done and target is not None and \
+                    abs(self._fly_readbacks[-1][1] - target) > actuator.settings['move_settings', 'epsilon']:
+                self._fly_move_done = False
+            if self._fly_move_done:
+                return True
+            QThread.msleep(10)
+        return False
+
+    def _get_scan_order(self) -> np.ndarray:
+        """Get the scan indexes in the order they are acquired, minimizing the travel time if asked for"""
+        order = np.arange(len(self.scanner.positions))
+        if self.scan_settings['ta_options', 'ordering'] == 'Minimal travel time' and not self.isadaptive and \
+                not self.isfly:
+            scheduler = PointScheduler(self._get_motion_models())
+            order = scheduler.schedule(self.scanner.positions)
+            self.status_sig.emit(["Update_Status", f"Estimated travel time: "
+                                                   f"{scheduler.travel_time(self.scanner.positions):.1f} s in scan"
+                                                   f" order, {scheduler.travel_time(self.scanner.positions, order):.1f}"
+                                                   f" s in the optimized order", 'log'])
+        return order
+
+    def _get_motion_models(self) -> List[MotionModel]:
+        """Get the motion model of each actuator from the plugin configuration (default model if not specified)"""
+        motion = plugin_config['motion']
+        return [MotionModel.from_dict(motion.get('actuators', dict([])).get(act.title, motion['default']))
+                for act in self.modules_manager.actuators]
+
+    def _get_sweep_order(self, ind_average: int) -> np.ndarray:
+        """Get the scan indexes in the order they are acquired during the given average"""
+        order = self._scan_order if self._scan_order is not None else np.arange(len(self.scanner.positions))
+        return sweep_order(order, ind_average, self.scan_settings['ta_options', 'serpentine'])
+
+    def _fly_readback(self, value: data_mod.DataActuator):
+        self._fly_tlast = time.perf_counter()
+        self._fly_readbacks.append((value.timestamp, value.value()))
+        self._fly_pacer.add_readback(value.timestamp, value.value())
+
+    def _fly_done(self, value: data_mod.DataActuator):
+        self._fly_readback(value)
+        self._fly_pacer.stop()
+        self._fly_move_done = True
+
+    def _settle(self, setpoints: data_mod.DataToExport,
+                readbacks: data_mod.DataToExport) -> data_mod.DataToExport:
+        """Wait for the readbacks of the actuators to settle within tolerance of their setpoints
+
+        The readbacks are polled every poll interval until they have stayed within the tolerance during the stable
+        window, so that the wait scales with the actual move. After the timeout the scan continues anyway.
+
+        Returns
+        -------
+        DataToExport: the last readbacks of the actuators, ordered as the actuators of the modules manager
+        """
+        settings = self.scan_settings.child('ta_options', 'settling')
+        actuators = self.modules_manager.actuators
+        self._settle_readbacks = {dwa.name: dwa for dwa in readbacks}
+        targets = np.array([setpoints.get_data_from_name(act.title).value() for act in actuators])
+        if settings['tolerance'] > 0:
+            tolerances = settings['tolerance']
+        else:
+            tolerances = [act.settings['move_settings', 'epsilon'] for act in actuators]
+        monitor = SettlingMonitor(tolerances, window=settings['window'] / 1000, timeout=settings['timeout'] / 1000)
+
+        for act in actuators:
+            act.current_value_signal.connect(self._settle_readback)
+        try:
+            while not self.stop_scan_flag:
+                values = np.array([self._settle_readbacks[act.title].value() for act in actuators])
+                if monitor.update(values - targets):
+                    break
+                if monitor.is_timed_out():
+                    self.status_sig.emit(["Update_Status", f"Actuators not settled after {settings['timeout']} ms"
+                                                           f" at scan index {self.ind_scan}", 'log'])
+                    break
+                for act in actuators:
+                    act.get_actuator_value()
+                QThread.msleep(settings['poll_interval'])
+                QtWidgets.QApplication.processEvents()
+        finally:
+            for act in actuators:
+                act.current_value_signal.disconnect(self._settle_readback)
+
+        return self.modules_manager.order_positions(
+            data_mod.DataToExport('actuators', data=[self._settle_readbacks[act.title] for act in actuators]))
+
+    def _settle_readback(self, value: data_mod.DataActuator):
+        self._settle_readbacks[value.name] = value
+
+    def _get_nav_axes(self) -> List[data_mod.Axis]:
+        nav_axes = self.scanner.get_nav_axes()
+        averages = self._get_saved_averages()
+        if self.Naverage > 1 and len(averages) != 0:
+            for nav_axis in nav_axes:
+                nav_axis.index += 1
+            nav_axes.append(data_mod.Axis('Average', data=averages.astype(float), index=0))
+        return nav_axes
+
+    def _save_adaptive_axes(self, nav_axes: List[data_mod.Axis], measured: np.ndarray):
+        """Save (or overwrite) the navigation axes of an adaptive scan once all its positions are known
+
+        The positions not measured in the first average (end of the point budget not reached, stopped scan) are NaN
+        in the position axis and the steps not acquired are NaN in the floating point arrays of the detectors. The
+        number of positions measured is the measured attribute of the axis.
+        """
+        acquired = np.logical_not(np.isnan(measured[..., 0]))
+        nav_axes[0].data = np.where(acquired[0], nav_axes[0].get_data(), np.nan)
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, SPECIAL_GROUP_NAMES['nav_axes'])
+        if len(self.h5saver.get_children(group)) == 0:
+            self.module_and_data_saver.add_nav_axes(nav_axes)
+        nodes = {node.attrs['label']: node for node in self.h5saver.walk_nodes(group)
+                 if 'ARRAY' in node.attrs['CLASS']}
+        for nav_axis in nav_axes:
+            nodes[nav_axis.label][...] = nav_axis.get_data()
+        nodes[nav_axes[0].label].attrs['measured'] = int(np.count_nonzero(acquired[0]))
+        self._fill_missing_steps(acquired)
+
+    def _get_saved_averages(self) -> np.ndarray:
+        """Get the indexes of the averages whose raw data are saved by the detectors"""
+        if not self.isrunning_stats:
+            return np.arange(self.Naverage)
+        raw_every = self.scan_settings['ta_options', 'averaging', 'raw_every']
+        return np.arange(0, self.Naverage, raw_every) if raw_every > 0 else np.array([], dtype=int)
+
+    def _get_save_indexes(self, scan_indexes: tuple) -> Union[tuple, None]:
+        """Get the indexes where the detectors save the data of the current step, None if they should not save them"""
+        if self.Naverage == 1:
+            return scan_indexes
+        averages = self._get_saved_averages()
+        if self.ind_average not in averages:
+            return None
+        return (int(np.searchsorted(averages, self.ind_average)),) + scan_indexes
+
+    def _update_statistics(self, scan_indexes: tuple, det_done_datas: data_mod.DataToExport, ring_slots: list):
+        """Add the data of the current step (and the frames of the ring buffers) to the running statistics"""
+        for dwa in det_done_datas:
+            if 'ring_buffer' not in dwa.extra_attributes and \
+                    not (self._reducer is not None and dwa.dim == data_mod.DataDim['Data2D']):
+                for ind, array in enumerate(dwa.data):
+                    self._statistics.update(scan_indexes, f'{dwa.get_full_name()}/CH{ind:02d}', array)
+        for name, slot in ring_slots:
+            self._statistics.update(scan_indexes, f'{name}/RingBuffer', slot.data)
+
+    def _checkpoint_statistics(self):
+        """Save the running statistics every N completed averages, the last one is saved at the end of the scan"""
+        self._collect_reductions(wait=True)
+        n_averages = self.ind_average + 1
+        if self._statistics is not None and n_averages < self.Naverage and \
+                n_averages % self.scan_settings['ta_options', 'averaging', 'checkpoint_every'] == 0:
+            self._write(self._save_statistics, self._statistics.snapshot(), n_averages)
+
+    def _save_statistics(self, statistics: dict, n_averages: int):
+        """Save (or overwrite) the running statistics of each channel in the RunningStatistics group
+
+        Each channel gets a group holding its Mean, Variance (NaN where less than two averages) and Count arrays,
+        with the scan shape prepended to the data shape.
+        """
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'RunningStatistics',
+                                           title='Running statistics over the averages')
+        for name, values in statistics.items():
+            if name not in self._statistics_arrays:
+                channel_group = self.h5saver.get_set_group(group, f'Channel{len(self._statistics_arrays):03d}',
+                                                           title=name)
+                arrays = []
+                for array_name, array in zip(('mean', 'variance', 'count'), values):
+                    ndim = array.ndim - len(self._statistics.scan_shape)
+                    dim = 'Data0D' if ndim == 1 and array.shape[-1] == 1 else f'Data{min(ndim, 2)}D'
+                    arrays.append(self.h5saver.add_array(channel_group, array_name, DataType['data'],
+                                                         array_to_save=array, data_dimension=dim,
+                                                         title=f'{name}/{array_name}',
+                                                         metadata=dict(label=name, statistic=array_name)))
+                self._statistics_arrays[name] = arrays
+            else:
+                for array, value in zip(self._statistics_arrays[name], values):
+                    array[...] = value
+            for array in self._statistics_arrays[name]:
+                array.attrs['n_averages'] = n_averages
+        if self._writer is None:
+            self.h5saver.flush()
+
+    def _get_sampler(self) -> AdaptiveSampler1D:
+        settings = self.scanner.scanner.settings
+        return AdaptiveSampler1D((settings['start'], settings['stop']), max_points=settings['max_points'],
+                                 loss_goal=settings['loss_goal'], curvature_weight=settings['curvature_weight'],
+                                 uncertainty_weight=settings['uncertainty_weight'], min_step=settings['min_step'])
+
+    def _ask_adaptive_positions(self) -> Union[data_mod.DataToExport, None]:
+        """Get the positions of the current step of an adaptive scan, None if the scan is done
+
+        The positions are chosen by the sampler during the first average (after the initial grid), the next averages
+        measure the same positions again.
+        """
+        if self.ind_scan >= len(self.scanner.positions):
+            return None
+        if self.ind_average == 0 and self.ind_scan >= self.scanner.scanner.n_init:
+            if self._sampler.done():
+                self.status_sig.emit(["Update_Status", f'Adaptive scan done after {self.ind_scan} points,'
+                                                       f' loss: {self._sampler.loss():.3g}', 'log'])
+                return None
+            self.scanner.scanner.set_position(self.ind_scan, self._sampler.ask())
+        elif np.isnan(self.scanner.positions[self.ind_scan, 0]):
+            return None
+        return self.scanner.positions_at(self.ind_scan)
+
+    def _get_probed_values(self, det_done_datas: data_mod.DataToExport) -> np.ndarray:
+        """Get the values of the probed 0D (or 1D if none) data used by the adaptive sampler"""
+        full_names = self.modules_manager.get_selected_probed_data('0D')
+        if len(full_names) == 0:
+            full_names = self.modules_manager.get_selected_probed_data('1D')
+        dte = det_done_datas.get_data_from_full_names(full_names, deepcopy=False)
+        return np.concatenate([np.ravel(array) for dwa in dte for array in dwa.data])
+
+    def _save_measured_positions(self):
+        """Save the actuators readback of all averages and their deviation from the setpoints in the scan node
+
+        For each actuator, a (Naverage, Npoints) array of the measured positions is saved together with a float32
+        array of the deviation (measured - setpoint) within the MeasuredPositions group. Points not acquired (stopped
+        scan) are NaN. The arrays of a resumed scan are overwritten.
+        """
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'MeasuredPositions',
+                                           title='Readback of the actuators at each step')
+        setpoints = self.scanner.positions.reshape((len(self.scanner.positions), -1))
+        for ind_axis, actuator in enumerate(self.modules_manager.actuators):
+            measured = self._measured_positions[..., ind_axis]
+            metadata = dict(label=f'measured_{actuator.title}', units=actuator.units, actuator=actuator.title)
+            self._set_array(group, f'measured{ind_axis:02d}', measured, data_dimension='Data2D',
+                            title=f'measured_{actuator.title}', metadata=metadata)
+            metadata['label'] = f'deviation_{actuator.title}'
+            self._set_array(group, f'deviation{ind_axis:02d}', (measured - setpoints[:, ind_axis]).astype(np.float32),
+                            data_dimension='Data2D', title=f'deviation_{actuator.title}', metadata=metadata)
+
+    def _save_timings(self):
+        """Save the duration of each phase of every step in the Timing group of the scan node
+
+        The durations array has a (Naverage, Npoints, Nphases) shape (float32, in seconds, NaN for phases not
+        measured), the phases (along its phase_axis) and the summary are saved as its attributes. The start time of
+        each step relative to the start of the scan is saved as well. When a scan is resumed, the saved values of the
+        steps acquired before the interruption are kept.
+        """
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'Timing',
+                                           title='Duration of each phase of the scan steps')
+        metadata = dict(phases=','.join(self._profiler.phases), phase_axis=2, units='s',
+                        dead_time_fraction=self._profiler.dead_time_fraction())
+        for phase, (mean, p95, max_) in self._profiler.summary().items():
+            metadata[f'{phase}_mean'] = mean
+            metadata[f'{phase}_p95'] = p95
+            metadata[f'{phase}_max'] = max_
+        durations = self._profiler.durations.astype(np.float32)
+        self._set_array(group, 'durations', durations, data_dimension=f'Data{min(durations.ndim, 2)}D',
+                        title='durations', metadata=metadata, keep_missing=True)
+        start_times = self._profiler.start_times
+        self._set_array(group, 'start_times', start_times, data_dimension=f'Data{min(start_times.ndim, 2)}D',
+                        title='start_times', metadata=dict(units='s'), keep_missing=True)
+
+    def _save_writer_timings(self, writer: ScanWriter):
+        """Log the time spent by the writer thread of a pipelined scan and save it as attributes of the durations
+
+        The step phases only measure the time to queue the data (enqueue phase), the writes are done by batches in
+        the writer thread.
+        """
+        mean_latency = writer.write_time / writer.n_batches if writer.n_batches != 0 else 0.
+        self.status_sig.emit(["Update_Status", f"Writer: {writer.n_points_written} points written in"
+                                               f" {writer.n_batches} batches, {writer.write_time:.2f} s (mean/max"
+                                               f" batch {mean_latency * 1000:.1f}/{writer.max_latency * 1000:.1f}"
+                                               f" ms)", 'log'])
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'Timing',
+                                           title='Duration of each phase of the scan steps')
+        durations = self.h5saver.get_node(group, 'Durations')
+        durations.attrs['writer_points'] = writer.n_points_written
+        durations.attrs['writer_batches'] = writer.n_batches
+        durations.attrs['writer_time'] = writer.write_time
+        durations.attrs['writer_max_latency'] = writer.max_latency
+
+    def _set_array(self, group, name: str, array: np.ndarray, data_dimension: str, title: str, metadata: dict,
+                   keep_missing=False):
+        """Save a data array in a group, or overwrite it if it already exists (resumed scan)
+
+        Parameters
+        ----------
+        keep_missing: bool
+            when overwriting, keep the saved values where the new array is NaN (steps of the interrupted run)
+        """
+        node_name = utils.capitalize(name)
+        if not self.h5saver.is_node_in_group(group, node_name):
+            self.h5saver.add_array(group, name, DataType['data'], array_to_save=array, data_dimension=data_dimension,
+                                   title=title, metadata=metadata)
+            return
+        node = self.h5saver.get_node(group, node_name)
+        if keep_missing:
+            array = np.where(np.isnan(array), node[...], array)
+        node[...] = array
+        for key, value in metadata.items():
+            node.attrs[key] = value
+
+    def _stop_writer(self):
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+
+    def _stop_live(self):
+        """Send the remaining live data and stop following the plot settings"""
+        if self._live is not None:
+            self._live.emit_if_due(force=True)
+            self._live.disconnect()
+            if self._live.n_dropped != 0:
+                self.status_sig.emit(["Update_Status", f'{self._live.n_dropped} steps were not displayed to keep up'
+                                                       f' with the acquisition', 'log'])
+
+    def acknowledge_live_data(self):
+        """Called by the user interface once a batch of live data has been processed"""
+        if self._live is not None:
+            self._live.acknowledge()
+
+    def _writer_status(self, n_points: int, latency: float, queue_depth: int):
+        self.status_sig.emit(["Update_Status", f'Writer: {n_points} points written in {latency * 1000:.1f} ms,'
+                                               f' queue depth: {queue_depth}'])
+
+    def _get_chunk_points(self):
+        """Get the number of scan points within a chunk of the largest data array of the current scan node"""
+        chunk_points = None
+        max_size = 0
+        for node in self.h5saver.walk_nodes(self.module_and_data_saver.module_group):
+            if 'data_type' in node.attrs and node.attrs['data_type'] == 'data' and 'ARRAY' in node.attrs['CLASS']:
+                chunkshape = node.node.chunkshape if self.h5saver.backend == 'tables' else node.node.chunks
+                size = np.prod(node.attrs['shape']) * np.dtype(node.attrs['dtype']).itemsize
+                if chunkshape is not None and size > max_size:
+                    max_size = size
+                    chunk_points = int(chunkshape[len(self.scan_shape) - 1])
+        return chunk_points
 
     def det_done(self, det_done_datas: data_mod.DataToExport, positions):
         ###Copy pasted from the parent class.
         try:
-            indexes = self.scanner.get_indexes_from_scan_index(self.ind_scan)
+            if self._references is not None:
+                det_done_datas = self._correct_references(det_done_datas)
+            scan_indexes = tuple(self.scanner.get_indexes_from_scan_index(self.ind_scan))
+            indexes = scan_indexes
             if self.Naverage > 1:
                 indexes = [self.ind_average] + list(indexes)
             indexes = tuple(indexes)
-            if self.ind_scan == 0:
-                nav_axes = self.scanner.get_nav_axes()
-                if self.Naverage > 1:
-                    for nav_axis in nav_axes:
-                        nav_axis.index += 1
-                    nav_axes.append(data_mod.Axis('Average', data=np.linspace(0, self.Naverage - 1, self.Naverage),
-                                                  index=0))
-                #self.module_and_data_saver.add_nav_axes(nav_axes)
-            for actual_nav_axis, pos in zip(self._actual_nav_axes, positions):
-                actual_nav_axis.data[self.ind_scan] = pos.data[0][0]  #my modif
-            self.module_and_data_saver.add_data(indexes=indexes, distribution=self.scanner.distribution)
-
-            #todo related to adaptive (solution lies along the Enlargeable data saver)
+            save_indexes = self._get_save_indexes(scan_indexes)  # indexes within the arrays of the detectors
+            if self.ind_scan == 0 and self.ind_average == 0 and not self.isadaptive:
+                self._write(self.module_and_data_saver.add_nav_axes, self._get_nav_axes())
+            for ind_axis, pos in enumerate(positions):
+                self._measured_positions[self.ind_average, self.ind_scan, ind_axis] = pos.data[0][0]  #my modif
+            ring_slots = self._get_ring_slots(det_done_datas)
+            if self._reducer is not None:
+                self._submit_reductions(det_done_datas, scan_indexes, save_indexes)
+            if self._statistics is not None:
+                self._update_statistics(scan_indexes, det_done_datas, ring_slots)
+            for name, slot in ring_slots:
+                # not batched: the slot has to be released as soon as possible for the detector to go on
+                if save_indexes is None:
+                    slot.release()
+                elif self._writer is not None:
+                    self._writer.submit(self._save_ring_frame, name, save_indexes, slot)
+                else:
+                    self._save_ring_frame(name, save_indexes, slot)
+
             if self.isadaptive:
-                for ind_ax, nav_axis in enumerate(self.navigation_axes):
-                    nav_axis.append(np.array(positions[ind_ax]))
+                self._sampler.tell(self.scanner.positions[self.ind_scan, 0], self._get_probed_values(det_done_datas))
+            if self._early_stop is not None:
+                self._early_stop.update(self.ind_average, self.ind_scan, self._get_probed_values(det_done_datas))
+            if self._fitter is not None:
+                self._fitter.tell(self.ind_scan, self._get_delay(positions[0].data[0][0]),
+                                  self._get_probed_values(det_done_datas))
+
+            if self._writer is not None:
+                if save_indexes is not None:
+                    self._writer.write(self._save_steps, save_indexes,
+                                       self._get_data_to_save(det_done_datas, save_indexes), merge=True)
+                self._profiler.mark('enqueue')
+                self._writer.submit(self._emit_live_data, self.ind_scan, indexes, det_done_datas)
+            else:
+                if save_indexes is not None and (self._reducer is not None or self._references is not None):
+                    # the detectors would save their own data: frames not reduced, references not subtracted
+                    self._save_data(save_indexes, self._get_data_to_save(det_done_datas, save_indexes))
+                elif save_indexes is not None:
+                    self.module_and_data_saver.add_data(indexes=save_indexes, distribution=self.scanner.distribution)
+                self._profiler.mark('save')
+                self._emit_live_data(self.ind_scan, indexes, det_done_datas)
+            self._profiler.mark('live')
+            self._n_steps += 1
 
             self.det_done_flag = True
 
-            full_names: list = self.scan_settings['plot_options', 'plot_0d']['selected'][:]
-            full_names.extend(self.scan_settings['plot_options', 'plot_1d']['selected'][:])
-            data_temp = det_done_datas.get_data_from_full_names(full_names, deepcopy=False)
+        except Exception as e:
+            logger.exception(str(e))
+
+    def _check_ring_sequence(self, dte: data_mod.DataToExport):
+        """Warn when frames of a ring buffer were dropped since the previous grab
+
+        Each grab of a detector commits exactly one frame, so the sequence numbers received from a ring buffer
+        should follow each other. The viewers overwrite the oldest frames when their buffer is full (so that live
+        grabs never block): a gap means frames were lost.
+        """
+        for dwa in dte:
+            if 'ring_buffer' in dwa.extra_attributes:
+                seq = int(dwa.data[0][0])
+                last = self._ring_seqs.get(dwa.ring_buffer)
+                if last is not None and seq > last + 1:
+                    n_dropped = seq - last - 1
+                    self._ring_dropped[dwa.ring_buffer] = self._ring_dropped.get(dwa.ring_buffer, 0) + n_dropped
+                    logger.warning(f'{n_dropped} frames of the ring buffer {dwa.ring_buffer} dropped between frames'
+                                   f' {last} and {seq}')
+                    self.status_sig.emit(["Update_Status", f"{n_dropped} frames of the ring buffer"
+                                                           f" {dwa.ring_buffer} dropped before step {self.ind_scan}"
+                                                           f" of average {self.ind_average}", 'log'])
+                self._ring_seqs[dwa.ring_buffer] = seq
+
+    def _get_ring_slots(self, det_done_datas: data_mod.DataToExport) -> List[tuple]:
+        """Get views on the ring buffer frames whose sequence numbers were emitted by the detectors
+
+        Returns
+        -------
+        list of tuple: (name of the ring buffer, Slot), the slots have to be released once their frame is saved
+        """
+        self._check_ring_sequence(det_done_datas)
+        slots = []
+        for dwa in det_done_datas:
+            if 'ring_buffer' in dwa.extra_attributes:
+                try:
+                    slots.append((dwa.ring_buffer, get_ring_buffer(dwa.ring_buffer).get(int(dwa.data[0][0]),
+                                                                                        timeout=1.)))
+                except Exception as e:
+                    logger.exception(str(e))
+        return slots
+
+    def _save_ring_frame(self, name: str, indexes: tuple, slot: Slot):
+        """Save a ring buffer frame at the given indexes of its array in the RingBuffers group and release its slot
+
+        The array of each ring buffer is created at its first frame with the scan shape prepended to the frame shape.
+        """
+        try:
+            array = self._ring_arrays.get(name)
+            if array is None:
+                group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'RingBuffers',
+                                                   title='Frames of the detectors ring buffers')
+                array = self.h5saver.add_array(group, name, DataType['data'], data_shape=slot.data.shape,
+                                               array_type=slot.data.dtype,
+                                               data_dimension=f'Data{min(len(slot.data.shape), 2)}D',
+                                               scan_shape=self.scan_shape, add_scan_dim=True, title=name,
+                                               metadata=dict(label=name, ring_buffer=name))
+                self._ring_arrays[name] = array
+            array[indexes] = slot.data
+        except Exception as e:
+            logger.exception(str(e))
+        finally:
+            slot.release()
+
+    def _get_data_to_save(self, det_done_datas: data_mod.DataToExport, indexes: tuple) -> List[tuple]:
+        """Get copies of the data of the current step to be saved by each detector at the given indexes
+
+        The data grabbed from each detector are copied, they are saved later by the writer while the detectors reuse
+        their own objects. They are filtered as the detectors do before saving: only the raw ones if set in the saver
+        and not those whose save attribute is False. When the 2D frames are reduced, they are removed from the saved
+        data except at one scan step out of N. The background of the detectors is saved with the step at the first
+        indexes.
+
+        Returns
+        -------
+        list of tuple: (detector, DataToExport, background DataToExport or None)
+        """
+        raw_every = self.scan_settings['ta_options', 'reduction', 'raw_every']
+        keep_frames = self._reducer is None or (raw_every > 0 and self._n_steps % raw_every == 0)
+        if self._reducer is not None and keep_frames:
+            self._raw_frames[self.ind_average, self.ind_scan] = True
+        if self.h5saver.settings['save_raw_only']:
+            det_done_datas = det_done_datas.get_data_from_source('raw')
+        init_step = np.all(np.array(indexes) == 0)
+        data_to_save = []
+        for det in self.modules_manager.detectors:
+            dte = data_mod.DataToExport(det.title, data=[
+                dwa.deepcopy() for dwa in det_done_datas if dwa.origin == det.title and
+                ('save' not in dwa.extra_attributes or dwa.save) and
+                (keep_frames or dwa.dim != data_mod.DataDim['Data2D'])])
+            bkg = det.bkg.deepcopy() if init_step and det.do_bkg and det.bkg is not None else None
+            data_to_save.append((det, dte, bkg))
+        return data_to_save
+
+    def _get_reducer(self) -> FrameReducer:
+        settings = self.scan_settings.child('ta_options', 'reduction')
+        dark = np.load(settings['dark_file']) if settings['dark_file'] != '' else None
+        mask = None
+        if settings['hot_pixel_sigma'] > 0:
+            if dark is None:
+                self.status_sig.emit(["Update_Status", "Hot pixels are found from the dark frame, none given: no"
+                                                       " pixel masked", 'log'])
+            else:
+                mask = find_hot_pixels(dark, settings['hot_pixel_sigma'])
+                self.status_sig.emit(["Update_Status", f"{np.count_nonzero(mask)} hot pixels masked", 'log'])
+        rows = (settings['row_start'], settings['row_stop'] if settings['row_stop'] > 0 else None)
+        return FrameReducer(rows, dark, mask, processes=settings['processes'])
+
+    def _submit_reductions(self, det_done_datas: data_mod.DataToExport, scan_indexes: tuple,
+                           save_indexes: Union[tuple, None]):
+        """Send the 2D frames of the current step to the reducer, and save the reductions already done"""
+        for dwa in det_done_datas.get_data_from_dim('Data2D'):
+            for ind, frame in enumerate(dwa.data):
+                self._reductions.append((f'{dwa.get_full_name()}/CH{ind:02d}', scan_indexes, save_indexes,
+                                         self._reducer.submit(frame)))
+        self._collect_reductions()
+
+    def _collect_reductions(self, wait=False):
+        """Save (and add to the statistics) the reduced frames, waiting for all of them if wait is True"""
+        pending = []
+        for name, scan_indexes, save_indexes, future in self._reductions:
+            if not wait and not future.done():
+                pending.append((name, scan_indexes, save_indexes, future))
+                continue
+            try:
+                reduced = future.result()
+            except Exception as e:
+                logger.exception(str(e))
+                continue
+            if self._statistics is not None:
+                self._statistics.update(scan_indexes, f'{name}/Reduced', reduced)
+            if save_indexes is not None:
+                self._write(self._save_reduced, name, save_indexes, reduced)
+        self._reductions = pending
+
+    def _save_reduced(self, name: str, indexes: tuple, reduced: np.ndarray):
+        """Save reduced 2D frames at the given indexes of their array in the ReducedFrames group
+
+        The array of each frame channel is created at its first reduction with the scan shape prepended.
+        """
+        array = self._reduced_arrays.get(name)
+        if array is None:
+            settings = self.scan_settings.child('ta_options', 'reduction')
+            group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'ReducedFrames',
+                                               title='Binned rows of the ROI of the 2D frames')
+            array = self.h5saver.add_array(group, f'Channel{len(self._reduced_arrays):03d}', DataType['data'],
+                                           data_shape=reduced.shape, array_type=reduced.dtype,
+                                           data_dimension='Data1D', scan_shape=self.scan_shape, add_scan_dim=True,
+                                           title=name, metadata=dict(label=name, row_start=settings['row_start'],
+                                                                     row_stop=settings['row_stop'],
+                                                                     dark_file=settings['dark_file'],
+                                                                     hot_pixel_sigma=settings['hot_pixel_sigma']))
+            self._reduced_arrays[name] = array
+        array[indexes] = reduced
+
+    def _save_raw_frames(self, raw_frames: np.ndarray, fill=False):
+        """Save the flags of the steps whose raw 2D frames are saved by the detectors in the ReducedFrames group
+
+        The (Naverage, Npoints) raw_frames array is overwritten at each checkpoint. At the end of the scan (fill), the
+        frames of the other steps are NaN in the floating point 2D arrays of the detectors (integer arrays keep
+        zeros, see the flags), which get the raw_every setting as attribute.
+        """
+        raw_every = self.scan_settings['ta_options', 'reduction', 'raw_every']
+        group = self.h5saver.get_set_group(self.module_and_data_saver.module_group, 'ReducedFrames',
+                                           title='Binned rows of the ROI of the 2D frames')
+        self._set_array(group, 'raw_frames', raw_frames.astype(np.uint8), data_dimension='Data2D',
+                        title='raw frames', metadata=dict(label='raw_frames', raw_every=raw_every))
+        if fill:
+            self._fill_missing_steps(raw_frames, dim='Data2D', attributes=dict(raw_every=raw_every))
+
+    def _stop_reducer(self):
+        if self._reducer is not None:
+            self._reducer.stop(wait=len(self._reductions) == 0)
+            self._reducer = None
+            self._reductions = []
+
+    def _save_data(self, indexes: tuple, data_to_save: list):
+        """Save the data of a scan step at the given indexes through the savers of the detectors
+
+        Parameters
+        ----------
+        indexes: tuple of int
+            the indexes of the step within the extended arrays (including the average index if any)
+        data_to_save: list of tuple
+            (detector, DataToExport, background DataToExport or None) to be saved, see _get_data_to_save
+        """
+        for detector, dte, bkg in data_to_save:
+            try:
+                saver = detector.module_and_data_saver
+                detector_node = saver.get_set_node(self.module_and_data_saver.module_group)
+                saver.add_data(detector_node, dte, indexes=indexes, distribution=self.scanner.distribution)
+                if bkg is not None:
+                    saver.add_bkg(detector_node, bkg)
+            except Exception as e:
+                logger.exception(str(e))
+
+    def _save_steps(self, steps: List[tuple]):
+        """Save the data of several scan steps, queued together in the writer and flushed once
+
+        Parameters
+        ----------
+        steps: list of tuple
+            (indexes, data_to_save) of each step, as given to _save_data
+        """
+        for indexes, data_to_save in steps:
+            self._save_data(indexes, data_to_save)
+
+    def _emit_live_data(self, ind_scan: int, indexes: tuple, det_done_datas: data_mod.DataToExport):
+        """Send the data of a scan step to the live plots
+
+        Parameters
+        ----------
+        ind_scan: int
+            the scan index of the step
+        indexes: tuple of int
+            the indexes of the step within the extended arrays (including the average index if any)
+        det_done_datas: DataToExport
+            the data grabbed at this step
+        """
+        try:
+            data_temp = det_done_datas.get_data_from_full_names(self._live.full_names, deepcopy=False)
             data_temp = data_temp.get_data_with_naxes_lower_than(2-len(indexes))  # maximum Data2D included nav indexes
 
-            self.scan_data_tmp.emit(ScanDataTemp(self.ind_scan, indexes, data_temp))
-            
+            if self.scan_settings['ta_options', 'live', 'coalesce']:
+                self._live.add(ScanDataTemp(ind_scan, indexes, data_temp))
+            else:
+                self.scan_data_tmp.emit(ScanDataTemp(ind_scan, indexes, data_temp))
+
         except Exception as e:
             logger.exception(str(e))
-    
+
+
 def main():
     pass
 
@@ -0,0 +1,138 @@
+import time
+from typing import Iterable, List
+
+import numpy as np
+
+
+class MotionModel:
+    """Travel time of an actuator moving with a trapezoidal velocity profile
+
+    Parameters
+    ----------
+    velocity: float
+        maximum velocity in actuator units per second
+    acceleration: float
+        acceleration (and deceleration) in actuator units per second squared, 0 for an infinite one
+    settle_time: float
+        time in seconds added to every non zero move
+    """
+
+    def __init__(self, velocity: float = 10., acceleration: float = 0., settle_time: float = 0.):
+        if velocity <= 0:
+            raise ValueError(f'The velocity of a motion model should be positive, not {velocity}')
+        self.velocity = float(velocity)
+        self.acceleration = float(acceleration)
+        self.settle_time = float(settle_time)
+
+    @classmethod
+    def from_dict(cls, model: dict) -> 'MotionModel':
+        return cls(**{key: model[key] for key in ('velocity', 'acceleration', 'settle_time') if key in model})
+
+    def move_time(self, distance) -> np.ndarray:
+        """Travel time in seconds for the given (array of) distance(s)"""
+        distance = np.abs(np.asarray(distance, dtype=float))
+        if self.acceleration <= 0:
+            times = distance / self.velocity
+        else:
+            # triangular profile if the maximum velocity is not reached, trapezoidal otherwise
+            ramp_distance = self.velocity ** 2 / self.acceleration
+            times = np.where(distance < ramp_distance, 2 * np.sqrt(distance / self.acceleration),
+                             distance / self.velocity + self.velocity / self.acceleration)
+        return np.where(distance > 0, times + self.settle_time, 0.)
+
+
+def sweep_order(order: Iterable[int], ind_average: int, serpentine: bool = False) -> np.ndarray:
+    """Get the scan indexes in the order they are acquired during the given average
+
+    With serpentine sweeps, the odd averages go through the scan order backwards, so that the actuators do not travel
+    back to the first point between averages.
+    """
+    order = np.asarray(order, dtype=int)
+    if serpentine and ind_average % 2 == 1:
+        order = order[::-1]
+    return order
+
+
+class PointScheduler:
+    """Order the points of a scan to minimize the total travel time of the actuators
+
+    The actuators move simultaneously, the time of a step is the longest travel time among them. The order is built
+    from the first point with a nearest neighbour tour, then improved with 2-opt segment reversals.
+
+    Parameters
+    ----------
+    models: list of MotionModel
+        the motion model of each actuator (axis of the positions)
+    max_passes: int
+        maximum number of 2-opt improvement passes
+    max_time: float
+        time budget in seconds of the 2-opt improvement, the best order found so far is kept once elapsed
+    """
+
+    def __init__(self, models: Iterable[MotionModel], max_passes: int = 10, max_time: float = 2.):
+        self.models: List[MotionModel] = list(models)
+        self.max_passes = max_passes
+        self.max_time = max_time
+
+    def step_times(self, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+        """Travel times between positions (..., Naxes), broadcasting starts against stops"""
+        starts = np.asarray(starts, dtype=float)
+        stops = np.asarray(stops, dtype=float)
+        times = [model.move_time(stops[..., ind] - starts[..., ind]) for ind, model in enumerate(self.models)]
+        return np.max(times, axis=0)
+
+    def travel_time(self, positions: np.ndarray, order: Iterable[int] = None) -> float:
+        """Total travel time in seconds to go through the positions (Npoints, Naxes) in the given order"""
+        positions = np.asarray(positions, dtype=float)
+        if order is not None:
+            positions = positions[np.asarray(order)]
+        if len(positions) < 2:
+            return 0.
+        times = [model.move_time(np.diff(positions[:, ind])) for ind, model in enumerate(self.models)]
+        return float(np.sum(np.max(times, axis=0)))
+
+    def schedule(self, positions: np.ndarray) -> np.ndarray:
+        """Get the order (indexes of the points) in which the positions (Npoints, Naxes) should be visited
+
+        The tour starts at the first point, so that the scan starts where it was defined to.
+        """
+        positions = np.asarray(positions, dtype=float).reshape((len(positions), -1))
+        npoints = len(positions)
+        if npoints < 3:
+            return np.arange(npoints)
+
+        order = np.zeros((npoints,), dtype=int)
+        visited = np.zeros((npoints,), dtype=bool)
+        visited[0] = True
+        for ind in range(1, npoints):
+            times = self.step_times(positions[order[ind - 1]], positions)
+            times[visited] = np.inf
+            order[ind] = int(np.argmin(times))
+            visited[order[ind]] = True
+        return self._two_opt(positions, order)
+
+    def _two_opt(self, positions: np.ndarray, order: np.ndarray) -> np.ndarray:
+        """Reverse segments of the open tour while this reduces the total travel time (travel times are symmetric)"""
+        npoints = len(order)
+        tstart = time.perf_counter()
+        for _ in range(self.max_passes):
+            improved = False
+            for ind in range(npoints - 2):
+                if time.perf_counter() - tstart > self.max_time:
+                    return order
+                # reversing order[ind + 1: j + 1] replaces the steps a->b and c->d by a->c and b->d, where
+                # a, b = order[ind], order[ind + 1] and c, d = order[j], order[j + 1] (no d for the last point)
+                a, b = positions[order[ind]], positions[order[ind + 1]]
+                cs = positions[order[ind + 2:]]
+                ds = positions[order[ind + 3:]]
+                before = self.step_times(a, b) + np.append(self.step_times(cs[:-1], ds), 0.)
+                after = self.step_times(a, cs) + np.append(self.step_times(b, ds), 0.)
+                gains = before - after
+                best = int(np.argmax(gains))
+                if gains[best] > 1e-9:
+                    j = ind + 2 + best
+                    order[ind + 1: j + 1] = order[ind + 1: j + 1][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return order
@@ -0,0 +1,82 @@
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+class ReferenceCache:
+    """Reference data (dark or background) of the detectors, reused to correct the data grabbed at each scan step
+
+    The references are taken again once they are stale: after a given number of scan points, after a given time or
+    when invalidated (for instance because the settings of a detector changed). Each set of references gets an index
+    in the history of the scan so that the corrections can be redone from the saved references.
+
+    Parameters
+    ----------
+    every_points: int
+        number of scan points after which the references are stale, 0 for no limit
+    every_seconds: float
+        time in seconds after which the references are stale, 0 for no limit
+    """
+
+    def __init__(self, every_points: int = 0, every_seconds: float = 0.):
+        self.every_points = every_points
+        self.every_seconds = every_seconds
+        self.references: Dict[str, List[np.ndarray]] = {}
+        self.index = -1  # index of the current references in the history, -1 if none yet
+        self._points = 0
+        self._tstart: float = None
+        self._invalidated = ''
+
+    def invalidate(self, reason: str = 'settings'):
+        """Mark the references as stale, they will be taken again before the next scan point"""
+        self._invalidated = reason
+
+    def staleness(self, now: float = None) -> str:
+        """Get why the references should be taken again, an empty string if they are still valid"""
+        if self.index < 0:
+            return 'first'
+        if self._invalidated != '':
+            return self._invalidated
+        if 0 < self.every_points <= self._points:
+            return 'points'
+        if 0 < self.every_seconds <= (time.perf_counter() if now is None else now) - self._tstart:
+            return 'time'
+        return ''
+
+    def set(self, references: Dict[str, List[np.ndarray]], now: float = None) -> int:
+        """Replace the references, given as lists of arrays keyed by the full names of the data
+
+        The references are stored as floating point arrays (at least float32), the type of the corrected data.
+
+        Returns
+        -------
+        int: the index of the new references in the history
+        """
+        self.references = {key: [np.array(array, dtype=np.result_type(np.asarray(array).dtype, np.float32))
+                                 for array in arrays] for key, arrays in references.items()}
+        self.index += 1
+        self._points = 0
+        self._tstart = time.perf_counter() if now is None else now
+        self._invalidated = ''
+        return self.index
+
+    def count(self, npoints: int = 1):
+        """Count the scan points corrected with the current references"""
+        self._points += npoints
+
+    def correct(self, key: str, arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """Subtract the references of the given data, returned unchanged if there are no matching references"""
+        references = self.references.get(key)
+        if references is None or len(references) != len(arrays) or \
+                any(np.shape(array) != reference.shape for array, reference in zip(arrays, references)):
+            return arrays
+        return [np.subtract(array, reference, dtype=reference.dtype) for array, reference in zip(arrays, references)]
+
+    @staticmethod
+    def average(grabs: List[Dict[str, List[np.ndarray]]]) -> Dict[str, List[np.ndarray]]:
+        """Average several grabs of the references, keeping the data present in all of them"""
+        keys = [key for key in grabs[0] if all(key in grab for grab in grabs)]
+        return {key: [np.mean([grab[key][ind] for grab in grabs], axis=0,
+                              dtype=np.result_type(np.asarray(grabs[0][key][ind]).dtype, np.float32))
+                      for ind in range(len(grabs[0][key]))] for key in keys}
@@ -0,0 +1,66 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class RunningStatistics:
+    """Online mean and variance of the data of each scan point over the averages (Welford's algorithm)
+
+    Each channel (for instance a spectrum or a 0D value of a detector) is identified by a name. Its statistics are
+    preallocated at its first update with the scan shape prepended to the shape of its data and updated in place, so
+    that the memory needed does not depend on the number of averages.
+
+    Parameters
+    ----------
+    scan_shape: tuple of int
+        the shape of the scan (without averaging)
+    """
+
+    def __init__(self, scan_shape: Tuple[int]):
+        self.scan_shape = tuple(scan_shape)
+        self._count: Dict[str, np.ndarray] = {}
+        self._mean: Dict[str, np.ndarray] = {}
+        self._m2: Dict[str, np.ndarray] = {}
+
+    @property
+    def names(self):
+        return list(self._mean.keys())
+
+    def update(self, indexes: Tuple[int], name: str, value: np.ndarray):
+        """Add a measured value of a channel at the given scan indexes"""
+        value = np.asarray(value, dtype=float)
+        if name not in self._mean:
+            self._count[name] = np.zeros(self.scan_shape, dtype=np.int64)
+            self._mean[name] = np.zeros(self.scan_shape + value.shape)
+            self._m2[name] = np.zeros(self.scan_shape + value.shape)
+        indexes = tuple(indexes)
+        self._count[name][indexes] += 1
+        # read, compute and write back: indexing a 0D value per scan point gives a copy, not a view
+        delta = value - self._mean[name][indexes]
+        mean = self._mean[name][indexes] + delta / self._count[name][indexes]
+        self._mean[name][indexes] = mean
+        self._m2[name][indexes] = self._m2[name][indexes] + delta * (value - mean)
+
+    def count(self, name: str) -> np.ndarray:
+        """Number of values added at each scan point"""
+        return self._count[name]
+
+    def mean(self, name: str) -> np.ndarray:
+        """Mean at each scan point, 0 where no value has been added"""
+        return self._mean[name]
+
+    def variance(self, name: str) -> np.ndarray:
+        """Unbiased variance at each scan point, NaN where less than two values have been added"""
+        count = self._count[name].reshape(self.scan_shape + (1,) * (self._m2[name].ndim - len(self.scan_shape)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 1, self._m2[name] / (count - 1), np.nan)
+
+    def stderr(self, name: str) -> np.ndarray:
+        """Standard error of the mean at each scan point, NaN where less than two values have been added"""
+        count = self._count[name].reshape(self.scan_shape + (1,) * (self._m2[name].ndim - len(self.scan_shape)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.variance(name) / count)
+
+    def snapshot(self) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Copy of the (mean, variance, count) of each channel, to be saved while the statistics keep on changing"""
+        return {name: (self._mean[name].copy(), self.variance(name), self._count[name].copy()) for name in self.names}
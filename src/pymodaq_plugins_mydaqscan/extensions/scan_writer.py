@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+from pymodaq.utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+class ScanWriter:
+    """Background worker executing the saving and live emission jobs of a scan
+
+    Two kinds of jobs can be queued:
+
+    * jobs sent with `submit` (live emission for instance) are executed as soon as the worker gets them
+    * jobs sent with `write` (h5 writes) are buffered and executed by batches, followed by a flush of the file. A
+      batch is written as soon as it holds `flush_points` scan points or when its oldest job is older than
+      `flush_interval` seconds, so that a crash loses at most one batch. Consecutive jobs of a batch written with
+      `merge=True` and the same function are merged: the function is called once with the list of their arguments.
+
+    Jobs of a given kind are always executed in their submission order, so that the data end up in the h5 file exactly
+    as if they had been processed in the acquisition loop. The number of jobs either queued or held in the batch is
+    bounded by `maxsize`: if the worker falls behind, `submit` and `write` block the acquisition thread until a job is
+    done, and a batch is written once it holds `maxsize` jobs whatever its number of points.
+
+    Parameters
+    ----------
+    maxsize: int
+        maximum number of pending jobs (queued or held in the batch)
+    flush_points: int
+        number of scan points per batch, at most maxsize
+    flush_interval: float
+        maximum time in seconds a write job can wait in the batch
+    flush: Callable
+        called after each batch, typically the flush method of the h5saver
+    chunk_points: Callable
+        called once after the first batch, should return the number of scan points within a chunk of the h5 arrays
+        (or None). If given, `flush_points` is rounded down to a multiple of this number (at least one chunk, at most
+        maxsize) so that batches are chunk aligned
+    status: Callable
+        called after each batch with the number of points written, the write latency in seconds and the queue depth
+    """
+
+    def __init__(self, maxsize: int = 64, flush_points: int = 16, flush_interval: float = 5.,
+                 flush: Callable = None, chunk_points: Callable = None, status: Callable = None):
+        self.maxsize = max(1, maxsize)
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.maxsize)  # one per pending job, released once the job is done
+        self._thread: threading.Thread = None
+
+        self.flush_points = min(max(1, flush_points), self.maxsize)
+        self.flush_interval = flush_interval
+        self._flush = flush
+        self._chunk_points = chunk_points
+        self._status = status
+
+        self.n_points_written = 0
+        self.n_batches = 0
+        self.last_latency = 0.
+        self.max_latency = 0.
+        self.write_time = 0.  # total time spent writing the batches
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if not self.is_running:
+            self._thread = threading.Thread(target=self._run, name='ScanWriter', daemon=True)
+            self._thread.start()
+
+    def submit(self, func: Callable, *args, **kwargs):
+        """Queue a job to be executed as soon as possible by the worker (or directly if the worker is not running)"""
+        if self.is_running:
+            self._slots.acquire()
+            self._queue.put((False, 0, False, func, args, kwargs))
+        else:
+            func(*args, **kwargs)
+
+    def write(self, func: Callable, *args, n_points: int = 1, merge: bool = False, **kwargs):
+        """Queue a write job to be executed within the next batch
+
+        Parameters
+        ----------
+        func: Callable
+        n_points: int
+            the number of scan points this job is saving, used to trigger the batch writing
+        merge: bool
+            merge the job with the consecutive ones of the batch having the same function, which is then called with
+            the list of the positional arguments of each job (and the keyword arguments of the first one)
+        """
+        if self.is_running:
+            self._slots.acquire()
+            self._queue.put((True, n_points, merge, func, args, kwargs))
+        elif merge:
+            func([args], **kwargs)
+        else:
+            func(*args, **kwargs)
+
+    def stop(self):
+        """Write the pending batch then stop the worker"""
+        if self.is_running:
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        batch = []
+        n_points = 0
+        deadline = None
+        while True:
+            try:
+                job = self._queue.get(timeout=None if deadline is None else max(0., deadline - time.perf_counter()))
+            except queue.Empty:
+                job = ()
+
+            if job is None:
+                self._write_batch(batch, n_points)
+                break
+            elif len(job) != 0:
+                is_write, points, merge, func, args, kwargs = job
+                if is_write:
+                    if len(batch) == 0:
+                        deadline = time.perf_counter() + self.flush_interval
+                    batch.append((merge, func, args, kwargs))
+                    n_points += points
+                else:
+                    self._execute(func, args, kwargs)
+                    self._slots.release()
+
+            if len(batch) != 0 and (n_points >= self.flush_points or len(batch) >= self.maxsize or
+                                    time.perf_counter() >= deadline):
+                self._write_batch(batch, n_points)
+                batch = []
+                n_points = 0
+                deadline = None
+
+    def _write_batch(self, batch: list, n_points: int):
+        if len(batch) == 0:
+            return
+        tstart = time.perf_counter()
+        for merge, func, args, kwargs in self._merge(batch):
+            self._execute(func, args, kwargs)
+        if self._flush is not None:
+            self._execute(self._flush, (), {})
+        self.last_latency = time.perf_counter() - tstart
+        self.max_latency = max(self.max_latency, self.last_latency)
+        self.write_time += self.last_latency
+        self.n_batches += 1
+        self.n_points_written += n_points
+        for _ in range(len(batch)):
+            self._slots.release()
+
+        if self._chunk_points is not None:
+            chunk_points = self._chunk_points()
+            if chunk_points is not None and chunk_points > 0:
+                self.flush_points = min(chunk_points * max(1, self.flush_points // chunk_points), self.maxsize)
+            self._chunk_points = None
+
+        if self._status is not None:
+            self._execute(self._status, (n_points, self.last_latency, self.queue_depth), {})
+
+    @staticmethod
+    def _merge(batch: list) -> list:
+        """Merge the consecutive merge jobs of a batch having the same function into a single job"""
+        merged = []
+        for merge, func, args, kwargs in batch:
+            if merge and len(merged) != 0 and merged[-1][0] and merged[-1][1] == func:
+                merged[-1][2][0].append(args)
+            elif merge:
+                merged.append((True, func, ([args],), kwargs))
+            else:
+                merged.append((False, func, args, kwargs))
+        return merged
+
+    @staticmethod
+    def _execute(func: Callable, args: tuple, kwargs: dict):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(str(e))
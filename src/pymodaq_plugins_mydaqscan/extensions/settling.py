@@ -0,0 +1,57 @@
+import time
+from typing import Iterable, Union
+
+import numpy as np
+
+
+class SettlingMonitor:
+    """Decide from the readbacks of actuators when they have settled on their setpoints
+
+    The actuators are settled once the deviations of all their readbacks from the setpoints are within the tolerances
+    and have stayed so during the stability window. If this does not happen before the timeout, the caller should
+    give up waiting (fallback).
+
+    Parameters
+    ----------
+    tolerances: float or iterable of float
+        maximum absolute deviation of each actuator
+    window: float
+        stability window in seconds
+    timeout: float
+        maximum settling time in seconds
+    """
+
+    def __init__(self, tolerances: Union[float, Iterable[float]], window: float = 0.05, timeout: float = 1.):
+        self.tolerances = np.atleast_1d(np.asarray(tolerances, dtype=float))
+        self.window = window
+        self.timeout = timeout
+        self._tstart: float = None
+        self._tin: float = None
+        self.reset()
+
+    def reset(self, now: float = None):
+        """Start waiting for a new settling"""
+        self._tstart = time.perf_counter() if now is None else now
+        self._tin = None
+
+    def update(self, deviations: Union[float, Iterable[float]], now: float = None) -> bool:
+        """Add the current deviations (readback - setpoint) of the actuators and tell if they are settled"""
+        now = time.perf_counter() if now is None else now
+        if np.all(np.abs(np.atleast_1d(deviations)) <= self.tolerances):
+            if self._tin is None:
+                self._tin = now
+        else:
+            self._tin = None
+        return self.is_settled(now)
+
+    def is_settled(self, now: float = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        return self._tin is not None and now - self._tin >= self.window
+
+    def is_timed_out(self, now: float = None) -> bool:
+        now = time.perf_counter() if now is None else now
+        return now - self._tstart >= self.timeout
+
+    def elapsed(self, now: float = None) -> float:
+        """Time in seconds since the start of the settling"""
+        return (time.perf_counter() if now is None else now) - self._tstart
@@ -0,0 +1,81 @@
+import time
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+
+class StepProfiler:
+    """Record the duration of each phase of every step of a scan with a monotonic clock
+
+    A step is started with `start_step` and each of its phases is ended with `mark`: the duration of the phase is the
+    time elapsed since the previous mark (or the start of the step). Durations are stored in a preallocated array
+    whose shape is the shape of the steps (for instance (Naverage, Npoints)) plus the number of phases, NaN for phases
+    not measured.
+
+    Parameters
+    ----------
+    phases: iterable of str
+        the names of the phases
+    shape: tuple of int
+        the shape of the steps
+    busy_phases: iterable of str
+        the phases during which the detectors are acquiring, the rest of the time is dead time
+    """
+
+    def __init__(self, phases: Iterable[str], shape: Tuple[int], busy_phases: Iterable[str] = ('grab',)):
+        self.phases = list(phases)
+        self._phase_indexes = {phase: ind for ind, phase in enumerate(self.phases)}
+        self.busy_phases = list(busy_phases)
+        self.durations = np.full(tuple(shape) + (len(self.phases),), np.nan)
+        self.start_times = np.full(tuple(shape), np.nan)
+
+        self._t0 = time.perf_counter()
+        self._first: float = None
+        self._last: float = None
+        self._index: tuple = None
+
+    def start_step(self, *index: int):
+        """Start the step at the given index"""
+        now = time.perf_counter()
+        if self._first is None:
+            self._first = now
+        self._index = tuple(index)
+        self._last = now
+        self.start_times[self._index] = now - self._t0
+
+    def mark(self, phase: str):
+        """End a phase of the current step, durations of a phase marked several times within a step are summed"""
+        if self._index is None:
+            return
+        now = time.perf_counter()
+        index = self._index + (self._phase_indexes[phase],)
+        self.durations[index] = now - self._last + (0. if np.isnan(self.durations[index]) else self.durations[index])
+        self._last = now
+
+    @property
+    def elapsed(self) -> float:
+        """Time elapsed between the start of the first step and the last mark"""
+        return 0. if self._first is None else self._last - self._first
+
+    def summary(self) -> Dict[str, Tuple[float, float, float]]:
+        """Mean, 95th percentile and maximum in seconds of each phase measured at least once"""
+        durations = self.durations.reshape((-1, len(self.phases)))
+        summary = dict([])
+        for ind, phase in enumerate(self.phases):
+            values = durations[:, ind][np.logical_not(np.isnan(durations[:, ind]))]
+            if len(values) != 0:
+                summary[phase] = (float(np.mean(values)), float(np.percentile(values, 95)), float(np.max(values)))
+        return summary
+
+    def dead_time_fraction(self) -> float:
+        """Fraction of the elapsed time not spent within the busy phases"""
+        if self.elapsed <= 0:
+            return np.nan
+        busy = np.nansum(self.durations[..., [self._phase_indexes[phase] for phase in self.busy_phases]])
+        return float(1 - busy / self.elapsed)
+
+    def format_summary(self) -> str:
+        """Summary as a text, durations in ms"""
+        text = ', '.join([f'{phase}: {mean * 1000:.1f}/{p95 * 1000:.1f}/{max_ * 1000:.1f}'
+                          for phase, (mean, p95, max_) in self.summary().items()])
+        return f'Step timings (mean/p95/max ms) {text}; dead time: {self.dead_time_fraction() * 100:.1f}%'
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Preallocated ring buffer of frames shared between the viewer plugins and the scan acquisition
+
+A plugin acquires a free slot, fills its view in place (no allocation) and commits it. It then only emits a small
+token (the buffer name and the frame sequence number) through the DAQ_Viewer, which deep copies everything it
+receives. Consumers get a read-only view of the committed frame from its sequence number and release the slot
+explicitly once they are done with it (for instance once it is written to the h5 file).
+"""
+import threading
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class RingBufferError(Exception):
+    pass
+
+
+class Slot:
+    """A slot of the ring buffer, holding a view of its frame
+
+    Can be used as a context manager releasing the slot on exit.
+    """
+
+    def __init__(self, buffer: 'RingBuffer', index: int, data: np.ndarray, seq: int = -1, timestamp: float = None):
+        self.buffer = buffer
+        self.index = index
+        self.data = data
+        self.seq = seq
+        self.timestamp = timestamp
+
+    def release(self):
+        self.buffer.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class RingBuffer:
+    """Fixed number of preallocated frames of a given shape and dtype
+
+    Each slot is either free, being written by a producer, ready (committed) or being read by a consumer. Slots are
+    written in a circular order: if the next slot is not free, the producer waits (back pressure on the acquisition)
+    or, if `overwrite` is True, the oldest ready frame is dropped (but never a frame being read).
+
+    Parameters
+    ----------
+    nslots: int
+    shape: tuple of int
+        shape of a frame
+    dtype: np.dtype
+    overwrite: bool
+    """
+    FREE, WRITING, READY, READING = range(4)
+
+    def __init__(self, nslots: int, shape: Tuple[int], dtype=np.float64, overwrite=False):
+        self._data = np.zeros((nslots,) + tuple(shape), dtype=dtype)
+        self._state = np.full((nslots,), self.FREE)
+        self._seq = np.full((nslots,), -1, dtype=np.int64)
+        self._timestamps = np.zeros((nslots,))
+        self._cursor = 0
+        self._next_seq = 0
+        self.overwrite = overwrite
+        self.n_dropped = 0
+        self._cond = threading.Condition()
+
+    @property
+    def nslots(self) -> int:
+        return self._data.shape[0]
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self._data.shape[1:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    @property
+    def n_in_use(self) -> int:
+        """Number of slots not free"""
+        with self._cond:
+            return int(np.count_nonzero(self._state != self.FREE))
+
+    def acquire_write(self, timeout: float = None) -> Slot:
+        """Get the next slot to be filled in place by a producer
+
+        Raises
+        ------
+        RingBufferError if no slot is available before the timeout
+        """
+        with self._cond:
+            index = self._cursor
+            if self.overwrite and self._state[index] == self.READY:
+                self._state[index] = self.FREE
+                self.n_dropped += 1
+            if not self._cond.wait_for(lambda: self._state[index] == self.FREE, timeout):
+                raise RingBufferError('No free slot in the ring buffer')
+            self._state[index] = self.WRITING
+            self._cursor = (index + 1) % self.nslots
+            return Slot(self, index, self._data[index])
+
+    def commit(self, slot: Slot, timestamp: float = None) -> int:
+        """Mark a written slot as ready and return the sequence number of its frame"""
+        with self._cond:
+            slot.seq = self._next_seq
+            slot.timestamp = time.time() if timestamp is None else timestamp
+            self._seq[slot.index] = slot.seq
+            self._timestamps[slot.index] = slot.timestamp
+            self._state[slot.index] = self.READY
+            self._next_seq += 1
+            self._cond.notify_all()
+            return slot.seq
+
+    def get(self, seq: int, timeout: float = None) -> Slot:
+        """Get a read-only view of the frame with the given sequence number, the slot has to be released
+
+        Raises
+        ------
+        RingBufferError if the frame is not (or no more) in the buffer
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: seq < self._next_seq, timeout):
+                raise RingBufferError(f'Frame {seq} has not been committed')
+            indexes = np.flatnonzero((self._seq == seq) & (self._state == self.READY))
+            if len(indexes) == 0:
+                raise RingBufferError(f'Frame {seq} is not in the ring buffer anymore')
+            index = int(indexes[0])
+            self._state[index] = self.READING
+            view = self._data[index].view()
+            view.flags.writeable = False
+            return Slot(self, index, view, seq, self._timestamps[index])
+
+    def release(self, slot: Slot):
+        """Free a slot (after reading or to cancel a write)"""
+        with self._cond:
+            self._state[slot.index] = self.FREE
+            self._cond.notify_all()
+
+    def clear(self):
+        """Drop all the ready frames"""
+        with self._cond:
+            self._state[self._state == self.READY] = self.FREE
+            self._cond.notify_all()
+
+
+_buffers: Dict[str, RingBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_ring_buffer(name: str, nslots: int = None, shape: Tuple[int] = None, dtype=np.float64,
+                    overwrite=False) -> RingBuffer:
+    """Get a named ring buffer shared within the process, creating it (or reallocating it if the frame shape, dtype or
+    number of slots changed and no slot is in use) if nslots and shape are given
+
+    Raises
+    ------
+    KeyError if the buffer does not exist and nslots or shape are not given
+    """
+    with _buffers_lock:
+        buffer = _buffers.get(name)
+        if nslots is not None and shape is not None:
+            if buffer is None or (buffer.nslots, buffer.shape, buffer.dtype) != (nslots, tuple(shape),
+                                                                                   np.dtype(dtype)):
+                if buffer is not None and buffer.n_in_use != 0:
+                    raise RingBufferError(f'Cannot reallocate the ring buffer {name} while it is in use')
+                buffer = RingBuffer(nslots, shape, dtype, overwrite)
+                _buffers[name] = buffer
+            buffer.overwrite = overwrite
+        if buffer is None:
+            raise KeyError(f'No ring buffer named {name}')
+        return buffer
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Simulated delay line and transient absorption spectrometer, used to test the scan modes without hardware.
+
+The delay line moves at constant velocity so that its position can be read while moving (fly scans). The
+spectrometer computes the transient absorption signal at the delay of the shared delay line during its exposure.
+"""
+import threading
+import time
+from typing import Tuple
+
+import numpy as np
+from scipy.special import erf
+
+from pymodaq_plugins_mydaqscan.scanners.mydaqscanner import position_to_delay
+
+
+class SimulatedDelayLine:
+    """Delay line in mm moving at constant velocity
+
+    Parameters
+    ----------
+    velocity: float
+        velocity in mm/s
+    noise: float
+        standard deviation in mm of the readback noise
+    """
+
+    def __init__(self, velocity: float = 10., noise: float = 1e-5):
+        self.velocity = velocity
+        self.noise = noise
+        self._lock = threading.Lock()
+        self._start_position = 0.
+        self._target = 0.
+        self._start_time = time.perf_counter()
+
+    def _position_at(self, timestamp: float) -> float:
+        distance = self._target - self._start_position
+        travelled = min(abs(distance), self.velocity * max(0., timestamp - self._start_time))
+        return self._start_position + np.sign(distance) * travelled
+
+    def get_position(self, timestamp: float = None, with_noise=True) -> float:
+        """Get the position at a given time (now by default), with readback noise"""
+        with self._lock:
+            position = self._position_at(time.perf_counter() if timestamp is None else timestamp)
+        if with_noise and self.noise > 0:
+            position += np.random.normal(0, self.noise)
+        return position
+
+    def move_abs(self, target: float):
+        """Start a move to the target position, the method returns immediately"""
+        with self._lock:
+            now = time.perf_counter()
+            self._start_position = self._position_at(now)
+            self._start_time = now
+            self._target = target
+
+    def stop(self):
+        with self._lock:
+            now = time.perf_counter()
+            self._start_position = self._position_at(now)
+            self._start_time = now
+            self._target = self._start_position
+
+    @property
+    def is_moving(self) -> bool:
+        with self._lock:
+            return self._position_at(time.perf_counter()) != self._target
+
+    @property
+    def target(self) -> float:
+        return self._target
+
+
+class SimulatedTASpectrometer:
+    """Spectrometer measuring the transient absorption of a sample with two decay components and a finite IRF
+
+    Parameters
+    ----------
+    delay_line: SimulatedDelayLine
+        the delay line setting the pump-probe delay
+    npixels: int
+        number of pixels of the spectrometer
+    time_zero: float
+        position in mm of the delay line at time zero
+    n_passes: int
+        number of passes on the delay line
+    """
+
+    def __init__(self, delay_line: SimulatedDelayLine, npixels: int = 256, time_zero: float = 0., n_passes: int = 1,
+                 exposure: float = 0.01, noise: float = 1e-4):
+        self.delay_line = delay_line
+        self.time_zero = time_zero
+        self.n_passes = n_passes
+        self.exposure = exposure
+        self.noise = noise
+        self.irf = 100.  # fs
+        self.taus = np.array([500., 20000.])  # fs
+        self.wavelengths = np.linspace(400, 700, npixels)
+        self.amplitudes = np.array([np.exp(-((self.wavelengths - 480) / 30) ** 2) * 5e-3,
+                                    -np.exp(-((self.wavelengths - 600) / 50) ** 2) * 3e-3])
+
+    def get_delta_od(self, delays: np.ndarray) -> np.ndarray:
+        """Noiseless transient absorption signal of shape (len(delays), npixels) at given delays in fs"""
+        delays = np.atleast_1d(delays)[:, None]
+        kinetics = 0.5 * np.exp(-delays / self.taus + (self.irf / self.taus) ** 2 / 2) * \
+            (1 + erf((delays - self.irf ** 2 / self.taus) / (np.sqrt(2) * self.irf)))
+        return kinetics @ self.amplitudes
+
+    def _expose(self) -> Tuple[np.ndarray, float]:
+        tstart = time.perf_counter()
+        time.sleep(self.exposure)
+        timestamp = (tstart + time.perf_counter()) / 2
+        delay = position_to_delay(self.delay_line.get_position(timestamp, with_noise=False), self.time_zero,
+                                  self.n_passes)
+        return self.get_delta_od(delay)[0], timestamp
+
+    def grab(self, out: np.ndarray = None):
+        """Expose during the exposure time and return the signal at the average delay of the exposure
+
+        Parameters
+        ----------
+        out: ndarray
+            if given, the spectrum is written in place in this array
+
+        Returns
+        -------
+        ndarray: the spectrum
+        float: the timestamp of the middle of the exposure
+        """
+        spectrum, timestamp = self._expose()
+        return np.add(spectrum, np.random.normal(0, self.noise, spectrum.shape), out=out), timestamp
+
+    def grab_frame(self, nrows: int, out: np.ndarray = None):
+        """Same as grab for a camera: the spectrum is spread over nrows with a gaussian profile
+
+        Returns
+        -------
+        ndarray: the frame of shape (nrows, npixels)
+        float: the timestamp of the middle of the exposure
+        """
+        spectrum, timestamp = self._expose()
+        profile = np.exp(-((np.arange(nrows) - nrows / 2) / (nrows / 4)) ** 2)
+        out = np.multiply(profile[:, None], spectrum, out=out)
+        out += np.random.normal(0, self.noise, out.shape)
+        return out, timestamp
+
+    def grab_shots(self, nshots: int, rep_rate: float = 1000., outliers: float = 0.01):
+        """Acquire a block of single shots modulated by a chopper at half the repetition rate
+
+        Parameters
+        ----------
+        nshots: int
+            number of shots
+        rep_rate: float
+            repetition rate of the laser in Hz, the acquisition lasts nshots / rep_rate
+        outliers: float
+            probability of a shot to be an outlier (missed or weak laser shot)
+
+        Returns
+        -------
+        ndarray: the probe intensities in counts of shape (nshots, npixels)
+        ndarray: the chopper phase (True if pumped) of shape (nshots,)
+        float: the timestamp of the middle of the acquisition
+        """
+        tstart = time.perf_counter()
+        duration = nshots / rep_rate
+        time.sleep(duration)
+        timestamp = tstart + duration / 2
+        delay = position_to_delay(self.delay_line.get_position(timestamp, with_noise=False), self.time_zero,
+                                  self.n_passes)
+
+        probe = 2e4 * np.exp(-((self.wavelengths - 550) / 150) ** 2) + 1e3
+        fluctuations = 1 + 0.01 * np.random.standard_normal((nshots, 1))
+        fluctuations[np.random.random_sample(nshots) < outliers] *= 0.2
+        shots = probe * fluctuations
+        pumped = (np.arange(nshots) + np.random.randint(2)) % 2 == 0
+        shots[pumped] *= 10 ** -self.get_delta_od(delay)
+        shots += np.sqrt(shots) * np.random.standard_normal(shots.shape)
+        return shots, pumped, timestamp
+
+
+DELAY_LINE = SimulatedDelayLine()  # shared by the simulated actuator and detector plugins
@@ -0,0 +1,172 @@
+from typing import List
+
+import numpy as np
+from qtpy import QtCore
+from pymodaq.extensions.pid.utils import PIDModelGeneric, DataToActuatorPID, main
+from pymodaq.utils.data import DataToExport, DataCalculated, DataActuator
+from pymodaq.utils import gui_utils as gutils
+
+from pymodaq_plugins_mydaqscan.models.beam_centroid import CentroidEstimator
+from pymodaq_plugins_mydaqscan.models.loop_timing import LoopTimer, timing_params
+
+
+class PIDModelBeamPointing(PIDModelGeneric):
+    """Stabilization of the pointing of a beam (pump/probe overlap) from the centroid of its spot on a camera
+
+    The inputs of the PID are the x and y coordinates (in pixels of the full frame) of the sub-pixel centroid of the
+    first 2D data of the Camera detector, see CentroidEstimator. If the signal is too weak, the last valid centroid is
+    used (or the setpoints before the first one) so that the actuators are not moved on noise. The timings of the
+    loop (see LoopTimer) are displayed in the model parameters and can be exported.
+
+    convert_input and convert_output are called from the thread of the PID runner: they only record the timings and
+    use a copy of the setpoints, the parameters and setpoints of the GUI are read and updated from its thread.
+    """
+    limits = dict(max=dict(state=False, value=100),
+                  min=dict(state=False, value=-100),)
+    konstants = dict(kp=0.1, ki=0.000, kd=0.0000)
+
+    Nsetpoints = 2  # number of setpoints
+    setpoint_ini = [128, 128]  # number and values of initial setpoints
+    setpoints_names = ['Xaxis', 'Yaxis']  # number and names of setpoints
+
+    actuators_name = ["Xpiezo", "Ypiezo"]  # names of actuator's control modules involved in the PID
+    detectors_name = ['Camera']  # names of detector's control modules involved in the PID
+
+    params = [
+        {'title': 'ROI first row:', 'name': 'row_start', 'type': 'int', 'value': 0, 'min': 0},
+        {'title': 'ROI last row:', 'name': 'row_stop', 'type': 'int', 'value': 0, 'min': 0,
+         'tip': 'Excluded, 0 for all the rows after the first one'},
+        {'title': 'ROI first column:', 'name': 'col_start', 'type': 'int', 'value': 0, 'min': 0},
+        {'title': 'ROI last column:', 'name': 'col_stop', 'type': 'int', 'value': 0, 'min': 0,
+         'tip': 'Excluded, 0 for all the columns after the first one'},
+        {'title': 'Binning:', 'name': 'binning', 'type': 'int', 'value': 1, 'min': 1,
+         'tip': 'Sum blocks of N x N pixels before computing the centroid'},
+        {'title': 'Threshold:', 'name': 'threshold', 'type': 'float', 'value': 10.,
+         'tip': 'Level subtracted from each (binned) pixel, the pixels below do not contribute to the centroid'},
+        {'title': 'Minimum signal:', 'name': 'min_signal', 'type': 'float', 'value': 0., 'min': 0.,
+         'tip': 'Total signal above the threshold below which the centroid is not updated'},
+        timing_params,
+    ]
+    timing_length = 1024  # number of loops kept by the timer
+    timing_refresh = 1.  # interval in seconds between the updates of the timing parameters
+
+    def __init__(self, pid_controller):
+        super().__init__(pid_controller)
+        self.centroid = CentroidEstimator()
+        self.timer = LoopTimer(self.timing_length)
+        self._setpoints = list(self.setpoint_ini)
+        self._refresh_timer = QtCore.QTimer()
+        self._refresh_timer.setInterval(int(self.timing_refresh * 1000))
+        self._refresh_timer.timeout.connect(self.show_timings)
+
+    def update_settings(self, param):
+        """
+        Get a parameter instance whose value has been modified by a user on the UI
+        Parameters
+        ----------
+        param: (Parameter) instance of Parameter object
+        """
+        if param.name() in ['row_start', 'row_stop', 'col_start', 'col_stop', 'binning', 'threshold', 'min_signal']:
+            self.configure_centroid()
+        elif param.name() == 'deadline':
+            self.timer.deadline = param.value() / 1000
+        elif param.name() == 'export' and param.value():
+            path = gutils.select_file(save=True, ext='csv')
+            if path != '':
+                self.timer.export(path)
+            param.setValue(False)
+
+    def ini_model(self):
+        super().ini_model()
+        self.configure_centroid()
+        self.timer.reset()
+        self.timer.deadline = self.settings['timing', 'deadline'] / 1000
+        for spinbox in self.pid_controller.setpoints_sb:
+            try:  # connected at a previous initialization
+                spinbox.valueChanged.disconnect(self.update_setpoints)
+            except TypeError:
+                pass
+            spinbox.valueChanged.connect(self.update_setpoints)
+        self.update_setpoints()
+        self._refresh_timer.start()
+
+    def update_setpoints(self):
+        """Copy the setpoints of the GUI for convert_input"""
+        self._setpoints = list(self.pid_controller.setpoints)
+
+    def show_timings(self):
+        """Display the timings of the loop in the model parameters, called periodically from the GUI thread"""
+        self.timer.show(self.settings.child('timing'))
+
+    def configure_centroid(self):
+        self.centroid.configure(roi=(self.settings['row_start'], self.settings['row_stop'],
+                                     self.settings['col_start'], self.settings['col_stop']),
+                                binning=self.settings['binning'], threshold=self.settings['threshold'],
+                                min_signal=self.settings['min_signal'])
+
+    def get_frame(self, measurements: DataToExport) -> np.ndarray:
+        """Get the first 2D data of the Camera detector (or of any detector if none), None if there are none"""
+        frame = None
+        for dwa in measurements:
+            if dwa.dim.name == 'Data2D':
+                if dwa.origin == self.detectors_name[0]:
+                    return dwa.data[0]
+                elif frame is None:
+                    frame = dwa.data[0]
+        return frame
+
+    def convert_input(self, measurements: DataToExport) -> DataToExport:
+        """
+        Convert the measurements in the units to be fed to the PID (same dimensionality as the setpoint)
+        Parameters
+        ----------
+        measurements: DataToExport
+            Data from the declared detectors from which the model extract a value of the same units as the setpoint
+
+        Returns
+        -------
+        DataToExport: the x and y coordinates of the centroid in pixels as 0D DataCalculated
+
+        """
+        self.timer.input_started()
+        frame = self.get_frame(measurements)
+        if frame is not None:
+            self.centroid.process(frame)
+        if np.isnan(self.centroid.x):  # no valid centroid yet: stay at the setpoints
+            x, y = self._setpoints
+        else:
+            x, y = self.centroid.x, self.centroid.y
+        self.curr_input = [x, y]
+        self.timer.input_done()
+        return DataToExport('inputs', data=[DataCalculated(self.setpoints_names[0], data=[np.array([x])]),
+                                            DataCalculated(self.setpoints_names[1], data=[np.array([y])])])
+
+    def convert_output(self, outputs: List[float], dt: float, stab=True):
+        """
+        Convert the output of the PID in units to be fed into the actuator
+        Parameters
+        ----------
+        outputs: List of float
+            output value from the PID from which the model extract a value of the same units as the actuator, None
+            until the runner starts the stabilization
+        dt: float
+            Ellapsed time since the last call to this function
+        stab: bool
+
+        Returns
+        -------
+        DataToActuatorPID: the relative moves of the actuators
+
+        """
+        self.timer.output_started()
+        outputs = [0. if value is None else value for value in outputs]
+        self.curr_output = outputs
+        output = DataToActuatorPID('pid', mode='rel',
+                                   data=[DataActuator(self.actuators_name[ind], data=outputs[ind])
+                                         for ind in range(len(outputs))])
+        self.timer.output_done(dt)
+        return output
+
+
+if __name__ == '__main__':
+    main("BeamSteeringMockNoModel.xml")  # some preset configured with the right actuators and detectors
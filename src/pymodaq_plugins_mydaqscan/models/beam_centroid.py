@@ -0,0 +1,120 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class CentroidEstimator:
+    """Sub-pixel centroid of a beam spot on camera frames, computed within preallocated buffers
+
+    The frame is cropped to the region of interest (a view), binned by blocks of binning x binning pixels, the
+    threshold is subtracted and the negative pixels set to 0 before computing the centre of mass. All the
+    intermediate arrays are allocated once for a given frame shape, so that processing a frame allocates no array:
+    the binning adds the binning**2 strided sub-grids of the ROI copied one by one in a contiguous buffer, and the
+    projections are matrix products with ones (numpy reductions and operations on strided arrays use temporary
+    buffers).
+
+    Parameters
+    ----------
+    roi: tuple of int
+        (row_start, row_stop, col_start, col_stop) of the region of interest, the stops are excluded and 0 means up to
+        the last row or column
+    binning: int
+        size of the square blocks of pixels summed together before computing the centroid
+    threshold: float
+        level (per binned pixel) subtracted from the frame, the pixels below it do not contribute to the centroid
+    min_signal: float
+        minimum total signal above the threshold for the centroid to be valid
+    """
+
+    def __init__(self, roi: Tuple[int, int, int, int] = (0, 0, 0, 0), binning: int = 1, threshold: float = 0.,
+                 min_signal: float = 0.):
+        self.roi = tuple(roi)
+        self.binning = max(1, int(binning))
+        self.threshold = threshold
+        self.min_signal = min_signal
+
+        self.x = np.nan
+        self.y = np.nan
+        self.signal = 0.
+        self.valid = False
+
+        self._frame_shape: Tuple[int, ...] = None
+        self._slices: Tuple[slice, slice] = None
+        self._binning = 1
+        self._binned_shape: Tuple[int, int] = None
+        self._work: np.ndarray = None
+        self._block: np.ndarray = None
+        self._row_ones: np.ndarray = None
+        self._col_ones: np.ndarray = None
+        self._rows: np.ndarray = None
+        self._cols: np.ndarray = None
+        self._row_coordinates: np.ndarray = None
+        self._col_coordinates: np.ndarray = None
+
+    def configure(self, roi: Tuple[int, int, int, int] = None, binning: int = None, threshold: float = None,
+                  min_signal: float = None):
+        """Change the settings, the buffers are allocated again at the next frame if needed"""
+        if roi is not None:
+            self.roi = tuple(roi)
+        if binning is not None:
+            self.binning = max(1, int(binning))
+        if threshold is not None:
+            self.threshold = threshold
+        if min_signal is not None:
+            self.min_signal = min_signal
+        self._frame_shape = None
+
+    def _allocate(self, frame_shape: Tuple[int, ...]):
+        row_start, row_stop, col_start, col_stop = self.roi
+        row_start = min(row_start, frame_shape[0] - 1)
+        col_start = min(col_start, frame_shape[1] - 1)
+        row_stop = frame_shape[0] if row_stop <= row_start else min(row_stop, frame_shape[0])
+        col_stop = frame_shape[1] if col_stop <= col_start else min(col_stop, frame_shape[1])
+        binning = min(self.binning, row_stop - row_start, col_stop - col_start)
+        nrows = (row_stop - row_start) // binning
+        ncols = (col_stop - col_start) // binning
+        # incomplete blocks at the end of the ROI are dropped
+        self._slices = (slice(row_start, row_start + nrows * binning), slice(col_start, col_start + ncols * binning))
+        self._binning = binning
+        self._binned_shape = (nrows, ncols)
+        self._work = np.zeros((nrows, ncols))
+        self._block = np.zeros((nrows, ncols))
+        self._row_ones = np.ones((nrows,))
+        self._col_ones = np.ones((ncols,))
+        self._rows = np.zeros((nrows,))
+        self._cols = np.zeros((ncols,))
+        # coordinates of the centre of each binned pixel in the pixels of the full frame
+        self._row_coordinates = row_start + np.arange(nrows) * binning + (binning - 1) / 2
+        self._col_coordinates = col_start + np.arange(ncols) * binning + (binning - 1) / 2
+        self._frame_shape = frame_shape
+
+    def process(self, frame: np.ndarray) -> Tuple[float, float, bool]:
+        """Compute the centroid of a frame
+
+        Returns
+        -------
+        float: the x (column) coordinate of the centroid in pixels of the full frame
+        float: the y (row) coordinate
+        bool: False if the signal is below min_signal, the last valid centroid is then returned
+        """
+        if frame.shape != self._frame_shape:
+            self._allocate(frame.shape)
+        roi = frame[self._slices]
+        binning = self._binning
+        np.copyto(self._work, roi[::binning, ::binning], casting='unsafe')
+        for ind_row in range(binning):
+            for ind_col in range(binning):
+                if ind_row != 0 or ind_col != 0:
+                    np.copyto(self._block, roi[ind_row::binning, ind_col::binning], casting='unsafe')
+                    np.add(self._work, self._block, out=self._work)
+        np.subtract(self._work, self.threshold, out=self._work)
+        np.maximum(self._work, 0., out=self._work)
+
+        np.dot(self._work, self._col_ones, out=self._rows)
+        np.dot(self._row_ones, self._work, out=self._cols)
+        self.signal = float(np.dot(self._rows, self._row_ones))
+        self.valid = self.signal > max(self.min_signal, 0.)
+        if self.valid:
+            self.x = float(np.dot(self._cols, self._col_coordinates)) / self.signal
+            self.y = float(np.dot(self._rows, self._row_coordinates)) / self.signal
+        return self.x, self.y, self.valid
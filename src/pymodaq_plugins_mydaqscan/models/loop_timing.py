@@ -0,0 +1,150 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+
+COLUMNS = ('timestamp', 'period', 'input', 'output', 'dt')
+
+timing_params = {'title': 'Loop timing:', 'name': 'timing', 'type': 'group', 'expanded': False, 'children': [
+    {'title': 'Deadline (ms):', 'name': 'deadline', 'type': 'float', 'value': 0., 'min': 0.,
+     'tip': 'Loop periods longer than this are counted as missed deadlines, 0 to count none'},
+    {'title': 'Input (ms):', 'name': 'input', 'type': 'float', 'value': np.nan, 'readonly': True,
+     'tip': 'Mean duration of convert_input'},
+    {'title': 'Output (ms):', 'name': 'output', 'type': 'float', 'value': np.nan, 'readonly': True,
+     'tip': 'Mean duration of convert_output'},
+    {'title': 'Period (ms):', 'name': 'period', 'type': 'float', 'value': np.nan, 'readonly': True,
+     'tip': 'Mean period of the loop'},
+    {'title': 'Jitter (ms):', 'name': 'jitter', 'type': 'float', 'value': np.nan, 'readonly': True,
+     'tip': 'Standard deviation of the loop period'},
+    {'title': 'Missed deadlines:', 'name': 'missed', 'type': 'int', 'value': 0, 'readonly': True},
+    {'title': 'Export timings:', 'name': 'export', 'type': 'bool_push', 'value': False, 'label': 'Export',
+     'tip': 'Save the timings of the last loops in a csv (or npy) file'},
+]}
+
+
+class LoopTimer:
+    """Timings of the iterations of a PID loop, kept in a fixed-size ring buffer
+
+    A loop iteration starts with the call to convert_input of the model and ends with its call to convert_output,
+    the model marks these calls (input_started, input_done, output_started, output_done). For each of the last
+    `length` iterations, the buffer holds (see COLUMNS):
+
+    * the start of the iteration in seconds since the start of the first one
+    * the period: time since the start of the previous iteration
+    * the durations of convert_input and convert_output
+    * the dt given by the PID controller to convert_output
+
+    All durations are in seconds, NaN if not measured. The buffer is allocated once, marking a call allocates
+    nothing. The calls are marked from the thread of the PID runner while the statistics are read from the GUI
+    thread (see show), a lock keeps the rows of the buffer consistent between both.
+
+    Parameters
+    ----------
+    length: int
+        number of iterations kept in the buffer
+    deadline: float
+        loop periods longer than this (in seconds) are counted as missed deadlines, 0 to count none
+    """
+
+    def __init__(self, length: int = 1024, deadline: float = 0.):
+        self.length = length
+        self.deadline = deadline
+        self.timings = np.full((length, len(COLUMNS)), np.nan)
+        self.n_loops = 0
+        self.n_missed = 0
+        self._row: np.ndarray = None
+        self._tfirst: float = None
+        self._tstart: float = None
+        self._tinput: float = None
+        self._toutput: float = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.timings[...] = np.nan
+            self.n_loops = 0
+            self.n_missed = 0
+            self._row = None
+            self._tfirst = None
+            self._tstart = None
+
+    def input_started(self, now: float = None):
+        """Mark the start of convert_input, which starts a new iteration"""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._row = self.timings[self.n_loops % self.length]
+            self._row[:] = np.nan
+            if self._tfirst is None:
+                self._tfirst = now
+            else:
+                period = now - self._tstart
+                self._row[1] = period
+                if 0 < self.deadline < period:
+                    self.n_missed += 1
+            self._row[0] = now - self._tfirst
+            self._tstart = now
+            self._tinput = now
+            self.n_loops += 1
+
+    def input_done(self, now: float = None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._row is not None:
+                self._row[2] = now - self._tinput
+
+    def output_started(self, now: float = None):
+        self._toutput = time.perf_counter() if now is None else now
+
+    def output_done(self, dt: float = np.nan, now: float = None):
+        """Mark the end of convert_output, the actuators are commanded right after"""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._row is not None and self._toutput is not None:
+                self._row[3] = now - self._toutput
+                self._row[4] = dt
+
+    def get_timings(self) -> np.ndarray:
+        """Get a copy of the timings of the iterations in the buffer, in chronological order"""
+        with self._lock:
+            return self._get_timings()
+
+    def _get_timings(self) -> np.ndarray:
+        if self.n_loops <= self.length:
+            return self.timings[:self.n_loops].copy()
+        return np.roll(self.timings, -(self.n_loops % self.length), axis=0)
+
+    def statistics(self) -> Dict[str, float]:
+        """Mean durations in seconds (NaN if never measured), jitter of the period and number of missed deadlines"""
+        with self._lock:
+            timings = self._get_timings()
+            stats = dict(missed=self.n_missed, loops=self.n_loops)
+        with np.errstate(invalid='ignore'):
+            for ind, name in enumerate(COLUMNS[1:], start=1):
+                values = timings[:, ind][np.isfinite(timings[:, ind])]
+                stats[name] = float(np.mean(values)) if len(values) != 0 else np.nan
+            periods = timings[:, 1][np.isfinite(timings[:, 1])]
+            stats['jitter'] = float(np.std(periods)) if len(periods) != 0 else np.nan
+        return stats
+
+    def show(self, settings):
+        """Display the statistics in ms in the timing_params parameters, NaN for the ones not measured
+
+        The parameters belong to the GUI, to be called from its thread only.
+        """
+        stats = self.statistics()
+        for name in ('input', 'output', 'period', 'jitter'):
+            settings.child(name).setValue(stats[name] * 1000)
+        settings.child('missed').setValue(stats['missed'])
+
+    def export(self, path: Union[str, Path]):
+        """Save the timings of the buffer in a csv file with a header, or in a npy file if the suffix is .npy"""
+        path = Path(path)
+        with self._lock:
+            timings = self._get_timings()
+            footer = f'{self.n_loops} loops, {self.n_missed} missed deadlines ({self.deadline} s)'
+        if path.suffix == '.npy':
+            np.save(path, timings)
+        else:
+            np.savetxt(path, timings, delimiter=',', header=','.join(COLUMNS) + ' (s)', footer=footer)
@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Numerical processing of the transient absorption data (vectorized numpy routines, no Qt dependency)
+"""
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Shot-to-shot processing of chopped pump-probe spectra
+
+All functions work on a whole block of shots of shape (shots, pixels) with batched numpy operations.
+"""
+from typing import Tuple
+import warnings
+
+import numpy as np
+
+MAD_TO_STD = 1.4826  # ratio between the standard deviation and the median absolute deviation of a normal law
+
+
+def pair_shots(shots: np.ndarray, pumped: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort the shots by chopper phase and pair each pumped shot with an unpumped one
+
+    Parameters
+    ----------
+    shots: ndarray of shape (shots, pixels)
+    pumped: ndarray of bool of shape (shots,)
+        chopper phase of each shot, True if the pump was on
+
+    Returns
+    -------
+    ndarray: the pumped shots of shape (pairs, pixels)
+    ndarray: the unpumped shots of shape (pairs, pixels), in the same order so that consecutive shots are referenced
+    """
+    pumped = np.asarray(pumped, dtype=bool)
+    on = shots[pumped]
+    off = shots[~pumped]
+    npairs = min(len(on), len(off))
+    return on[:npairs], off[:npairs]
+
+
+def outlier_mask(values: np.ndarray, threshold: float = 5., axis: int = 0) -> np.ndarray:
+    """Flag the values further than threshold robust standard deviations (from the MAD) from the median
+
+    NaN values are ignored and never flagged.
+
+    Returns
+    -------
+    ndarray of bool: True for outliers
+    """
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN slices
+        median_func = np.nanmedian if np.isnan(values).any() else np.median  # nanmedian is much slower
+        median = median_func(values, axis=axis, keepdims=True)
+        deviation = np.abs(values - median)
+        mad = MAD_TO_STD * median_func(deviation, axis=axis, keepdims=True)
+        return deviation > threshold * np.where(mad == 0, np.inf, mad)
+
+
+def transient_signal(shots: np.ndarray, pumped: np.ndarray, mode: str = 'dOD', threshold: float = 5.,
+                     dark: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Compute the pump-probe signal of a block of chopped shots with outlier rejection
+
+    Each pumped shot is referenced to an unpumped one. A pair is rejected if the total intensity of one of its shots is
+    an outlier (missed laser shot for instance), then single pixels whose signal is an outlier are masked.
+
+    Parameters
+    ----------
+    shots: ndarray of shape (shots, pixels)
+        raw intensities of the spectrometer
+    pumped: ndarray of bool of shape (shots,)
+        chopper phase of each shot, True if the pump was on
+    mode: str
+        'dOD' for -log10(I_on / I_off) or 'dT/T' for (I_on - I_off) / I_off
+    threshold: float
+        rejection threshold in robust standard deviations, 0 to disable the rejection
+    dark: ndarray of shape (pixels,)
+        dark signal subtracted from the shots if not None
+
+    Returns
+    -------
+    ndarray: the mean signal of shape (pixels,)
+    ndarray: its standard error of shape (pixels,)
+    float: the fraction of rejected values
+    """
+    shots = np.asarray(shots, dtype=float)
+    if dark is not None:
+        shots = shots - dark
+    on, off = pair_shots(shots, pumped)
+    if len(on) == 0:
+        raise ValueError('The block contains no pair of pumped and unpumped shots')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if mode == 'dOD':
+            signal = -np.log10(on / off)
+        elif mode == 'dT/T':
+            signal = (on - off) / off
+        else:
+            raise ValueError(f'Unknown mode: {mode}')
+
+    mask = ~np.isfinite(signal)
+    if threshold > 0:
+        totals = np.stack((on.sum(axis=1), off.sum(axis=1)))
+        bad_pairs = np.any(outlier_mask(totals, threshold, axis=1), axis=0)
+        mask |= bad_pairs[:, None]
+        mask |= outlier_mask(np.where(mask, np.nan, signal), threshold, axis=0)
+
+    signal = np.ma.masked_array(signal, mask)
+    count = signal.count(axis=0)
+    mean = signal.mean(axis=0).filled(np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stderr = (signal.std(axis=0, ddof=1) / np.sqrt(count)).filled(np.nan)
+    return mean, stderr, float(mask.sum() / mask.size)
@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy loader of the custom TA scans
+
+Opens a h5 file saved by myDAQScanAcquisition (or the JSON index written by the TA numpy exporter) without reading its
+data. Arrays are returned as LazyArray objects indexed like numpy arrays or by axis values (delay, wavelength, average):
+only the hyperslab of a selection is read from the file (or from the memory-mapped npy files) and the last reads are
+kept in a least recently used cache, so that plotting kinetic traces of a multi-GB scan reads a few MB.
+
+    >>> with open_scan('scan.h5') as scan:
+    ...     data = scan['TASim']                         # by title or path relative to the scan group
+    ...     trace = data.sel(Wavelength=550.)           # (average, delay) kinetic trace at 550 nm
+    ...     spectrum = data.sel(delay=1.5, Average=0)  # spectrum of the first average at the closest delay
+    ...     measured = data.axis('measured_delay')      # readback of the delay stage at each step
+
+Only PyTables and numpy are needed (no PyMoDAQ nor Qt), so that files can be analysed away from the setup.
+"""
+import ast
+from collections import OrderedDict
+import json
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Tuple, Union
+
+import numpy as np
+
+CACHE_BYTES = 256 * 1024 ** 2  # default memory budget of the cache of the reads
+
+
+def _decode_attr(value):
+    """Decode an attribute serialized by PyMoDAQ (json with the repr of builtin objects)"""
+    if isinstance(value, bytes):
+        value = value.decode(errors='replace')
+    if not isinstance(value, str):
+        return value.item() if isinstance(value, np.generic) else value
+    try:
+        dic = json.loads(value)
+        return ast.literal_eval(dic['data']) if isinstance(dic, dict) and 'data' in dic else dic
+    except (ValueError, TypeError, KeyError, SyntaxError):
+        return value
+
+
+class ReadCache:
+    """Least recently used cache of the arrays read from a file, within a memory budget
+
+    Reads bigger than a quarter of the budget are not cached, not to evict all the traces for a single image.
+
+    Parameters
+    ----------
+    max_bytes: int
+        memory budget of the cache, 0 to disable the cache
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._arrays: Dict[Hashable, np.ndarray] = OrderedDict()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, key: Hashable) -> Union[np.ndarray, None]:
+        array = self._arrays.get(key)
+        if array is None:
+            self.misses += 1
+        else:
+            self._arrays.move_to_end(key)
+            self.hits += 1
+        return array
+
+    def put(self, key: Hashable, array: np.ndarray):
+        if key in self._arrays or array.nbytes > self.max_bytes // 4:
+            return
+        array.setflags(write=False)  # arrays are shared between the reads
+        self._arrays[key] = array
+        self.nbytes += array.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._arrays.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._arrays.clear()
+        self.nbytes = 0
+
+
+class _NpySource:
+    """npy file memory-mapped at its first read"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._array: np.ndarray = None
+
+    def __getitem__(self, key):
+        if self._array is None:
+            self._array = np.load(self.path, mmap_mode='r')
+        return np.array(self._array[key])  # copy, not to keep a view on the map
+
+
+def _normalize_key(key, shape: Tuple[int]) -> Tuple[tuple, list]:
+    """Split a numpy index into a hyperslab (ints and slices of positive step) and the indexes applied once read
+
+    Returns
+    -------
+    tuple: the hyperslab, one int or slice per dimension
+    list: (axis of the read array, indexes) of the dimensions indexed by arrays (orthogonal indexing)
+    """
+    key = key if isinstance(key, tuple) else (key,)
+    ellipsis = [k is Ellipsis for k in key]
+    if sum(ellipsis) > 1:
+        raise IndexError('an index can only have a single ellipsis')
+    if any(ellipsis):
+        ind = ellipsis.index(True)
+        key = key[:ind] + (slice(None),) * (len(shape) - len(key) + 1) + key[ind + 1:]
+    if len(key) > len(shape):
+        raise IndexError(f'too many indices: array is {len(shape)}-dimensional, but {len(key)} were indexed')
+    key = key + (slice(None),) * (len(shape) - len(key))
+
+    hyperslab = []
+    post_indexes = []
+    for k, size in zip(key, shape):
+        if isinstance(k, slice) and (k.step is None or k.step > 0):
+            hyperslab.append(slice(*k.indices(size)))
+            continue
+        if isinstance(k, (int, np.integer)):
+            if not -size <= k < size:
+                raise IndexError(f'index {k} is out of bounds for axis {len(hyperslab)} with size {size}')
+            hyperslab.append(int(k) % size)
+            continue
+        indexes = np.arange(*k.indices(size)) if isinstance(k, slice) else np.asarray(k)
+        if indexes.dtype == bool:
+            indexes = np.flatnonzero(indexes)
+        if indexes.ndim != 1 or indexes.dtype.kind not in 'iu':
+            raise IndexError('only integers, slices, ellipsis and 1D integer or boolean arrays are valid indices')
+        if np.any(indexes >= size) or np.any(indexes < -size):
+            raise IndexError(f'index out of bounds for axis {len(hyperslab)} with size {size}')
+        indexes = indexes % size
+        start = int(indexes.min()) if len(indexes) != 0 else 0
+        stop = int(indexes.max()) + 1 if len(indexes) != 0 else 0
+        axis = len([s for s in hyperslab if isinstance(s, slice)])
+        post_indexes.append((axis, indexes - start))
+        hyperslab.append(slice(start, stop, 1))
+    return tuple(hyperslab), post_indexes
+
+
+def _value_to_index(values: np.ndarray, value) -> Union[int, slice, np.ndarray]:
+    """Convert axis values into indexes: the closest point for scalars, the points within the bounds for slices"""
+    if isinstance(value, slice):
+        if value.step is not None:
+            raise ValueError('slices of axis values cannot have a step')
+        lower = -np.inf if value.start is None else value.start
+        upper = np.inf if value.stop is None else value.stop
+        lower, upper = min(lower, upper), max(lower, upper)
+        indexes = np.flatnonzero(np.logical_and(values >= lower, values <= upper))
+        if len(indexes) == 0:
+            return slice(0, 0)
+        if np.all(np.diff(indexes) == 1):
+            return slice(int(indexes[0]), int(indexes[-1]) + 1)
+        return indexes
+    if np.ndim(value) == 0:
+        return int(np.nanargmin(np.abs(values - value)))
+    return np.array([int(np.nanargmin(np.abs(values - val))) for val in value], dtype=int)
+
+
+class LazyArray:
+    """Array of a TA scan read from the file only when sliced
+
+    Indexing with ints, slices, ellipsis and 1D arrays (orthogonal indexing, as for each dimension separately) reads
+    the smallest hyperslab containing the selection, then returns a numpy array. Arrays from the cache are read-only.
+
+    Attributes
+    ----------
+    name: str
+        path of the array relative to the scan group
+    title: str
+    dims: list of str
+        label of the axis of each dimension ('Average', the actuators titles, the signal axes) or dimN if unknown
+    attrs: dict
+        metadata of the array
+    """
+
+    def __init__(self, source, name: str, title: str, shape: Iterable[int], dtype, dims: List[str] = None,
+                 axes: Dict[str, Tuple[Tuple[int], callable]] = None, attrs: dict = None, cache: ReadCache = None):
+        self._source = source
+        self.name = name
+        self.title = title
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        self.dims = list(dims) if dims is not None else [f'dim{ind}' for ind in range(len(self.shape))]
+        self._axes = axes if axes is not None else dict([])
+        self.attrs = attrs if attrs is not None else dict([])
+        self._cache = cache if cache is not None else ReadCache(0)
+
+    def __repr__(self):
+        dims = ', '.join(f'{dim}: {size}' for dim, size in zip(self.dims, self.shape))
+        return f'<LazyArray {self.name} ({dims}) {self.dtype}>'
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    @property
+    def axes(self) -> List[str]:
+        """Labels of the axes of the array: setpoints, measured positions (measured_...) and signal axes"""
+        return list(self._axes.keys())
+
+    def axis(self, label: str) -> np.ndarray:
+        """Get the values of an axis (read at its first use)
+
+        Setpoint and signal axes are 1D along their dimension. Measured axes (measured_ and deviation_ readbacks of
+        the actuators) span the average and scan dimensions, or the scan dimensions only (mean over the averages) if
+        the array has no average dimension.
+        """
+        return self._axes[self._get_axis_label(label)][1]()
+
+    def axis_dims(self, label: str) -> Tuple[int]:
+        """Dimensions of the array spanned by an axis"""
+        return self._axes[self._get_axis_label(label)][0]
+
+    def _get_axis_label(self, label: str) -> str:
+        if label not in self._axes:
+            raise KeyError(f'{label} is not an axis of {self.name}, available axes are {self.axes}')
+        return label
+
+    def read(self) -> np.ndarray:
+        """Read the whole array"""
+        return self[...]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.read(), dtype=dtype)
+
+    def __getitem__(self, key) -> np.ndarray:
+        hyperslab, post_indexes = _normalize_key(key, self.shape)
+        slab_shape = [len(range(*s.indices(size))) for s, size in zip(hyperslab, self.shape) if isinstance(s, slice)]
+        if 0 in slab_shape:
+            array = np.empty(slab_shape, dtype=self.dtype)
+        else:
+            cache_key = (self.name, tuple((s.start, s.stop, s.step) if isinstance(s, slice) else s
+                                          for s in hyperslab))
+            array = self._cache.get(cache_key)
+            if array is None:
+                array = np.asarray(self._source[hyperslab])
+                self._cache.put(cache_key, array)
+        for axis, indexes in post_indexes:
+            array = np.take(array, indexes, axis=axis)
+        return array
+
+    def isel(self, **indexers) -> np.ndarray:
+        """Index the array by dimension label, for instance isel(Average=0, delay=slice(10, 20))"""
+        key = [slice(None)] * self.ndim
+        for label, index in indexers.items():
+            if label not in self.dims:
+                raise KeyError(f'{label} is not a dimension of {self.name}, dimensions are {self.dims}')
+            key[self.dims.index(label)] = index
+        return self[tuple(key)]
+
+    def sel(self, **indexers) -> np.ndarray:
+        """Index the array by axis values, for instance sel(delay=1.5, Wavelength=slice(500, 600))
+
+        Scalars select the closest point, slices the points within their bounds (included) and sequences the closest
+        point of each value. Only 1D axes (setpoints, averages and signal axes) can be used.
+        """
+        key = [slice(None)] * self.ndim
+        for label, value in indexers.items():
+            dims = self.axis_dims(label)
+            if len(dims) != 1:
+                raise ValueError(f'{label} spans several dimensions and cannot be used for a selection')
+            key[dims[0]] = _value_to_index(self.axis(label), value)
+        return self[tuple(key)]
+
+
+class TAScan:
+    """Custom TA scan opened without reading its data
+
+    Parameters
+    ----------
+    path: str or Path
+        h5 file saved by myDAQScanAcquisition or JSON index written by the TA numpy exporter
+    scan: str
+        name of the scan group (Scan000...), None for the last scan of the file
+    cache_bytes: int
+        memory budget of the cache of the reads, shared by all the arrays of the scan
+
+    Attributes
+    ----------
+    scans: list of str
+        the scans of the file
+    datasets: dict of LazyArray
+        the data arrays of the scan by path relative to the scan group
+    measured: dict of LazyArray
+        the measured_ readbacks of the actuators at each step and their deviation_ from the setpoints
+    """
+
+    def __init__(self, path: Union[str, Path], scan: str = None, cache_bytes: int = CACHE_BYTES):
+        self.path = Path(path)
+        self.cache = ReadCache(cache_bytes)
+        self._h5file = None
+        self._axes_values: Dict[str, np.ndarray] = dict([])
+        if self.path.suffix == '.json':
+            self.scans, entries = self._load_index(scan)
+        else:
+            self.scans, entries = self._load_h5(scan)
+        self._entries = entries
+        self.measured: Dict[str, LazyArray] = dict([])
+        self.datasets: Dict[str, LazyArray] = dict([])
+        self._build()
+
+    def _load_h5(self, scan: str):
+        import tables
+        self._h5file = tables.open_file(str(self.path), 'r')
+        scans = sorted(group._v_name for group in self._h5file.list_nodes('/RawData', 'Group')
+                       if group._v_name.startswith('Scan')) if '/RawData' in self._h5file else []
+        self.scan = self._select_scan(scans, scan)
+        scan_path = f'/RawData/{self.scan}'
+
+        entries = dict(nav_axes=[], measured_axes=[], datasets=[])
+        signal_axes: Dict[str, list] = dict([])
+        datasets = []
+        for node in self._h5file.walk_nodes(scan_path, 'Array'):
+            if isinstance(node, tables.VLArray) or node.dtype.kind not in 'biufc':
+                continue
+            attrs = {key: _decode_attr(node._v_attrs[key]) for key in node._v_attrs._v_attrnames
+                     if key not in ('settings', 'CLASS', 'VERSION', 'TITLE')}
+            entry = dict(path=node._v_pathname, title=node._v_title, shape=node.shape, dtype=node.dtype,
+                         attrs=attrs, source=node)
+            parent = node._v_parent
+            if parent._v_name == 'NavAxes':
+                entries['nav_axes'].append(entry)
+            elif parent._v_name == 'MeasuredPositions':
+                entries['measured_axes'].append(entry)
+            elif attrs.get('data_type', '') == 'axis':
+                signal_axes.setdefault(parent._v_pathname, []).append(entry)
+            elif attrs.get('data_type', '') in ('data', 'bkg'):
+                datasets.append((parent._v_pathname, entry))
+        for group, entry in datasets:
+            entries['datasets'].append(dict(entry, axes=signal_axes.get(group, [])))
+        return scans, entries
+
+    def _load_index(self, scan: str):
+        with open(self.path) as f:
+            index = json.load(f)
+        if index.get('format') != 'pymodaq_ta_npy':
+            raise ValueError(f'{self.path} is not the index of a TA scan exported as numpy arrays')
+
+        def scan_of(entry):
+            parts = entry['path'].split('/')
+            return parts[2] if len(parts) > 2 and parts[1] == 'RawData' else ''
+
+        def with_source(entry):
+            return dict(entry, source=_NpySource(self.path.parent.joinpath(entry['file'])))
+
+        scans = sorted(set(scan_of(entry) for entry in index['arrays'] if scan_of(entry).startswith('Scan')))
+        self.scan = self._select_scan(scans, scan)
+        entries = dict([])
+        for key in ('nav_axes', 'measured_axes', 'datasets'):
+            entries[key] = [with_source(entry) for entry in index[key] if scan_of(entry) == self.scan]
+        for entry in entries['datasets']:
+            entry['axes'] = [with_source(axis) for axis in entry['axes']]
+        return scans, entries
+
+    def _select_scan(self, scans: List[str], scan: str) -> str:
+        if len(scans) == 0:
+            raise ValueError(f'No scan found in {self.path}')
+        if scan is None:
+            return scans[-1]
+        if scan not in scans:
+            raise KeyError(f'{scan} is not in {self.path}, available scans are {scans}')
+        return scan
+
+    def _relative_name(self, path: str) -> str:
+        return path.split(f'/RawData/{self.scan}/', 1)[-1]
+
+    def _axis_loader(self, entry: dict):
+        def load():
+            if entry['path'] not in self._axes_values:
+                self._axes_values[entry['path']] = np.asarray(entry['source'][...])
+            return self._axes_values[entry['path']]
+        return load
+
+    def _build(self):
+        nav_axes = sorted(self._entries['nav_axes'], key=lambda entry: entry['attrs'].get('index', 0))
+        self._average_axis = None
+        self.scan_axes = []
+        for entry in nav_axes:
+            label = entry['attrs'].get('label', entry['title'])
+            if label == 'Average':
+                self._average_axis = entry
+            else:
+                self.scan_axes.append((label, entry))
+        self.scan_shape = tuple(int(entry['shape'][0]) for _, entry in self.scan_axes)
+        self.naverage = int(self._average_axis['shape'][0]) if self._average_axis is not None else 1
+
+        for entry in self._entries['measured_axes']:
+            shape = tuple(entry['shape'])
+            dims = ['Average'] + [label for label, _ in self.scan_axes] if len(shape) == 2 else None
+            self.measured[entry['attrs'].get('label', entry['title'])] = LazyArray(
+                entry['source'], self._relative_name(entry['path']), entry['title'], shape, entry['dtype'],
+                dims=dims if dims is not None and len(dims) == len(shape) else None, attrs=entry['attrs'],
+                cache=self.cache)
+
+        for entry in self._entries['datasets']:
+            shape = tuple(int(size) for size in entry['shape'])
+            dims, axes = self._get_dims(shape, entry['axes'])
+            name = self._relative_name(entry['path'])
+            self.datasets[name] = LazyArray(entry['source'], name, entry['title'], shape, entry['dtype'], dims=dims,
+                                            axes=axes, attrs=entry['attrs'], cache=self.cache)
+
+    def _get_dims(self, shape: Tuple[int], signal_axes: List[dict]):
+        """Label the dimensions of an array from the navigation axes (with or without a leading average dimension)
+        and its signal axes"""
+        dims = [f'dim{ind}' for ind in range(len(shape))]
+        axes = dict([])
+        nscan = len(self.scan_shape)
+        for nouter in ((1, 0) if self._average_axis is not None else (0,)):
+            if nscan != 0 and len(shape) >= nouter + nscan and shape[nouter:nouter + nscan] == self.scan_shape \
+                    and (nouter == 0 or shape[0] == self.naverage):
+                break
+        else:
+            nouter = None
+
+        if nouter is not None:
+            if nouter == 1:
+                dims[0] = 'Average'
+                axes['Average'] = ((0,), self._axis_loader(self._average_axis))
+            scan_dims = tuple(range(nouter, nouter + nscan))
+            for ind, (label, entry) in zip(scan_dims, self.scan_axes):
+                dims[ind] = label
+                axes[label] = ((ind,), self._axis_loader(entry))
+            for label, measured in self.measured.items():
+                if measured.ndim == 2 and measured.shape[1] == int(np.prod(self.scan_shape)) and \
+                        (nouter == 0 or self._get_saved_averages(measured) is not None):
+                    axes[label] = ((0,) + scan_dims if nouter == 1 else scan_dims,
+                                   self._measured_loader(measured, nouter == 1))
+
+        for entry in signal_axes:
+            index = entry['attrs'].get('index', None)
+            label = entry['attrs'].get('label', entry['title'])
+            if index is not None and index < len(shape) and len(entry['shape']) == 1 \
+                    and shape[index] == entry['shape'][0] and dims[index].startswith('dim'):
+                dims[index] = label
+                axes[label] = ((index,), self._axis_loader(entry))
+        return dims, axes
+
+    def _get_saved_averages(self, measured: LazyArray) -> Union[np.ndarray, None]:
+        """Get the rows of the measured positions matching the Average dimension of the data, None if they do not
+
+        With running statistics, the measured positions hold every average but the data only the raw sweeps of some
+        of them, whose indexes are the values of the Average axis.
+        """
+        if measured.shape[0] == self.naverage:
+            return np.arange(self.naverage)
+        averages = self._axis_loader(self._average_axis)()
+        if np.all(np.mod(averages, 1) == 0) and np.all(averages >= 0) and np.all(averages < measured.shape[0]):
+            return averages.astype(int)
+        return None
+
+    def _measured_loader(self, measured: LazyArray, with_average: bool):
+        def load():
+            values = measured.read().reshape((measured.shape[0],) + self.scan_shape)
+            if with_average:
+                return values[self._get_saved_averages(measured)]
+            with np.errstate(invalid='ignore'):
+                return np.nanmean(values, axis=0)  # steps not acquired (NaN) are ignored
+        return load
+
+    @property
+    def nav_axes(self) -> Dict[str, np.ndarray]:
+        """The setpoints of the actuators (and the Average axis), read at their first use"""
+        axes = {label: self._axis_loader(entry)() for label, entry in self.scan_axes}
+        if self._average_axis is not None:
+            axes['Average'] = self._axis_loader(self._average_axis)()
+        return axes
+
+    def keys(self) -> List[str]:
+        return list(self.datasets.keys())
+
+    def __getitem__(self, name: str) -> LazyArray:
+        """Get a data array from its path relative to the scan group (Detector000/Data1D/CH00/Data00) or its title"""
+        if name in self.datasets:
+            return self.datasets[name]
+        matches = [array for array in self.datasets.values() if array.title == name]
+        if len(matches) == 1:
+            return matches[0]
+        elif len(matches) == 0:
+            raise KeyError(f'No dataset {name} in {self.scan}, available datasets are {self.keys()}')
+        raise KeyError(f'Several datasets are titled {name}, use one of {[array.name for array in matches]}')
+
+    def __repr__(self):
+        return f'<TAScan {self.path.name}/{self.scan}: {len(self.datasets)} datasets, scan shape {self.scan_shape},' \
+               f' {self.naverage} averages>'
+
+    def close(self):
+        self.cache.clear()
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_scan(path: Union[str, Path], scan: str = None, cache_bytes: int = CACHE_BYTES) -> TAScan:
+    """Open a custom TA scan without reading its data, see TAScan"""
+    return TAScan(path, scan, cache_bytes)
@@ -50,6 +50,235 @@ class Scan1DCustom(Scan1DBase):
         if coordinates.shape == (2, 2) or coordinates.shape == (2, 1):
             self.settings.child('start').setValue(coordinates[0, 0])
             self.settings.child('stop').setValue(coordinates[1, 0])
+
+
+C_NM_PER_FS = 299.792458  # speed of light in nm/fs
+
+
+def delay_to_position(delays: np.ndarray, time_zero: float = 0., n_passes: int = 1) -> np.ndarray:
+    """Convert delays in fs into positions in mm of a delay line
+
+    Parameters
+    ----------
+    delays: ndarray
+        delays in fs with respect to time zero
+    time_zero: float
+        position in mm of the stage at time zero
+    n_passes: int
+        number of round trips of the beam on the stage (1 for a single retroreflector, 2 for a double pass...)
+    """
+    return time_zero + np.asarray(delays) * C_NM_PER_FS * 1e-6 / (2 * n_passes)
+
+
+def position_to_delay(positions: np.ndarray, time_zero: float = 0., n_passes: int = 1) -> np.ndarray:
+    """Convert positions in mm of a delay line into delays in fs, see delay_to_position"""
+    return (np.asarray(positions) - time_zero) * 2 * n_passes / (C_NM_PER_FS * 1e-6)
+
+
+def parse_segments(segments: str) -> np.ndarray:
+    """Get the delays from piecewise-linear segments
+
+    Syntax goes as start:step:stop or with single entry, separated with comma or new line, see Scan1DSparse
+    """
+    series = [np.asarray([])]
+    for range_string in re.findall(r"[^,\s]+", segments):
+        number_strings = re.findall("[^:]+", range_string)
+        if len(number_strings) == 3:
+            start, step, stop = [float(number) for number in number_strings]
+            series.append(mutils.linspace_step(start, stop, step))
+        elif len(number_strings) == 1:
+            series.append(np.asarray([float(number_strings[0])]))
+        else:
+            raise ValueError(f'Invalid segment: {range_string}')
+    return np.concatenate(series)
+
+
+def delay_grid(segments: str, log_start: float = None, log_stop: float = None, log_npoints: int = 0,
+               decimals: int = 6) -> np.ndarray:
+    """Get a sorted nonuniform grid of delays (in fs)
+
+    Parameters
+    ----------
+    segments: str
+        piecewise-linear segments, see parse_segments
+    log_start: float
+        first delay (strictly positive, with respect to t0) of the logarithmically spaced part of the grid
+    log_stop: float
+        last delay of the logarithmically spaced part of the grid
+    log_npoints: int
+        number of logarithmically spaced delays, if 0 no logarithmic part is added
+    decimals: int
+        delays closer than 10**-decimals fs (for instance at the boundaries of segments) are merged
+    """
+    delays = [parse_segments(segments)]
+    if log_npoints > 0:
+        if log_start is None or log_stop is None or log_start <= 0 or log_stop <= log_start:
+            raise ValueError('Logarithmic spacing needs 0 < log_start < log_stop')
+        delays.append(np.geomspace(log_start, log_stop, log_npoints))
+    return np.unique(np.round(np.concatenate(delays), decimals))
+
+
+@ScannerFactory.register()
+class Scan1DDelayGrid(Scan1DBase):
+    """ Nonuniform grid of pump-probe delays: fine piecewise-linear segments around time zero followed by
+    logarithmically spaced delays. Delays are given in fs and converted into stage positions if the actuator is a
+    delay line in mm.
+
+    Segments syntax goes as start:step:stop or with single entry, separated with comma or new line:
+
+    * -500:50:-100, -100:10:500 will give [-500 -450 ... -100 -90 ... 490 500]
+    """
+
+    scan_subtype = 'TA Delay grid'
+    params = [
+        {'title': 'Segments (fs):', 'name': 'segments', 'type': 'text', 'value': '-500:50:-100, -100:10:500'},
+        {'title': 'Log. spacing:', 'name': 'log_spacing', 'type': 'group', 'children': [
+            {'title': 'Enabled:', 'name': 'enabled', 'type': 'bool', 'value': True},
+            {'title': 'Start (fs):', 'name': 'start', 'type': 'float', 'value': 600., 'min': 0.},
+            {'title': 'Stop (fs):', 'name': 'stop', 'type': 'float', 'value': 1e6},
+            {'title': 'Npoints:', 'name': 'npoints', 'type': 'int', 'value': 40, 'min': 1},
+        ]},
+        {'title': 'Delay line:', 'name': 'delay_line', 'type': 'group', 'children': [
+            {'title': 'Actuator units:', 'name': 'units', 'type': 'list', 'limits': ['mm', 'fs'],
+             'tip': 'If mm, the delays are converted into positions of the delay line'},
+            {'title': 'Time zero (mm):', 'name': 'time_zero', 'type': 'float', 'value': 0.},
+            {'title': 'Number of passes:', 'name': 'n_passes', 'type': 'int', 'value': 1, 'min': 1,
+             'tip': 'Number of round trips of the beam on the stage (1 for a single retroreflector)'},
+        ]},
+        ]
+    n_axes = 1
+    distribution = DataDistribution['uniform']  # nonuniform spacing is fine in 1D, see Scan1DSparse
+
+    def __init__(self, actuators: List = None, **_ignored):
+        ScannerBase.__init__(self, actuators=actuators)
+        self.settings.child('segments').setOpts(tip=self.__doc__)
+
+    def get_delays(self) -> np.ndarray:
+        """Get the grid of delays in fs from the settings"""
+        return delay_grid(self.settings['segments'],
+                          self.settings['log_spacing', 'start'], self.settings['log_spacing', 'stop'],
+                          self.settings['log_spacing', 'npoints'] if self.settings['log_spacing', 'enabled'] else 0)
+
+    def delays_to_positions(self, delays: np.ndarray) -> np.ndarray:
+        if self.settings['delay_line', 'units'] == 'mm':
+            return delay_to_position(delays, self.settings['delay_line', 'time_zero'],
+                                     self.settings['delay_line', 'n_passes'])
+        return np.asarray(delays)
+
+    def positions_to_delays(self, positions: np.ndarray) -> np.ndarray:
+        if self.settings['delay_line', 'units'] == 'mm':
+            return position_to_delay(positions, self.settings['delay_line', 'time_zero'],
+                                     self.settings['delay_line', 'n_passes'])
+        return np.asarray(positions)
+
+    def set_scan(self):
+        try:
+            self.positions = self.delays_to_positions(self.get_delays())
+            self.get_info_from_positions(self.positions)
+        except Exception as e:
+            logger.warning(f'Invalid delay grid: {str(e)}')  # many things could happen when parsing strings
+
+    def set_settings_titles(self):
+        if len(self.actuators) == 1:
+            self.settings.child('segments').setOpts(title=f'{self.actuators[0].title} segments (fs):')
+
+    def evaluate_steps(self) -> int:
+        try:
+            return len(self.get_delays())
+        except Exception:
+            return 0
+
+    def update_from_scan_selector(self, scan_selector: Selector):
+        """Replace the grid by a single linear segment between the selected positions, keeping the first step"""
+        coordinates = scan_selector.get_coordinates()
+        if coordinates.shape == (2, 2) or coordinates.shape == (2, 1):
+            start, stop = sorted(self.positions_to_delays(coordinates[:, 0]))
+            number_strings = re.findall("[^:]+", re.findall(r"[^,\s]+", self.settings['segments'])[0])
+            step = abs(float(number_strings[1])) if len(number_strings) == 3 else (stop - start) / 10
+            self.settings.child('segments').setValue(f'{start:g}:{step:g}:{stop:g}')
+            self.settings.child('log_spacing', 'enabled').setValue(False)
+
+
+@ScannerFactory.register()
+class Scan1DTAAdaptive(Scan1DBase):
+    """ Adaptive 1D scan: after a coarse initial grid, each next position is chosen from the trace of the probed
+    detector's data (curvature and uncertainty), until the point budget or the loss goal is reached.
+
+    The positions are only known during the acquisition: they are set with `set_position` and unmeasured positions
+    are NaN. The data are saved in acquisition order along a scan axis of length the point budget, the navigation
+    axis holds the positions in the same order (a position measured again appears again) with a NaN tail if the scan
+    ended before the budget.
+    """
+
+    scan_subtype = 'TA Adaptive'
+    params = [
+        {'title': 'Start:', 'name': 'start', 'type': 'float', 'value': 0.},
+        {'title': 'Stop:', 'name': 'stop', 'type': 'float', 'value': 1.},
+        {'title': 'Initial points:', 'name': 'n_init', 'type': 'int', 'value': 11, 'min': 2,
+         'tip': 'Number of points of the initial linear grid'},
+        {'title': 'Point budget:', 'name': 'max_points', 'type': 'int', 'value': 100, 'min': 2},
+        {'title': 'Loss goal:', 'name': 'loss_goal', 'type': 'float', 'value': 0.01, 'min': 0.},
+        {'title': 'Curvature weight:', 'name': 'curvature_weight', 'type': 'float', 'value': 1., 'min': 0.},
+        {'title': 'Uncertainty weight:', 'name': 'uncertainty_weight', 'type': 'float', 'value': 1., 'min': 0.,
+         'tip': 'Weight of the standard error when deciding to measure a position again, 0 to disable'},
+        {'title': 'Min. step:', 'name': 'min_step', 'type': 'float', 'value': 0., 'min': 0.},
+        ]
+    n_axes = 1
+    distribution = DataDistribution['uniform']  # spread data cannot be averaged, 1D plots are fine, see Scan1DSparse
+
+    def __init__(self, actuators: List = None, **_ignored):
+        ScannerBase.__init__(self, actuators=actuators)
+
+    def set_scan(self):
+        n_init = min(self.settings['n_init'], self.settings['max_points'])
+        self.positions = np.full((self.settings['max_points'], 1), np.nan)
+        self.positions[:n_init, 0] = np.linspace(self.settings['start'], self.settings['stop'], n_init)
+        self.n_steps = self.settings['max_points']
+        self._update_axes()
+
+    @property
+    def n_init(self) -> int:
+        return min(self.settings['n_init'], self.settings['max_points'])
+
+    @property
+    def n_measured(self) -> int:
+        """Number of positions already set, the next ones are NaN"""
+        return int(np.count_nonzero(np.logical_not(np.isnan(self.positions[:, 0]))))
+
+    def set_position(self, scan_index: int, position: float):
+        """Set the position chosen during the acquisition at a given scan index"""
+        self.positions[scan_index, 0] = position
+        self._update_axes()
+
+    def _update_axes(self):
+        """Get the sorted unique positions set so far and the index of each scan position among them, -1 if unset"""
+        measured = np.logical_not(np.isnan(self.positions[:, 0]))
+        self.axes_unique = [np.unique(self.positions[measured, 0])]
+        self.axes_indexes = np.full(self.positions.shape, -1, dtype=int)
+        self.axes_indexes[measured, 0] = np.searchsorted(self.axes_unique[0], self.positions[measured, 0])
+
+    def set_settings_titles(self):
+        if len(self.actuators) == 1:
+            self.settings.child('start').setOpts(title=f'{self.actuators[0].title} start:')
+            self.settings.child('stop').setOpts(title=f'{self.actuators[0].title} stop:')
+
+    def evaluate_steps(self) -> int:
+        return self.settings['max_points']
+
+    def get_nav_axes(self) -> List[Axis]:
+        return [Axis(label=f'{self.actuators[0].title}',
+                     units=f'{self.actuators[0].units}',
+                     data=np.array(self.positions[:, 0]))]
+
+    def get_scan_shape(self) -> Tuple[int]:
+        return self.settings['max_points'],
+
+    def update_from_scan_selector(self, scan_selector: Selector):
+        coordinates = scan_selector.get_coordinates()
+        if coordinates.shape == (2, 2) or coordinates.shape == (2, 1):
+            self.settings.child('start').setValue(coordinates[0, 0])
+            self.settings.child('stop').setValue(coordinates[1, 0])
+
     
 def main():
     pass
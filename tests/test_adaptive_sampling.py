@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.adaptive_sampling import AdaptiveSampler1D
+
+
+def kinetics(x):
+    return np.where(x < 0, 0., np.exp(-x / 5.))
+
+
+def run_sampler(sampler, func):
+    while not sampler.done():
+        x = sampler.ask()
+        sampler.tell(x, func(x))
+    return sampler
+
+
+def test_sampler_budget_and_density():
+    sampler = run_sampler(AdaptiveSampler1D((-10, 50), max_points=60, loss_goal=0.), kinetics)
+    assert sampler.npoints == 60
+    x, mean, stderr, count = sampler.get_statistics()
+    assert x[0] == -10 and x[-1] == 50
+    # points are concentrated around time zero where the kinetic trace is sharp
+    assert np.sum(np.abs(x) < 5) > np.sum(x > 30)
+
+
+def test_sampler_loss_goal():
+    sampler = run_sampler(AdaptiveSampler1D((0, 1), max_points=1000, loss_goal=0.05, uncertainty_weight=0.),
+                          lambda x: x)
+    assert sampler.npoints < 1000
+    assert sampler.loss() < 0.05
+
+
+def test_sampler_vector_and_repeats():
+    sampler = AdaptiveSampler1D((0, 1), max_points=10)
+    for x in (0., 0., 1.):
+        sampler.tell(x, np.array([x, 1., 2.]) + (0.1 if len(sampler._x) == 1 else 0.))
+    x, mean, stderr, count = sampler.get_statistics()
+    assert np.allclose(count, [2, 1])
+    assert mean.shape == (2, 3)
+    assert np.allclose(mean[0], [0.05, 1.05, 2.05])
+    assert np.all(np.isnan(stderr[1]))
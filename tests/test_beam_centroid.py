@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.models.beam_centroid import CentroidEstimator
+
+
+def _spot(x0, y0, shape=(120, 160), width=6., amplitude=1000., offset=0.):
+    rows, cols = np.indices(shape)
+    return offset + amplitude * np.exp(-((cols - x0) ** 2 + (rows - y0) ** 2) / (2 * width ** 2))
+
+
+@pytest.mark.parametrize('binning', [1, 2, 3])
+def test_sub_pixel_centroid(binning):
+    estimator = CentroidEstimator(binning=binning)
+    for x0, y0 in [(80.3, 60.7), (42.25, 71.5)]:
+        x, y, valid = estimator.process(_spot(x0, y0))
+        assert valid
+        assert x == pytest.approx(x0, abs=0.01) and y == pytest.approx(y0, abs=0.01)
+
+
+def test_roi_and_threshold():
+    frame = _spot(50.4, 40.6, offset=100.)
+    frame[5, 150] = 1e5  # hot pixel out of the roi
+    estimator = CentroidEstimator(roi=(20, 60, 30, 70), threshold=100.)
+    x, y, valid = estimator.process(frame.astype(np.uint16))
+    assert x == pytest.approx(50.4, abs=0.05) and y == pytest.approx(40.6, abs=0.05)
+    estimator.configure(roi=(0, 0, 0, 0), threshold=0.)
+    assert estimator.process(frame)[0] > 60  # offset and hot pixel pull the centroid
+
+
+def test_min_signal():
+    estimator = CentroidEstimator(threshold=10., min_signal=100.)
+    assert not estimator.process(np.zeros((20, 20)))[2]
+    assert np.isnan(estimator.x)
+    x, y, _ = estimator.process(_spot(10., 12., shape=(20, 20), width=2.))
+    assert estimator.process(np.zeros((20, 20))) == (x, y, False)  # last valid centroid
+
+
+def test_no_allocation():
+    estimator = CentroidEstimator(roi=(10, 110, 10, 150), binning=2, threshold=5.)
+    frame = _spot(80., 60.).astype(np.uint16)
+    estimator.process(frame)
+    tracemalloc.start()
+    for _ in range(10):
+        estimator.process(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < frame.nbytes / 4
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.scanners.mydaqscanner import (delay_grid, delay_to_position, parse_segments,
+                                                             position_to_delay)
+
+
+def test_parse_segments():
+    assert np.allclose(parse_segments('0:0.2:1,5'), [0, 0.2, 0.4, 0.6, 0.8, 1, 5])
+    assert np.allclose(parse_segments('0:1:2\n2:2:6'), [0, 1, 2, 2, 4, 6])
+    with pytest.raises(ValueError):
+        parse_segments('0:1')
+
+
+def test_delay_grid():
+    delays = delay_grid('-100:50:0, 0:10:50', log_start=100, log_stop=10000, log_npoints=3)
+    assert np.allclose(delays, [-100, -50, 0, 10, 20, 30, 40, 50, 100, 1000, 10000])
+    assert np.all(np.diff(delays) > 0)
+    assert len(delay_grid('0:10:50', log_npoints=0)) == 6
+    with pytest.raises(ValueError):
+        delay_grid('0:10:50', log_start=0, log_stop=100, log_npoints=3)
+
+
+@pytest.mark.parametrize('n_passes', [1, 2, 4])
+def test_delay_conversion(n_passes):
+    delays = np.array([-1000., 0., 6671.28190396])
+    positions = delay_to_position(delays, time_zero=10., n_passes=n_passes)
+    assert positions[1] == pytest.approx(10.)
+    assert positions[2] - positions[1] == pytest.approx(1. / n_passes)
+    assert np.allclose(position_to_delay(positions, time_zero=10., n_passes=n_passes), delays)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.early_stopping import EarlyStopping
+
+
+def _sweep(early_stop, ind_average, noise, order=None):
+    """Measure the pending points of order with a signal of 1 and a noise of the given amplitude per point"""
+    order = np.arange(early_stop.npoints) if order is None else order
+    sweep = early_stop.pending(order)
+    for ind_scan in sweep:
+        early_stop.update(ind_average, ind_scan, 1. + noise[ind_scan] * (-1) ** ind_average * np.ones((4,)))
+    return sweep
+
+
+def test_standard_error():
+    early_stop = EarlyStopping(10, 3, target=0.1, min_averages=3)
+    noise = np.array([0.01, 1., 0.01])
+    assert np.all(np.isnan(early_stop.noise()))
+    for ind_average in range(2):
+        _sweep(early_stop, ind_average, noise)
+    assert not np.any(early_stop.converged())  # min_averages not reached
+    assert np.array_equal(_sweep(early_stop, 2, noise, order=[2, 1, 0]), [2, 1, 0])
+    assert np.array_equal(early_stop.converged(), [True, False, True])
+    assert np.array_equal(_sweep(early_stop, 3, noise, order=[2, 1, 0]), [1])
+    assert np.array_equal(early_stop.count, [3, 4, 3])
+    assert np.array_equal(early_stop.acquired[3], [False, True, False])
+    assert not early_stop.is_done()
+
+
+def test_snr():
+    early_stop = EarlyStopping(10, 2, target=20., criterion='SNR', min_averages=2)
+    for ind_average in range(2):
+        _sweep(early_stop, ind_average, np.array([0.01, 1.]))
+    assert early_stop.snr()[0] > 20. > early_stop.snr()[1]
+    assert np.array_equal(early_stop.converged(), [True, False])
+    with pytest.raises(ValueError):
+        EarlyStopping(10, 2, target=1., criterion='unknown')
+
+
+def test_done():
+    early_stop = EarlyStopping(5, 2, target=1., min_averages=2, time_budget=10.)
+    early_stop.start(now=100.)
+    assert not early_stop.is_timed_out(now=109.) and early_stop.is_timed_out(now=110.)
+    assert early_stop.elapsed(now=105.) == 5.
+    for ind_average in range(2):
+        _sweep(early_stop, ind_average, np.zeros((2,)))
+    assert early_stop.is_done(now=101.)
+    assert len(early_stop.pending([1, 0])) == 0
+    assert not EarlyStopping(5, 2, target=1.).is_timed_out()  # no time budget
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import time
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.fly_pacing import FlyPacer, WAIT, DUE, MISSED
+from pymodaq_plugins_mydaqscan.hardware.ta_simulator import SimulatedDelayLine
+
+
+def fly_sweep(setpoints, velocity, grab_time=0.02, readback_interval=0.05):
+    """Sweep the simulated delay line over the setpoints, feeding its readbacks to the pacer (in simulated time)
+
+    Returns
+    -------
+    dict: the position of the delay line at the start of the grab of each grabbed step
+    """
+    line = SimulatedDelayLine(velocity=velocity, noise=1e-5)
+    line.move_abs(setpoints[0])
+    tnow = time.perf_counter() + abs(setpoints[0]) / velocity  # at the start of the sweep
+    line._start_position, line._target, line._start_time = setpoints[0], setpoints[0], tnow
+    pacer = FlyPacer(setpoints)
+    pacer.add_readback(tnow, line.get_position(tnow))
+    line._target = setpoints[-1]  # the sweep starts now
+    next_readback = tnow + readback_interval
+    grabbed = {0: line.get_position(tnow, with_noise=False)}
+    tnow += grab_time
+    for ind_step in range(1, len(setpoints)):
+        while True:
+            while next_readback <= tnow:
+                pacer.add_readback(next_readback, line.get_position(next_readback))
+                if line.get_position(next_readback, with_noise=False) == setpoints[-1]:
+                    pacer.stop()
+                next_readback += readback_interval
+            state = pacer.state(ind_step, now=tnow)
+            if state != WAIT:
+                break
+            tnow += 0.001
+        if state == DUE:
+            grabbed[ind_step] = line.get_position(tnow, with_noise=False)
+            tnow += grab_time
+    return grabbed
+
+
+@pytest.mark.parametrize('direction', [1, -1])
+def test_grabs_at_the_setpoints(direction):
+    setpoints = np.linspace(0, 1, 11)[::direction]
+    grabbed = fly_sweep(setpoints, velocity=1.)
+    assert sorted(grabbed) == list(range(len(setpoints)))
+    # within one readback interval of extrapolation error and the polling of the pacer
+    for ind_step, position in grabbed.items():
+        assert 0 <= (position - setpoints[ind_step]) * direction + 1e-3 < 0.02
+
+
+def test_too_fast_actuator_skips_steps():
+    setpoints = np.linspace(0, 1, 11)
+    grabbed = fly_sweep(setpoints, velocity=10., grab_time=0.03)  # 0.3 mm per grab for 0.1 mm steps
+    assert 0 in grabbed and 10 in grabbed
+    assert 3 <= len(grabbed) < len(setpoints)
+    for ind_step, position in grabbed.items():
+        if ind_step != 10:  # the other frames start within half a step after their setpoint
+            assert -1e-3 < position - setpoints[ind_step] < 0.05 + 1e-3
+    assert grabbed[10] == pytest.approx(1.)
+
+
+def test_pacer_states():
+    pacer = FlyPacer([0., 1., 2.])
+    assert pacer.state(0, now=0.) == WAIT and np.isnan(pacer.position(now=0.))
+    pacer.add_readback(0., 0.)
+    assert pacer.state(0, now=0.) == DUE
+    assert pacer.state(1, now=10.) == WAIT  # no velocity from a single readback
+    pacer.add_readback(1., 0.5)
+    assert pacer.position(now=2.) == pytest.approx(1.)
+    assert pacer.state(1, now=1.9) == WAIT and pacer.state(1, now=2.) == DUE
+    assert pacer.state(1, now=3.1) == MISSED
+    assert pacer.position(now=100.) == 2.  # not extrapolated beyond the end of the sweep
+    assert pacer.state(2, now=100.) == WAIT  # only a readback can tell the end is reached
+    pacer.add_readback(0.5, 10.)  # older than the last one
+    assert pacer.position(now=1.) == 0.5
+    pacer.add_readback(4., 1.98)
+    pacer.stop()
+    assert pacer.position(now=100.) == 1.98
+    assert pacer.state(1, now=100.) == MISSED and pacer.state(2, now=100.) == DUE
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.frame_reduction import FrameReducer, find_hot_pixels, reduce_frame
+
+
+def test_find_hot_pixels():
+    dark = np.random.default_rng(0).normal(100., 1., (32, 64))
+    dark[5, 7] += 50.
+    dark[0, 63] -= 50.
+    mask = find_hot_pixels(dark, sigma=8.)
+    assert mask[5, 7] and mask[0, 63]
+    assert np.count_nonzero(mask) == 2
+
+
+def test_reduce_frame():
+    frame = np.ones((8, 4))
+    dark = np.full((8, 4), 0.5)
+    assert reduce_frame(frame) == pytest.approx([8.] * 4)
+    assert reduce_frame(frame, rows=(2, 6), dark=dark) == pytest.approx([2.] * 4)
+
+    frame[3, 1] = 1000.
+    mask = np.zeros((8, 4), dtype=bool)
+    mask[3, 1] = True
+    mask[2:6, 3] = True
+    # masked pixels are replaced by the mean of the others of their column, NaN if none
+    reduced = reduce_frame(frame, rows=(2, 6), dark=dark, mask=mask)
+    assert reduced[:3] == pytest.approx([2.] * 3)
+    assert np.isnan(reduced[3])
+
+
+@pytest.mark.parametrize('processes', [0, 1])
+def test_frame_reducer(processes):
+    dark = np.full((8, 4), 0.5)
+    reducer = FrameReducer(rows=(0, 4), dark=dark, processes=processes)
+    reducer.start()
+    try:
+        futures = [reducer.submit(np.full((8, 4), float(ind))) for ind in range(5)]
+        for ind, future in enumerate(futures):
+            assert future.result(timeout=30) == pytest.approx([4 * (ind - 0.5)] * 4)
+        assert reducer.submit(np.ones((2, 2))).exception(timeout=30) is not None
+    finally:
+        reducer.stop()
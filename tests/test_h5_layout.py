@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.h5_layout import H5Layout
+
+
+def test_chunk_shape():
+    layout = H5Layout((100,), chunk_bytes=64 * 1024)
+    # averages x delays x pixels: one average, whole spectra, as many delays as fit
+    assert layout.chunk_shape((5, 100, 1024), 8) == (1, 8, 1024)
+    assert layout.chunk_shape((100, 1024), 8) == (8, 1024)
+    assert layout.chunk_shape((100,), 8) == (100,)
+    # frames bigger than a chunk are split along their first dimensions
+    assert layout.chunk_shape((100, 256, 1024), 4) == (1, 16, 1024)
+    assert layout.chunk_shape((100, 4, 65536), 4) == (1, 1, 16384)
+    # not a scan array
+    assert layout.chunk_shape((20, 1024), 8) is None
+    assert H5Layout((100,), chunk_bytes=0).chunk_shape((100, 1024), 8) is None
+
+
+def test_chunk_shape_2d_scan():
+    layout = H5Layout((30, 10), chunk_bytes=64 * 1024)
+    assert layout.chunk_shape((2, 30, 10, 512), 8) == (1, 1, 10, 512)
+    assert layout.chunk_shape((30, 10, 64), 8) == (12, 10, 64)
+
+
+def test_filters_fallback():
+    tables = pytest.importorskip('tables')
+    filters = H5Layout((10,), compression=['unknown', 'lzf', 'zlib'], level=3).get_filters('tables')
+    assert filters.complib == 'zlib' and filters.complevel == 3
+    assert H5Layout((10,), compression=['unknown']).get_filters('tables') is None
+    assert H5Layout((10,), compression=[]).get_filters('tables') is None
+    assert H5Layout((10,), compression=['unknown', 'lzf']).get_filters('h5py') == dict(compression='lzf',
+                                                                                       shuffle=True)
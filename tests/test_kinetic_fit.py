@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import time
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.kinetic_fit import GlobalKineticFit, KineticFitWorker, kinetics
+from pymodaq_plugins_mydaqscan.hardware.ta_simulator import SimulatedDelayLine, SimulatedTASpectrometer
+
+
+@pytest.fixture
+def ta_data():
+    """Noisy transient absorption of the simulator: two components (500 fs, 20 ps) and an IRF of 100 fs"""
+    spectrometer = SimulatedTASpectrometer(SimulatedDelayLine(), npixels=64)
+    delays = np.concatenate((np.linspace(-500, 2000, 30), np.geomspace(2500, 1e5, 20)))
+    rng = np.random.default_rng(0)
+    return delays, spectrometer.get_delta_od(delays) + rng.normal(0, 1e-4, (len(delays), 64)), spectrometer
+
+
+def test_kinetics(ta_data):
+    delays, _, spectrometer = ta_data
+    assert np.allclose(kinetics(delays, spectrometer.taus, irf=spectrometer.irf) @ spectrometer.amplitudes,
+                       spectrometer.get_delta_od(delays), rtol=0, atol=1e-12)
+    decay = kinetics(np.array([-1e7, -1., 0., 1000., 1e7]), [1000.])
+    assert np.allclose(decay[:, 0], [0, 0, 1, np.exp(-1), 0])
+    assert np.all(np.isfinite(kinetics(np.array([-1e7, 1e7]), [1., 1e9], irf=100.)))
+
+
+@pytest.mark.parametrize('fit_irf', [False, True])
+def test_incremental_fit(ta_data, fit_irf):
+    delays, data, spectrometer = ta_data
+    fit = GlobalKineticFit(len(delays), [300., 10000.], irf=80. if fit_irf else 100., fit_irf=fit_irf)
+    assert not fit.fit()  # no data yet
+    for ind in np.random.default_rng(1).permutation(len(delays)):
+        fit.update(ind, delays[ind], data[ind])
+        fit.fit()
+    assert fit.n_measured == len(delays)
+    assert fit.history[-1][0] == len(delays)
+    assert np.allclose(fit.taus, spectrometer.taus, rtol=0.05)
+    assert np.all(np.abs(fit.taus - spectrometer.taus) < 5 * fit.taus_std)
+    assert fit.amplitudes.shape == (2, 64)
+    assert fit.is_stable(rtol=0.05, n_fits=5)
+    if fit_irf:
+        assert fit.irf == pytest.approx(spectrometer.irf, rel=0.05)
+
+
+def test_averaging():
+    fit = GlobalKineticFit(3, [1.])
+    fit.update(1, 0.5, [1., 2.])
+    fit.update(1, 0.5, [3., 4.])
+    fit.update(0, 0., [1., 1.])
+    delays, values = fit.get_data()
+    assert np.array_equal(delays, [0., 0.5])
+    assert np.array_equal(values, [[1., 1.], [2., 3.]])
+    with pytest.raises(ValueError):
+        GlobalKineticFit(3, [-1.])
+
+
+def test_worker(ta_data):
+    delays, data, spectrometer = ta_data
+    fits = []
+    worker = KineticFitWorker(GlobalKineticFit(len(delays), [300., 10000.], irf=100.), status=fits.append)
+    worker.start()
+    for ind in range(len(delays)):
+        worker.tell(ind, delays[ind], data[ind])
+    for _ in range(500):
+        if worker.fit.n_fits > 0 and worker.fit.history[-1][0] == len(delays):
+            break
+        time.sleep(0.01)
+    worker.stop()
+    assert not worker.is_running
+    assert worker.fit.n_measured == len(delays)
+    assert len(fits) == worker.fit.n_fits > 0
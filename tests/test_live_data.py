@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from pymodaq.utils.parameter import Parameter
+from pymodaq.utils.parameter import pymodaq_ptypes  # registers the itemselect type
+
+from pymodaq_plugins_mydaqscan.extensions.live_data import LiveDataCoalescer
+
+
+def make_settings():
+    return Parameter.create(name='settings', type='group', children=[
+        {'name': 'plot_options', 'type': 'group', 'children': [
+            {'name': 'plot_0d', 'type': 'itemselect', 'value': dict(all_items=['det0/a', 'det0/b'],
+                                                                    selected=['det0/a'])},
+            {'name': 'plot_1d', 'type': 'itemselect', 'value': dict(all_items=['det1/c'], selected=['det1/c'])},
+        ]}])
+
+
+def test_cached_full_names():
+    settings = make_settings()
+    coalescer = LiveDataCoalescer(settings, lambda batch, is_first: None)
+    assert coalescer.full_names == ['det0/a', 'det1/c']
+    assert coalescer.full_names is coalescer.full_names
+    settings.child('plot_options', 'plot_0d').setValue(dict(all_items=['det0/a', 'det0/b'], selected=['det0/b']))
+    assert coalescer.full_names == ['det0/b', 'det1/c']
+    coalescer.disconnect()
+
+
+def test_batches_and_drops():
+    batches = []
+    coalescer = LiveDataCoalescer(make_settings(), lambda batch, is_first: batches.append((batch, is_first)),
+                                  refresh_rate=0., max_pending=3)
+    coalescer.add(0)
+    assert batches == [([0], True)]
+    for step in range(1, 6):  # the user interface did not acknowledge the first batch
+        coalescer.add(step)
+    assert len(batches) == 1 and coalescer.n_dropped == 2
+    coalescer.acknowledge()
+    coalescer.add(6)
+    assert batches[1] == ([4, 5, 6], False)
+
+
+def test_first_item_kept():
+    """The first item added is flagged and kept whatever its scan index (reordered or resumed scans)"""
+    batches = []
+    coalescer = LiveDataCoalescer(make_settings(), lambda batch, is_first: batches.append((batch, is_first)),
+                                  refresh_rate=1e-3, max_pending=2)
+    coalescer._in_flight = True  # the user interface is busy with a previous scan
+    for step in (7, 3, 5, 0, 2):
+        coalescer.add(step)
+    coalescer.emit_if_due(force=True)
+    assert batches == [([7, 2], True)]
+
+
+def test_refresh_rate():
+    batches = []
+    coalescer = LiveDataCoalescer(make_settings(), lambda batch, is_first: batches.append(batch),
+                                  refresh_rate=1e-3)
+    for step in range(3):
+        coalescer.add(step)
+        coalescer.acknowledge()
+    assert batches == [[0]]
+    coalescer.emit_if_due(force=True)
+    assert batches == [[0], [1, 2]]
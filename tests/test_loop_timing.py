@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from pyqtgraph.parametertree import Parameter
+
+from pymodaq_plugins_mydaqscan.models.loop_timing import COLUMNS, LoopTimer, timing_params
+
+
+def _loop(timer, tstart, input_time=0.001, output_time=0.002, dt=0.1):
+    timer.input_started(now=tstart)
+    timer.input_done(now=tstart + input_time)
+    timer.output_started(now=tstart + 0.05)
+    timer.output_done(dt, now=tstart + 0.05 + output_time)
+
+
+def test_durations_and_missed_deadlines():
+    timer = LoopTimer(length=16, deadline=0.15)
+    for tstart in [10., 10.1, 10.2, 10.4, 10.5]:
+        _loop(timer, tstart)
+    timings = timer.get_timings()
+    assert timings.shape == (5, len(COLUMNS))
+    np.testing.assert_allclose(timings[:, 0], [0., 0.1, 0.2, 0.4, 0.5])
+    assert np.isnan(timings[0, 1])
+    np.testing.assert_allclose(timings[1:, 1], [0.1, 0.1, 0.2, 0.1])
+    np.testing.assert_allclose(timings[:, 2], 0.001)
+    np.testing.assert_allclose(timings[:, 3], 0.002)
+    np.testing.assert_allclose(timings[:, 4], 0.1)
+    assert timer.n_missed == 1
+
+    stats = timer.statistics()
+    assert stats['loops'] == 5 and stats['missed'] == 1
+    assert stats['period'] == pytest.approx(0.125)
+    assert stats['jitter'] == pytest.approx(np.std([0.1, 0.1, 0.2, 0.1]))
+    assert stats['output'] == pytest.approx(0.002)
+
+
+def test_ring_buffer_keeps_the_last_loops():
+    timer = LoopTimer(length=4)
+    for ind in range(10):
+        _loop(timer, float(ind), dt=ind)
+    timings = timer.get_timings()
+    assert timings.shape == (4, len(COLUMNS))
+    np.testing.assert_allclose(timings[:, 4], [6, 7, 8, 9])
+    assert timer.statistics()['loops'] == 10
+
+    timer.reset()
+    assert timer.get_timings().shape == (0, len(COLUMNS))
+    assert np.isnan(timer.statistics()['period'])
+
+
+def test_export(tmp_path):
+    timer = LoopTimer(length=8)
+    for ind in range(3):
+        _loop(timer, ind * 0.1)
+    timer.export(tmp_path / 'timings.csv')
+    with open(tmp_path / 'timings.csv') as f:
+        assert f.readline().strip() == '# ' + ','.join(COLUMNS) + ' (s)'
+    np.testing.assert_allclose(np.loadtxt(tmp_path / 'timings.csv', delimiter=','), timer.get_timings())
+    timer.export(tmp_path / 'timings.npy')
+    np.testing.assert_array_equal(np.load(tmp_path / 'timings.npy'), timer.get_timings())
+
+
+def test_show_unmeasured_as_nan():
+    settings = Parameter.create(**timing_params)
+    timer = LoopTimer()
+    timer.show(settings)
+    assert np.isnan(settings['period'])  # no loop yet
+    _loop(timer, 0.)
+    timer.show(settings)
+    assert settings['input'] == pytest.approx(1.)
+    assert np.isnan(settings['period'])  # a single loop has no period
+    _loop(timer, 0.1)
+    timer.show(settings)
+    assert settings['period'] == pytest.approx(100.)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+import numpy as np
+import pytest
+from pyqtgraph.parametertree import Parameter
+from qtpy import QtCore, QtWidgets
+from pymodaq.extensions.pid.pid_controller import PIDRunner
+from pymodaq.utils.data import DataFromPlugins, DataToExport
+from pymodaq.utils.daq_utils import ThreadCommand
+
+from pymodaq_plugins_mydaqscan.models.PIDModelBeamPointing import PIDModelBeamPointing
+
+
+def _spot(x0, y0, shape=(120, 160), width=6., amplitude=1000.):
+    rows, cols = np.indices(shape)
+    return amplitude * np.exp(-((cols - x0) ** 2 + (rows - y0) ** 2) / (2 * width ** 2))
+
+
+class ModulesManager:
+    """Camera grabbing no spot for the first frames then a spot, stops the runner after n_loops grabs"""
+    actuators_name = PIDModelBeamPointing.actuators_name
+    detectors_name = PIDModelBeamPointing.detectors_name
+    actuators = []
+
+    def __init__(self, n_loops=20, n_dark=3, spot=(80.3, 60.7)):
+        self.runner: PIDRunner = None
+        self.n_loops = n_loops
+        self.n_dark = n_dark
+        self.spot = spot
+        self.n_grabs = 0
+        self.thread = None
+
+    def connect_detectors(self, connect=True):
+        pass
+
+    def connect_actuators(self, connect=True):
+        pass
+
+    def grab_datas(self):
+        self.thread = QtCore.QThread.currentThread()
+        frame = np.zeros((120, 160)) if self.n_grabs < self.n_dark else _spot(*self.spot)
+        self.n_grabs += 1
+        if self.n_grabs >= self.n_loops:
+            self.runner.stop_PID()
+        time.sleep(0.002)
+        QtWidgets.QApplication.processEvents()  # waiting for the detectors, the commands to the runner are processed
+        return DataToExport('grab', data=[DataFromPlugins('Camera', data=[frame], dim='Data2D', origin='Camera')])
+
+
+class PIDController:
+    """Parameters and setpoints of DAQ_PID used by the models"""
+
+    def __init__(self, modules_manager):
+        self.modules_manager = modules_manager
+        limits = [{'name': f'output_limit_{limit}', 'type': 'float', 'value': 0.} for limit in ('min', 'max')]
+        limits += [{'name': f'output_limit_{limit}_enabled', 'type': 'bool', 'value': False}
+                   for limit in ('min', 'max')]
+        self.settings = Parameter.create(name='settings', type='group', children=[
+            {'name': 'models', 'type': 'group', 'children': [
+                {'name': 'model_params', 'type': 'group', 'children': PIDModelBeamPointing.params}]},
+            {'name': 'main_settings', 'type': 'group', 'children': [
+                {'name': 'pid_controls', 'type': 'group', 'children': [
+                    {'name': 'output_limits', 'type': 'group', 'children': limits},
+                    {'name': 'pid_constants', 'type': 'group', 'children': [
+                        {'name': name, 'type': 'float', 'value': 0.} for name in ('kp', 'ki', 'kd')]}]}]}])
+        self.setpoints_sb = [QtWidgets.QDoubleSpinBox() for _ in range(PIDModelBeamPointing.Nsetpoints)]
+        for spinbox in self.setpoints_sb:
+            spinbox.setRange(-1e6, 1e6)
+
+    @property
+    def setpoints(self):
+        return [sp.value() for sp in self.setpoints_sb]
+
+    @setpoints.setter
+    def setpoints(self, values):
+        for ind, sp in enumerate(self.setpoints_sb):
+            sp.setValue(values[ind])
+
+
+class Commander(QtCore.QObject):
+    command = QtCore.Signal(ThreadCommand)
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+
+
+def _wait(condition, timeout=10.):
+    tstart = time.perf_counter()
+    while not condition():
+        QtWidgets.QApplication.processEvents()
+        assert time.perf_counter() - tstart < timeout
+        time.sleep(0.005)
+
+
+def test_timings_shown_from_the_gui_thread(qapp, monkeypatch):
+    monkeypatch.setattr(PIDModelBeamPointing, 'timing_refresh', 0.02)
+    modules_manager = ModulesManager()
+    controller = PIDController(modules_manager)
+    model = PIDModelBeamPointing(controller)
+    model.ini_model()
+    controller.setpoints = [20., 30.]  # changed by the user after the initialization of the model
+
+    inputs = []
+    convert_input = model.convert_input
+
+    def record_input(measurements):
+        dte = convert_input(measurements)
+        inputs.append([float(dwa[0][0]) for dwa in dte])
+        return dte
+    model.convert_input = record_input
+    threads = []
+    model.settings.child('timing').sigTreeStateChanged.connect(
+        lambda param, changes: threads.append(QtCore.QThread.currentThread()))
+
+    runner = PIDRunner(model, modules_manager, setpoints=controller.setpoints, params=dict(sample_time=0.001))
+    modules_manager.runner = runner
+    thread = QtCore.QThread()
+    commander = Commander()
+    commander.command.connect(runner.queue_command)
+    runner.moveToThread(thread)
+    thread.finished.connect(runner.deleteLater)  # with its timer, from its thread
+    thread.start()
+    try:
+        commander.command.emit(ThreadCommand('start_PID', []))
+        commander.command.emit(ThreadCommand('run_PID', [model.curr_output]))
+        _wait(lambda: not runner.running)
+        _wait(lambda: model.settings['timing', 'period'] > 0)
+    finally:
+        thread.quit()
+        thread.wait()
+        model._refresh_timer.stop()
+
+    assert modules_manager.thread is thread  # the loop ran in the thread of the runner
+    assert len(threads) != 0
+    assert all(param_thread is qapp.thread() for param_thread in threads)
+    assert model.timer.n_loops == modules_manager.n_loops
+    assert np.isfinite(model.settings['timing', 'input'])
+    assert np.isfinite(model.settings['timing', 'output'])
+    assert inputs[:modules_manager.n_dark] == [[20., 30.]] * modules_manager.n_dark  # no spot: at the setpoints
+    assert inputs[-1] == [pytest.approx(80.3, abs=0.01), pytest.approx(60.7, abs=0.01)]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.extensions.point_scheduler import MotionModel, PointScheduler
+
+
+def test_motion_model():
+    model = MotionModel(velocity=10., acceleration=100., settle_time=0.1)
+    # triangular profile below v**2/a = 1, trapezoidal above
+    assert model.move_time(0.25) == pytest.approx(2 * np.sqrt(0.25 / 100) + 0.1)
+    assert model.move_time(-5.) == pytest.approx(5. / 10 + 10 / 100 + 0.1)
+    assert model.move_time(0.) == 0.
+    assert MotionModel(velocity=2.).move_time([1., 4.]) == pytest.approx([0.5, 2.])
+    assert MotionModel.from_dict(dict(velocity=5., settle_time=0.2)).settle_time == 0.2
+    with pytest.raises(ValueError):
+        MotionModel(velocity=0.)
+
+
+def test_schedule_grid():
+    scheduler = PointScheduler([MotionModel(50., 500., 0.05), MotionModel(10., 20., 0.2)])
+    delays, angles = np.meshgrid(np.linspace(0, 100, 20), np.linspace(0, 90, 5), indexing='ij')
+    positions = np.stack([delays.ravel(), angles.ravel()], axis=-1)
+    order = scheduler.schedule(positions)
+    assert order[0] == 0
+    assert sorted(order) == list(range(len(positions)))
+    assert scheduler.travel_time(positions, order) < 0.5 * scheduler.travel_time(positions)
+
+
+def test_schedule_optimal_small():
+    scheduler = PointScheduler([MotionModel(1.), MotionModel(2., 1.)])
+    positions = np.random.default_rng(0).random((7, 2)) * 10
+    best = min(scheduler.travel_time(positions, (0,) + perm) for perm in itertools.permutations(range(1, 7)))
+    assert scheduler.travel_time(positions, scheduler.schedule(positions)) == pytest.approx(best)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.reference_cache import ReferenceCache
+
+
+def test_staleness():
+    cache = ReferenceCache(every_points=3, every_seconds=10.)
+    assert cache.staleness(now=0.) == 'first'
+    assert cache.set({'det0/CH00': [np.zeros((4,))]}, now=0.) == 0
+    assert cache.staleness(now=1.) == ''
+    cache.count(3)
+    assert cache.staleness(now=1.) == 'points'
+    assert cache.set({}, now=1.) == 1
+    assert cache.staleness(now=10.) == ''
+    assert cache.staleness(now=11.) == 'time'
+    cache.set({}, now=11.)
+    cache.invalidate()
+    assert cache.staleness(now=11.) == 'settings'
+    assert ReferenceCache().set({}, now=0.) == 0 and ReferenceCache().staleness() == 'first'
+
+
+def test_correct():
+    cache = ReferenceCache()
+    frame = np.arange(12, dtype=np.uint16).reshape((3, 4))
+    cache.set(ReferenceCache.average([{'cam/CH00': [np.ones((3, 4), dtype=np.uint16)]},
+                                      {'cam/CH00': [3 * np.ones((3, 4), dtype=np.uint16)], 'other': [np.zeros(2)]}]))
+    assert list(cache.references) == ['cam/CH00']
+    corrected = cache.correct('cam/CH00', [frame])
+    assert corrected[0].dtype == np.float32
+    assert np.array_equal(corrected[0], frame - 2.)
+    assert frame[0, 0] == 0  # not corrected in place
+    assert cache.correct('unknown', [frame])[0] is frame
+    assert cache.correct('cam/CH00', [frame[:2]])[0].shape == (2, 4)  # shape changed: not corrected
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.hardware.ring_buffer import RingBuffer, RingBufferError, get_ring_buffer
+
+
+def write(buffer, value):
+    slot = buffer.acquire_write(timeout=0.)
+    slot.data[:] = value
+    return buffer.commit(slot)
+
+
+def test_in_place_views():
+    buffer = RingBuffer(3, (4,))
+    seq = write(buffer, 1.)
+    slot = buffer.get(seq)
+    assert np.shares_memory(slot.data, buffer._data)
+    assert np.all(slot.data == 1.)
+    with pytest.raises(ValueError):
+        slot.data[0] = 2.
+    assert buffer.n_in_use == 1
+    slot.release()
+    assert buffer.n_in_use == 0
+
+
+def test_back_pressure():
+    buffer = RingBuffer(2, (4,))
+    slots = [buffer.get(write(buffer, ind)) for ind in range(2)]
+    with pytest.raises(RingBufferError):
+        buffer.acquire_write(timeout=0.01)
+    with slots[0]:
+        pass
+    seq = write(buffer, 2.)
+    assert seq == 2
+    slots[1].release()
+
+
+def test_overwrite():
+    buffer = RingBuffer(2, (4,), overwrite=True)
+    reading = buffer.get(write(buffer, 0.))
+    write(buffer, 1.)
+    with pytest.raises(RingBufferError):  # the slot being read is never overwritten
+        buffer.acquire_write(timeout=0.01)
+    reading.release()
+    write(buffer, 2.)
+    write(buffer, 3.)  # drops frame 1
+    assert buffer.n_dropped == 1
+    with pytest.raises(RingBufferError):
+        buffer.get(1, timeout=0.)
+    with buffer.get(3) as slot:
+        assert np.all(slot.data == 3.)
+
+
+def test_registry():
+    buffer = get_ring_buffer('test', 4, (2, 3))
+    assert get_ring_buffer('test') is buffer
+    assert get_ring_buffer('test', 4, (2, 3)) is buffer
+    assert get_ring_buffer('test', 4, (3, 3)).shape == (3, 3)
+    with pytest.raises(KeyError):
+        get_ring_buffer('missing')
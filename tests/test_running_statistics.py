@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.running_statistics import RunningStatistics
+
+
+def test_welford_matches_numpy():
+    rng = np.random.default_rng(0)
+    sweeps = 1e3 + rng.standard_normal((7, 4, 3, 16))  # (averages, scan shape, pixels)
+    stats = RunningStatistics((4, 3))
+    for sweep in sweeps:
+        for ind in np.ndindex(4, 3):
+            stats.update(ind, 'spectrum', sweep[ind])
+    assert np.all(stats.count('spectrum') == 7)
+    assert np.allclose(stats.mean('spectrum'), sweeps.mean(axis=0))
+    assert np.allclose(stats.variance('spectrum'), sweeps.var(axis=0, ddof=1))
+    assert np.allclose(stats.stderr('spectrum'), sweeps.std(axis=0, ddof=1) / np.sqrt(7))
+
+
+def test_partial_counts():
+    stats = RunningStatistics((3,))
+    stats.update((0,), 'value', [1.])
+    stats.update((0,), 'value', [3.])
+    stats.update((1,), 'value', [2.])
+    assert np.all(stats.count('value') == [2, 1, 0])
+    assert np.allclose(stats.mean('value')[:2, 0], [2., 2.])
+    variance = stats.variance('value')[:, 0]
+    assert variance[0] == 2. and np.all(np.isnan(variance[1:]))
+
+
+def test_snapshot_is_a_copy():
+    stats = RunningStatistics((2,))
+    stats.update((0,), 'value', [1.])
+    mean, variance, count = stats.snapshot()['value']
+    stats.update((0,), 'value', [3.])
+    assert mean[0, 0] == 1. and count[0] == 1
+
+
+def test_scalar_values():
+    stats = RunningStatistics((2,))
+    stats.update((0,), 'x', 1.)
+    stats.update((0,), 'x', 3.)
+    assert stats.mean('x')[0] == 2.
+    assert stats.variance('x')[0] == 2.
+    assert stats.count('x')[0] == 2 and stats.mean('x')[1] == 0.
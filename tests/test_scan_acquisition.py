@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""Headless acquisitions of the custom TA scan with the mock modules of the benchmarks"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tables')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from qtpy import QtWidgets
+
+from pymodaq.utils.h5modules import module_saving
+from pymodaq.utils.h5modules.backends import H5Backend
+from pymodaq.utils.h5modules.saving import H5Saver
+from pymodaq.utils.managers.modules_manager import ModulesManager
+from pymodaq.utils.data import DataFromPlugins, DataToExport
+from pymodaq.utils.parameter import Parameter
+from pymodaq.utils.scanner.scanner import Scanner, scanner_factory
+
+from pymodaq_plugins_mydaqscan.extensions.checkpoint import ScanCheckpoint
+from pymodaq_plugins_mydaqscan import config as plugin_config
+from pymodaq_plugins_mydaqscan.extensions.mydaqscan import mydaqscan, myDAQScanAcquisition
+from pymodaq_plugins_mydaqscan.processing.ta_loader import open_scan
+from pymodaq_plugins_mydaqscan.scanners.mydaqscanner import Scan1DTAAdaptive
+
+sys.path.insert(0, str(Path(__file__).parents[1].joinpath('benchmarks')))
+import bench_scan  # noqa: E402
+import mock_plugins  # noqa: E402
+
+N_POINTS = 5
+N_AVERAGES = 2
+
+
+@pytest.fixture(scope='module', params=['0D'])
+def modules(request):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    mock_plugins.register()
+    actuator, detectors = bench_scan.make_modules([request.param], shapes={'2D': '4x6'})
+    yield actuator, detectors
+    actuator.quit_fun()
+    for detector in detectors:
+        detector.quit_fun()
+    QtWidgets.QApplication.processEvents()
+
+
+def make_acquisition(modules, path: Path, settings_update: dict, resume=False,
+                     scan_subtype='Linear', scanner_update: dict = None) -> myDAQScanAcquisition:
+    """Create the acquisition of a 1D scan, in a new scan node or in the last one of the file to resume it
+
+    The scan is linear over N_POINTS positions, unless another scan subtype and its settings are given.
+    """
+    actuator, detectors = modules
+    modules_manager = ModulesManager(detectors, [actuator])
+    modules_manager.selected_actuators_name = [actuator.title]
+    modules_manager.selected_detectors_name = [detector.title for detector in detectors]
+
+    scanner = Scanner(actuators=modules_manager.actuators)
+    # the subtypes of the package are registered after the scanner parameters were declared
+    scanner.settings.child('scan_sub_type').setOpts(limits=scanner_factory.scan_sub_types('Scan1D'))
+    scanner.set_scan_type_and_subtypes('Scan1D', scan_subtype)
+    if scanner_update is None:
+        scanner_update = {'start': 0., 'stop': N_POINTS - 1, 'step': 1.}
+    for name, value in scanner_update.items():
+        scanner.get_scanner_sub_settings().child(name).setValue(value)
+    scanner.set_scan()
+
+    settings = Parameter.create(name='settings', type='group', children=mydaqscan.params)
+    settings.child('scan_options', 'scan_average').setValue(N_AVERAGES)
+    settings.child('time_flow', 'wait_time_between').setValue(0)
+    for param_path, value in settings_update.items():
+        settings.child(*param_path.split('/')).setValue(value)
+    modules_manager.get_det_data_list()
+    for dim in ('0D', '1D'):
+        data_list = modules_manager.settings['data_dimensions', f'det_data_list{dim}']
+        data_list['selected'] = data_list['all_items']
+        settings.child('plot_options', f'plot_{dim.lower()}').setValue(data_list)
+
+    h5saver = H5Saver()
+    h5saver.settings.child('current_h5_file').setValue(str(path))
+    h5saver.init_file(update_h5=not resume, addhoc_file_path=path)
+    module_saver = module_saving.ScanSaver(bench_scan._ScanModule(modules_manager, settings))
+    module_saver.h5saver = h5saver
+    checkpoint = None
+    if resume:
+        scan_node = module_saver.get_last_node()
+        checkpoint = ScanCheckpoint.load(h5saver, scan_node)
+        scan_node.attrs['scan_done'] = False
+    module_saver.get_set_node(new=not resume)
+
+    acquisition = myDAQScanAcquisition(settings, scanner, h5saver.settings, modules_manager,
+                                       module_saver=module_saver)
+    acquisition.set_resume(checkpoint)
+    acquisition.statuses = []
+    acquisition.status_sig.connect(acquisition.statuses.append)
+    acquisition.saver = h5saver
+    return acquisition
+
+
+def run(acquisition: myDAQScanAcquisition, stop_after: int = None):
+    """Run the acquisition synchronously, stopping it as from the user interface after a number of steps"""
+    if stop_after is not None:
+        det_done = acquisition.det_done
+
+        def det_done_and_stop(*args):
+            det_done(*args)
+            if acquisition._n_steps >= stop_after:
+                acquisition.stop_scan_flag = True
+        acquisition.det_done = det_done_and_stop
+    acquisition.start_acquisition()
+    QtWidgets.QApplication.processEvents()
+    acquisition.h5saver.close_file()
+    acquisition.saver.close_file()
+    return ['Scan_done'] in acquisition.statuses
+
+
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_resume_stopped_scan(modules, tmp_path, pipelined):
+    path = tmp_path.joinpath('scan.h5')
+    settings_update = {'ta_options/checkpoint_points': 1, 'ta_options/pipelined': pipelined}
+    assert run(make_acquisition(modules, path, settings_update), stop_after=3)
+    assert run(make_acquisition(modules, path, settings_update, resume=True))
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        scan = h5backend.get_node('/RawData/Scan000')
+        assert ScanCheckpoint.load(h5backend, scan).is_complete
+        measured = h5backend.get_node(scan, 'MeasuredPositions/Measured00').read()
+        assert measured.shape == (N_AVERAGES, N_POINTS)
+        assert np.allclose(measured, np.arange(N_POINTS))
+        durations = h5backend.get_node(scan, 'Timing/Durations')
+        grab = durations.read()[..., durations.attrs['phases'].split(',').index('grab')]
+        assert not np.any(np.isnan(grab))  # steps of both runs
+    finally:
+        h5backend.close_file()
+
+
+def test_references_compressed(modules, tmp_path):
+    path = tmp_path.joinpath('scan.h5')
+    assert run(make_acquisition(modules, path, {'ta_options/references/enabled': True,
+                                                'ta_options/references/positions': '-1',
+                                                'ta_options/references/every_points': 4}))
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        references = h5backend.get_node('/RawData/Scan000/References')
+        assert sorted(references.children_name()) == ['History', 'Index', 'Reference00']
+        for name in ('History', 'Reference00'):
+            node = h5backend.get_node(references, name)
+            assert node.attrs['CLASS'] == 'EARRAY'
+            assert node.node.filters.complevel > 0
+        assert h5backend.get_node(references, 'History').read().shape[0] == 3
+    finally:
+        h5backend.close_file()
+
+
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_references_subtracted_from_copies(modules, tmp_path, pipelined):
+    """The saved data are corrected by the references, the data of the detectors are left as grabbed"""
+    path = tmp_path.joinpath('scan.h5')
+    acquisition = make_acquisition(modules, path, {'ta_options/pipelined': pipelined,
+                                                   'ta_options/references/enabled': True,
+                                                   'ta_options/references/positions': '-1',
+                                                   'ta_options/references/every_points': 4})
+    assert run(acquisition)
+    detector = acquisition.modules_manager.detectors[0]
+    frame = detector.controller.frame  # the mock data are this frame times 1 +- 1e-3 noise
+    assert np.allclose(detector._data_to_save_export[0][0], frame, rtol=1e-2)
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        saved = h5backend.get_node('/RawData/Scan000/Detector000/Data0D/CH00/Data00').read()
+        assert np.all(np.abs(saved) < 1e-2 * frame)
+    finally:
+        h5backend.close_file()
+
+
+def test_step_timings(modules, tmp_path):
+    path = tmp_path.joinpath('scan.h5')
+    acquisition = make_acquisition(modules, path, {'ta_options/checkpoint_points': 1,
+                                                   'ta_options/references/enabled': True,
+                                                   'ta_options/references/positions': '-1',
+                                                   'ta_options/references/every_points': 4})
+    assert run(acquisition)
+    profiler = acquisition._profiler
+    durations = profiler.durations.reshape((-1, len(profiler.phases)))
+    reference = durations[:, profiler.phases.index('reference')]
+    assert np.count_nonzero(np.logical_not(np.isnan(reference))) == N_AVERAGES * N_POINTS
+    assert np.count_nonzero(reference > np.nanmedian(reference) + 0.01) >= 2  # steps after which references are taken
+    assert not np.any(np.isnan(durations[:, profiler.phases.index('checkpoint')]))
+    # the phases cover the whole step
+    step_times = np.diff(profiler.start_times.ravel())
+    assert np.allclose(np.nansum(durations, axis=1)[:-1], step_times, atol=0.01)
+
+
+def test_pipelined_step_timings(modules, tmp_path):
+    """Pipelined steps only queue their data, the time spent writing them is saved apart"""
+    path = tmp_path.joinpath('scan.h5')
+    acquisition = make_acquisition(modules, path, {'ta_options/pipelined': True})
+    assert run(acquisition)
+    assert 'enqueue' in acquisition._profiler.phases and 'save' not in acquisition._profiler.phases
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        durations = h5backend.get_node('/RawData/Scan000/Timing/Durations')
+        assert 'enqueue' in durations.attrs['phases'].split(',')
+        assert durations.attrs['writer_points'] == N_AVERAGES * N_POINTS
+        assert durations.attrs['writer_batches'] >= 1 and durations.attrs['writer_time'] > 0
+    finally:
+        h5backend.close_file()
+
+
+@pytest.mark.parametrize('modules', ['2D'], indirect=True)
+def test_raw_frames_kept(modules, tmp_path):
+    path = tmp_path.joinpath('scan.h5')
+    assert run(make_acquisition(modules, path, {'ta_options/reduction/enabled': True,
+                                                'ta_options/reduction/processes': 0,
+                                                'ta_options/reduction/raw_every': 3}))
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        scan = h5backend.get_node('/RawData/Scan000')
+        raw_frames = h5backend.get_node(scan, 'ReducedFrames/Raw_frames')
+        assert raw_frames.attrs['raw_every'] == 3
+        kept = raw_frames.read().astype(bool)
+        assert np.array_equal(np.flatnonzero(kept), [0, 3, 6, 9])
+        frames = h5backend.get_node(scan, 'Detector000/Data2D/CH00/Data00')
+        assert frames.attrs['raw_every'] == 3
+        frames = frames.read()
+        assert frames.shape == (N_AVERAGES, N_POINTS, 4, 6)
+        assert not np.any(np.isnan(frames[kept])) and np.all(np.isnan(frames[np.logical_not(kept)]))
+        assert h5backend.get_node(scan, 'ReducedFrames/Channel000').read().shape == (N_AVERAGES, N_POINTS, 6)
+    finally:
+        h5backend.close_file()
+
+
+def test_pipelined_saving_as_direct(modules, tmp_path):
+    """The batched writes of a pipelined scan give the same detector arrays as a scan saving each step directly"""
+    arrays = []
+    for pipelined in (False, True):
+        path = tmp_path.joinpath(f'scan_{pipelined}.h5')
+        np.random.seed(0)  # same random factors of the mock frames in both scans
+        assert run(make_acquisition(modules, path, {'ta_options/pipelined': pipelined,
+                                                    'ta_options/writer/flush_points': 3}))
+        h5backend = H5Backend()
+        h5backend.open_file(str(path), 'r')
+        try:
+            scan = h5backend.get_node('/RawData/Scan000')
+            arrays.append({node.path: node.read() for node in h5backend.walk_nodes(scan)
+                           if 'ARRAY' in node.attrs['CLASS'] and 'Detector' in node.path})
+        finally:
+            h5backend.close_file()
+    direct, pipelined = arrays
+    assert len(direct) != 0 and direct.keys() == pipelined.keys()
+    for path, array in direct.items():
+        assert np.array_equal(array, pipelined[path], equal_nan=True), path
+
+
+@pytest.mark.parametrize('stop_after', [None, 4])
+def test_adaptive_nav_axis(modules, tmp_path, stop_after):
+    path = tmp_path.joinpath('scan.h5')
+    acquisition = make_acquisition(modules, path, {}, scan_subtype=Scan1DTAAdaptive.scan_subtype,
+                                   scanner_update={'start': 0., 'stop': 1., 'n_init': 3, 'max_points': 8,
+                                                   'loss_goal': 0.})
+    acquisition.modules_manager.settings.child('data_dimensions', 'det_data_list0D').setValue(
+        acquisition.scan_settings['plot_options', 'plot_0d'])
+    assert run(acquisition, stop_after=stop_after)
+    n_measured = 8 if stop_after is None else stop_after
+    scanner = acquisition.scanner
+    assert np.array_equal(scanner.axes_unique[0][scanner.axes_indexes[:n_measured, 0]],
+                          scanner.positions[:n_measured, 0])
+
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'r')
+    try:
+        scan = h5backend.get_node('/RawData/Scan000')
+        measured = h5backend.get_node(scan, 'MeasuredPositions/Measured00').read()
+        axis = h5backend.get_node(scan, 'NavAxes/Axis00')
+        assert axis.attrs['label'] == acquisition.modules_manager.actuators[0].title
+        assert axis.attrs['measured'] == n_measured
+        positions = axis.read()
+        assert np.allclose(positions[:n_measured], measured[0, :n_measured])
+        assert np.all(np.isnan(positions[n_measured:]))
+        data = h5backend.get_node(scan, 'Detector000/Data0D/CH00/Data00').read()
+        assert np.all(np.isnan(data[..., n_measured:])) and not np.any(np.isnan(data[0, :n_measured]))
+    finally:
+        h5backend.close_file()
+
+
+def test_ring_buffer_dropped_frames(modules, tmp_path):
+    acquisition = make_acquisition(modules, tmp_path.joinpath('scan.h5'), {})
+    acquisition.ind_scan, acquisition.ind_average = 0, 0
+    for seq in (3, 4, 7, 8):
+        acquisition._check_ring_sequence(DataToExport('ring', data=[
+            DataFromPlugins(name='Frame', data=[np.array([float(seq)])], dim='Data0D', ring_buffer='camera')]))
+    assert acquisition._ring_dropped == {'camera': 2}
+    assert sum('dropped' in status[1] for status in acquisition.statuses) == 1
+    acquisition.h5saver.close_file()
+    acquisition.saver.close_file()
+
+
+@pytest.mark.parametrize('modules', ['2D'], indirect=True)
+def test_optimized_layout_read_back(modules, tmp_path):
+    """A scan saved with the optimized layout reads the same through open_scan as one saved without it"""
+    optimized_layout = plugin_config['h5', 'optimized_layout']
+    paths = []
+    try:
+        for layout in (False, True):
+            plugin_config['h5', 'optimized_layout'] = layout
+            paths.append(tmp_path.joinpath(f'scan_{layout}.h5'))
+            np.random.seed(0)  # same random factors of the mock frames in both scans
+            assert run(make_acquisition(modules, paths[-1], {}))
+    finally:
+        plugin_config['h5', 'optimized_layout'] = optimized_layout
+
+    with open_scan(paths[0]) as default, open_scan(paths[1]) as optimized:
+        assert default.keys() == optimized.keys() and len(default.keys()) != 0
+        for key in default.keys():
+            array = default[key]
+            assert (array.shape, array.dtype, array.dims) == (optimized[key].shape, optimized[key].dtype,
+                                                              optimized[key].dims)
+            if not key.startswith('Timing/'):  # durations of the steps of each run
+                assert np.array_equal(np.asarray(array), np.asarray(optimized[key]), equal_nan=True), key
+            for label in array.axes:
+                assert np.array_equal(array.axis(label), optimized[key].axis(label))
+        assert default.nav_axes.keys() == optimized.nav_axes.keys()
+    h5backend = H5Backend()
+    h5backend.open_file(str(paths[1]), 'r')
+    try:
+        assert h5backend.get_node('/RawData/Scan000/Detector000/Data2D/CH00/Data00').node.filters.complevel > 0
+    finally:
+        h5backend.close_file()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+pytest.importorskip('tables')
+
+from pymodaq.utils.h5modules.backends import H5Backend
+
+from pymodaq_plugins_mydaqscan.extensions.checkpoint import ScanCheckpoint
+
+
+@pytest.fixture
+def scan_node(tmp_path):
+    h5backend = H5Backend()
+    h5backend.open_file(str(tmp_path.joinpath('scan.h5')), 'w')
+    yield h5backend, h5backend.get_set_group(h5backend.get_set_group(h5backend.root(), 'RawData'), 'Scan000')
+    h5backend.close_file()
+
+
+def test_next_step():
+    checkpoint = ScanCheckpoint(np.full((2, 4, 1), np.nan), np.arange(4))
+    assert checkpoint.next_step() == (0, 0)
+    checkpoint.set_step(0, 3, 2, 3)
+    assert checkpoint.next_step() == (0, 3)
+    checkpoint.set_step(0, 4, 3, 4)
+    assert checkpoint.next_step() == (1, 0)
+    assert not checkpoint.is_complete
+    checkpoint.set_step(1, 4, 0, 8)
+    assert checkpoint.is_complete
+
+
+def test_save_load(scan_node):
+    h5backend, node = scan_node
+    assert ScanCheckpoint.load(h5backend, node) is None
+
+    measured = np.full((3, 5, 1), np.nan)
+    checkpoint = ScanCheckpoint(measured, [0, 2, 1, 4, 3], scan_settings='<settings/>',
+                                scanner_settings='<scanner/>', scanner_parameters='<parameters/>',
+                                actuators=['delay'], detectors=['det0', 'det1'])
+    checkpoint.save(h5backend, node)
+    measured[1, :2, 0] = [0.1, 0.2]
+    measured[2, 0] = 1.  # not written: only the given averages are saved
+    checkpoint.set_step(1, 2, 2, 7)
+    checkpoint.save(h5backend, node, averages=[1])
+
+    loaded = ScanCheckpoint.load(h5backend, node)
+    assert loaded.get_state() == dict(ind_average=1, ind_step=2, ind_scan=2, n_steps=7)
+    assert loaded.next_step() == (1, 2)
+    assert np.array_equal(loaded.order, [0, 2, 1, 4, 3])
+    assert np.allclose(loaded.measured[1, :2, 0], [0.1, 0.2])
+    assert np.all(np.isnan(loaded.measured[2]))
+    assert loaded.scanner_parameters == '<parameters/>'
+    assert loaded.actuators == ['delay'] and loaded.detectors == ['det0', 'det1']
+
+
+def test_save_state_snapshot(scan_node):
+    h5backend, node = scan_node
+    checkpoint = ScanCheckpoint(np.zeros((1, 3, 1)), np.arange(3))
+    state = checkpoint.get_state()
+    checkpoint.set_step(0, 2, 1, 2)  # the acquisition went on before the checkpoint was written
+    checkpoint.save(h5backend, node, state)
+    assert ScanCheckpoint.load(h5backend, node).get_state() == state
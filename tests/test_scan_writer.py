@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from pymodaq_plugins_mydaqscan.extensions.scan_writer import ScanWriter
+
+
+def test_consecutive_merge_jobs_are_merged():
+    calls = []
+    writer = ScanWriter(maxsize=64, flush_points=4, flush_interval=10., flush=lambda: calls.append('flush'))
+    save = lambda steps: calls.append(('steps', [step[0] for step in steps]))
+    writer.start()
+    for ind in range(3):
+        writer.write(save, ind, merge=True)
+    writer.write(lambda: calls.append('other'), n_points=0)
+    writer.write(save, 3, merge=True)
+    writer.stop()
+    assert calls == [('steps', [0, 1, 2]), 'other', ('steps', [3]), 'flush']
+
+
+def test_merge_without_worker():
+    calls = []
+    ScanWriter().write(lambda steps: calls.append(steps), 'a', 1, merge=True)
+    assert calls == [[('a', 1)]]
+
+
+def test_pending_jobs_are_bounded():
+    release = threading.Event()
+    writer = ScanWriter(maxsize=3, flush_points=100, flush_interval=100.)
+    assert writer.flush_points == 3
+    writer.start()
+    writer.submit(release.wait)
+    blocked = threading.Thread(target=lambda: [writer.write(lambda: None) for _ in range(3)])
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()  # one slot held by the submitted job, the batch cannot hold the three writes
+    release.set()
+    blocked.join(2.)
+    assert not blocked.is_alive()
+    writer.stop()
+    assert writer.n_points_written == 3
+
+
+def test_chunk_rounding_does_not_exceed_the_bound():
+    writer = ScanWriter(maxsize=20, flush_points=12, chunk_points=lambda: 5)
+    writer.start()
+    writer.write(lambda: None)
+    writer.stop()
+    assert writer.flush_points == 10
+    writer = ScanWriter(maxsize=20, flush_points=4, chunk_points=lambda: 50)
+    writer.start()
+    writer.write(lambda: None)
+    writer.stop()
+    assert writer.flush_points == 20
+
+
+def test_write_time():
+    writer = ScanWriter(maxsize=64, flush_points=2, flush_interval=10.)
+    writer.start()
+    for ind in range(5):
+        writer.write(time.sleep, 0.01)
+    writer.stop()
+    assert writer.n_batches == 3 and writer.n_points_written == 5
+    assert writer.write_time >= 0.05 and 0.02 <= writer.max_latency <= writer.write_time
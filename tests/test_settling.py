@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from pymodaq_plugins_mydaqscan.extensions.settling import SettlingMonitor
+
+
+def test_settling_monitor():
+    monitor = SettlingMonitor([0.1, 1.], window=0.05, timeout=1.)
+    monitor.reset(now=0.)
+    assert not monitor.update([0.5, 0.], now=0.01)
+    assert not monitor.update([0.05, 0.5], now=0.02)
+    assert not monitor.update([0.05, 0.5], now=0.06)
+    # a deviation out of tolerance restarts the stability window
+    assert not monitor.update([0.05, 2.], now=0.07)
+    assert not monitor.update([-0.05, -0.5], now=0.08)
+    assert monitor.update([-0.05, -0.5], now=0.13)
+    assert not monitor.is_timed_out(now=0.13)
+
+
+def test_settling_timeout():
+    monitor = SettlingMonitor(0.1, window=0., timeout=0.5)
+    monitor.reset(now=0.)
+    assert not monitor.update(1., now=0.4)
+    assert not monitor.is_timed_out(now=0.4)
+    assert monitor.is_timed_out(now=0.5)
+    assert monitor.update(0., now=0.6)
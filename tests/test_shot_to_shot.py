@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from pymodaq_plugins_mydaqscan.processing.shot_to_shot import outlier_mask, pair_shots, transient_signal
+
+
+def make_block(nshots=2000, npixels=64, dod=1e-3, outliers=20, seed=0):
+    rng = np.random.default_rng(seed)
+    shots = 1e4 * (1 + 0.01 * rng.standard_normal((nshots, 1))) * np.ones((nshots, npixels))
+    shots += 10 * rng.standard_normal(shots.shape)
+    pumped = np.arange(nshots) % 2 == 1
+    shots[pumped] *= 10 ** -dod
+    shots[rng.choice(nshots, outliers, replace=False)] *= 0.2
+    return shots, pumped
+
+
+def test_pair_shots():
+    shots = np.arange(10).reshape((5, 2))
+    on, off = pair_shots(shots, [True, False, True, False, True])
+    assert on.shape == off.shape == (2, 2)
+    assert np.all(on[:, 0] == [0, 4]) and np.all(off[:, 0] == [2, 6])
+
+
+def test_outlier_mask():
+    values = np.array([[1., 1.1, 0.9, 1.05, 10.], [np.nan, 1., 1., 1., 1.]]).T
+    mask = outlier_mask(values, threshold=5.)
+    assert np.all(mask[:, 0] == [False, False, False, False, True])
+    assert not np.any(mask[:, 1])
+
+
+@pytest.mark.parametrize('mode', ['dOD', 'dT/T'])
+def test_transient_signal(mode):
+    shots, pumped = make_block()
+    signal, stderr, rejected = transient_signal(shots, pumped, mode=mode, threshold=5.)
+    expected = 1e-3 if mode == 'dOD' else 10 ** -1e-3 - 1
+    assert np.all(np.abs(signal - expected) < 5 * stderr)
+    assert 0 < rejected < 0.1
+
+    signal_raw, stderr_raw, rejected_raw = transient_signal(shots, pumped, mode=mode, threshold=0.)
+    assert rejected_raw == 0
+    assert np.mean(stderr_raw) > np.mean(stderr)
+
+
+def test_transient_signal_no_pairs():
+    with pytest.raises(ValueError):
+        transient_signal(np.ones((4, 3)), np.ones((4,), dtype=bool))
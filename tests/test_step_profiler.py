@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import time
+
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.step_profiler import StepProfiler
+
+
+def test_step_profiler():
+    profiler = StepProfiler(['move', 'grab', 'save'], (2, 3))
+    for ind_average in range(2):
+        for ind_scan in range(3):
+            profiler.start_step(ind_average, ind_scan)
+            profiler.mark('move')
+            time.sleep(0.005)
+            profiler.mark('grab')
+    assert np.all(np.isnan(profiler.durations[..., 2]))
+    assert np.all(profiler.durations[..., 1] >= 0.005)
+    assert np.all(np.diff(profiler.start_times.ravel()) > 0)
+
+    summary = profiler.summary()
+    assert list(summary.keys()) == ['move', 'grab']
+    mean, p95, max_ = summary['grab']
+    assert 0.005 <= mean <= p95 <= max_
+    assert 0 <= profiler.dead_time_fraction() < 0.5
+    assert 'dead time' in profiler.format_summary()
+
+
+def test_mark_without_step():
+    profiler = StepProfiler(['grab'], (1,))
+    profiler.mark('grab')
+    assert np.isnan(profiler.durations).all() and np.isnan(profiler.dead_time_fraction())
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from pymodaq_plugins_mydaqscan.extensions.checkpoint import ScanCheckpoint
+from pymodaq_plugins_mydaqscan.extensions.early_stopping import EarlyStopping
+from pymodaq_plugins_mydaqscan.extensions.point_scheduler import MotionModel, PointScheduler, sweep_order
+
+SCAN_SHAPE = (6, 4)
+
+
+def _grid():
+    delays, angles = np.meshgrid(np.linspace(0, 100, SCAN_SHAPE[0]), np.linspace(0, 90, SCAN_SHAPE[1]),
+                                 indexing='ij')
+    return np.stack([delays.ravel(), angles.ravel()], axis=-1)
+
+
+def _acquire(positions, order, saved, acquired, checkpoint, start=(0, 0), stop_after=None):
+    """Run the sweeps of the acquisition loop, saving the positions of each step at its scan indexes
+
+    Returns the number of steps acquired before stopping (after stop_after steps if not None)
+    """
+    start_average, start_step = start
+    n_steps = 0
+    for ind_average in range(start_average, saved.shape[0]):
+        sweep = sweep_order(order, ind_average, serpentine=True)
+        for ind_step in range(start_step if ind_average == start_average else 0, len(sweep)):
+            if stop_after is not None and n_steps == stop_after:
+                return n_steps
+            ind_scan = int(sweep[ind_step])
+            indexes = np.unravel_index(ind_scan, SCAN_SHAPE)
+            saved[(ind_average,) + indexes] = positions[ind_scan]
+            acquired[ind_average, ind_scan] += 1
+            n_steps += 1
+            checkpoint.set_step(ind_average, ind_step + 1, ind_scan, n_steps)
+    return n_steps
+
+
+def test_sweep_order():
+    order = np.array([0, 2, 1, 3])
+    assert np.array_equal(sweep_order(order, 0), order) and np.array_equal(sweep_order(order, 1), order)
+    assert np.array_equal(sweep_order(order, 2, serpentine=True), order)
+    assert np.array_equal(sweep_order(order, 3, serpentine=True), [3, 1, 2, 0])
+
+
+def test_serpentine_minimal_travel_time_saving():
+    positions = _grid()
+    order = PointScheduler([MotionModel(50., 500., 0.05), MotionModel(10., 20., 0.2)]).schedule(positions)
+    assert not np.array_equal(order, np.arange(len(positions)))
+    naverage = 3
+    saved = np.full((naverage,) + SCAN_SHAPE + (2,), np.nan)
+    acquired = np.zeros((naverage, len(positions)), dtype=int)
+    checkpoint = ScanCheckpoint(np.full((naverage, len(positions), 2), np.nan), order)
+    _acquire(positions, order, saved, acquired, checkpoint)
+    assert np.all(acquired == 1)
+    assert np.array_equal(saved, np.broadcast_to(positions.reshape(SCAN_SHAPE + (2,)), saved.shape))
+    for ind_average in range(naverage - 1):  # a sweep starts where the previous one stopped
+        assert sweep_order(order, ind_average, True)[-1] == sweep_order(order, ind_average + 1, True)[0]
+    assert checkpoint.is_complete
+
+
+def test_resume_in_a_reversed_sweep():
+    positions = _grid()
+    order = PointScheduler([MotionModel(50., 500., 0.05), MotionModel(10., 20., 0.2)]).schedule(positions)
+    npoints = len(positions)
+    saved = np.full((3,) + SCAN_SHAPE + (2,), np.nan)
+    acquired = np.zeros((3, npoints), dtype=int)
+    checkpoint = ScanCheckpoint(np.full((3, npoints, 2), np.nan), order)
+    _acquire(positions, order, saved, acquired, checkpoint, stop_after=npoints + 5)
+    assert checkpoint.next_step() == (1, 5)
+    assert checkpoint.ind_scan == order[::-1][4]  # the last step acquired in the reversed sweep
+    _acquire(positions, checkpoint.order, saved, acquired, checkpoint, start=checkpoint.next_step())
+    assert np.all(acquired == 1)
+    assert np.array_equal(saved, np.broadcast_to(positions.reshape(SCAN_SHAPE + (2,)), saved.shape))
+    assert checkpoint.is_complete
+
+
+def test_early_stopping_keeps_the_sweep_direction():
+    order = np.array([0, 3, 1, 4, 2])
+    early_stop = EarlyStopping(4, 5, target=0.1, min_averages=2)
+    noise = np.array([0.01, 1., 0.01, 1., 1.])
+    for ind_average in range(2):
+        for ind_scan in early_stop.pending(sweep_order(order, ind_average, serpentine=True)):
+            early_stop.update(ind_average, ind_scan, 1. + noise[ind_scan] * (-1) ** ind_average * np.ones((4,)))
+    assert np.array_equal(early_stop.converged(), [True, False, True, False, False])
+    assert np.array_equal(early_stop.pending(sweep_order(order, 2, serpentine=True)), [3, 1, 4])
+    assert np.array_equal(early_stop.pending(sweep_order(order, 3, serpentine=True)), [4, 1, 3])
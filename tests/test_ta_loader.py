@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+pytest.importorskip('tables')
+
+from pymodaq.utils.h5modules.backends import H5Backend
+
+from pymodaq_plugins_mydaqscan.exporters.ta_npy import export_file
+from pymodaq_plugins_mydaqscan.processing.ta_loader import ReadCache, _normalize_key, open_scan
+
+
+def _add_array(h5backend, group, name, array, **attrs):
+    node = h5backend.create_carray(group, name, obj=array, title=attrs.pop('title', name))
+    for key, value in attrs.items():
+        node.attrs[key] = value
+    return node
+
+
+@pytest.fixture
+def scan_file(tmp_path):
+    """Minimal tree of a scan with 3 averages of 5 delays and a 1D detector of 16 pixels"""
+    path = tmp_path.joinpath('scan.h5')
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'w')
+    scan = h5backend.get_set_group(h5backend.get_set_group(h5backend.root(), 'RawData'), 'Scan000')
+    nav = h5backend.get_set_group(scan, 'NavAxes')
+    _add_array(h5backend, nav, 'Axis00', np.linspace(0, 4, 5), title='delay', data_type='axis', label='delay',
+               index=1)
+    _add_array(h5backend, nav, 'Axis01', np.arange(3.), title='Average', data_type='axis', label='Average', index=0)
+    measured = h5backend.get_set_group(scan, 'MeasuredPositions')
+    positions = np.linspace(0, 4, 5) + np.random.normal(0, 0.01, (3, 5))
+    _add_array(h5backend, measured, 'Measured00', positions, title='measured_delay', data_type='data',
+               label='measured_delay')
+    channel = h5backend.get_set_group(h5backend.get_set_group(h5backend.get_set_group(scan, 'Detector000'),
+                                                              'Data1D'), 'CH00')
+    data = np.arange(3 * 5 * 16, dtype=float).reshape((3, 5, 16))
+    _add_array(h5backend, channel, 'Data00', data, title='spectro', data_type='data', data_dimension='Data1D')
+    _add_array(h5backend, channel, 'Axis00', np.linspace(400, 700, 16), title='Wavelength', data_type='axis',
+               label='Wavelength', index=2)
+    h5backend.close_file()
+    return path, data, positions
+
+
+@pytest.fixture(params=['h5', 'npy'])
+def scan(request, scan_file, tmp_path):
+    path, data, positions = scan_file
+    if request.param == 'npy':
+        path = tmp_path.joinpath('export', 'scan.json')
+        export_file(scan_file[0], path)
+    with open_scan(path) as scan:
+        yield scan, data, positions
+
+
+def test_open_scan(scan):
+    scan, data, positions = scan
+    assert scan.scans == ['Scan000']
+    assert scan.scan_shape == (5,)
+    assert scan.naverage == 3
+    assert scan.keys() == ['Detector000/Data1D/CH00/Data00']
+    array = scan['spectro']
+    assert array is scan['Detector000/Data1D/CH00/Data00']
+    assert array.shape == (3, 5, 16)
+    assert array.dims == ['Average', 'delay', 'Wavelength']
+    assert np.allclose(array.axis('delay'), np.linspace(0, 4, 5))
+    assert np.allclose(array.axis('measured_delay'), positions)
+    assert array.axis_dims('measured_delay') == (0, 1)
+    assert np.allclose(scan.measured['measured_delay'][1], positions[1])
+    assert np.array_equal(np.asarray(array), data)
+    with pytest.raises(KeyError):
+        scan['unknown']
+
+
+def test_slicing(scan):
+    scan, data, _ = scan
+    array = scan['spectro']
+    cases = [((0, 1, 2), data[0, 1, 2]), ((slice(None), 2), data[:, 2]), ((Ellipsis, 3), data[..., 3]),
+             ((slice(None), slice(None, None, -2)), data[:, ::-2]), (([2, 0], 1), data[[2, 0], 1]),
+             ((slice(None), [4, 1, 3], slice(2, 10, 3)), data[:, [4, 1, 3], 2:10:3]),
+             ((-1, np.array([True, False, True, False, True])), data[-1, [0, 2, 4]]),
+             (([0, 2], [1, 3]), data[[0, 2]][:, [1, 3]])]  # orthogonal indexing
+    for key, expected in cases:
+        assert np.array_equal(array[key], expected)
+    assert array[:, 5:5].shape == (3, 0, 16)
+    with pytest.raises(IndexError):
+        array[3]
+    with pytest.raises(IndexError):
+        array[0, 0, 0, 0]
+
+
+def test_selection(scan):
+    scan, data, _ = scan
+    array = scan['spectro']
+    assert np.array_equal(array.sel(Wavelength=500.), data[..., 5])
+    assert np.array_equal(array.sel(delay=slice(1, 3), Average=2), data[2, 1:4])
+    assert np.array_equal(array.sel(delay=[3.9, 0.1]), data[:, [4, 0]])
+    assert np.array_equal(array.isel(Average=1, Wavelength=3), data[1, :, 3])
+    with pytest.raises(ValueError):
+        array.sel(measured_delay=1.)
+
+
+def test_cache(scan):
+    scan, data, _ = scan
+    array = scan['spectro']
+    trace = array.sel(Wavelength=500.)
+    assert scan.cache.misses == 1
+    assert np.array_equal(array.sel(Wavelength=500.), trace)
+    assert scan.cache.hits == 1
+    with pytest.raises(ValueError):
+        array.sel(Wavelength=500.)[0, 0] = 0  # cached arrays are shared
+
+
+def test_read_cache_eviction():
+    cache = ReadCache(max_bytes=4 * 80)
+    for ind in range(5):
+        cache.put(ind, np.zeros(10))
+    assert len(cache) == 4 and cache.get(0) is None
+    cache.get(1)
+    cache.put(5, np.zeros(10))
+    assert cache.get(1) is not None and cache.get(2) is None
+    cache.put('big', np.zeros(11))
+    assert cache.get('big') is None
+
+
+def test_normalize_key():
+    hyperslab, post = _normalize_key((1, [3, 0]), (4, 5, 6))
+    assert hyperslab == (1, slice(0, 4, 1), slice(0, 6, 1))
+    assert len(post) == 1 and post[0][0] == 0 and list(post[0][1]) == [3, 0]
+
+
+@pytest.mark.parametrize('export', [False, True])
+def test_running_statistics_scan(tmp_path, export):
+    """Running statistics with the raw sweeps of one average out of 3 saved: 6 averages, 2 raw sweeps"""
+    path = tmp_path.joinpath('scan.h5')
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'w')
+    scan = h5backend.get_set_group(h5backend.get_set_group(h5backend.root(), 'RawData'), 'Scan000')
+    nav = h5backend.get_set_group(scan, 'NavAxes')
+    _add_array(h5backend, nav, 'Axis00', np.linspace(0, 4, 5), title='delay', data_type='axis', label='delay',
+               index=1)
+    _add_array(h5backend, nav, 'Axis01', np.array([0., 3.]), title='Average', data_type='axis', label='Average',
+               index=0)
+    measured = h5backend.get_set_group(scan, 'MeasuredPositions')
+    positions = np.linspace(0, 4, 5) + np.random.normal(0, 0.01, (6, 5))
+    _add_array(h5backend, measured, 'Measured00', positions, title='measured_delay', data_type='data',
+               label='measured_delay')
+    channel = h5backend.get_set_group(h5backend.get_set_group(h5backend.get_set_group(scan, 'Detector000'),
+                                                              'Data1D'), 'CH00')
+    _add_array(h5backend, channel, 'Data00', np.zeros((2, 5, 16)), title='spectro', data_type='data',
+               data_dimension='Data1D')
+    statistics = h5backend.get_set_group(h5backend.get_set_group(scan, 'RunningStatistics'), 'Channel000')
+    _add_array(h5backend, statistics, 'Mean', np.zeros((5, 16)), title='spectro/mean', data_type='data',
+               data_dimension='Data1D')
+    h5backend.close_file()
+    if export:
+        path = tmp_path.joinpath('export', 'scan.json')
+        export_file(tmp_path.joinpath('scan.h5'), path)
+
+    with open_scan(path) as scan:
+        assert scan.naverage == 2
+        raw = scan['spectro']
+        assert raw.dims[0] == 'Average'
+        assert np.allclose(raw.axis('measured_delay'), positions[[0, 3]])
+        assert np.allclose(scan['spectro/mean'].axis('measured_delay'), positions.mean(axis=0))
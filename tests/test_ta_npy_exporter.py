@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tables')
+
+from pymodaq.utils.h5modules.backends import H5Backend
+
+from pymodaq_plugins_mydaqscan.exporters.ta_npy import export_file, stream_to_npy
+
+
+def _add_array(h5backend, group, name, array, **attrs):
+    node = h5backend.create_carray(group, name, obj=array, title=attrs.pop('title', name))
+    for key, value in attrs.items():
+        node.attrs[key] = value
+    return node
+
+
+@pytest.fixture
+def scan_file(tmp_path):
+    """Minimal tree of a scan with 2 averages of 5 delays and a 1D detector of 16 pixels"""
+    path = tmp_path.joinpath('scan.h5')
+    h5backend = H5Backend()
+    h5backend.open_file(str(path), 'w')
+    scan = h5backend.get_set_group(h5backend.get_set_group(h5backend.root(), 'RawData'), 'Scan000')
+    scan.attrs['type'] = 'scan'
+    nav = h5backend.get_set_group(scan, 'NavAxes')
+    _add_array(h5backend, nav, 'Axis00', np.linspace(0, 4, 5), data_type='axis', label='delay', index=1)
+    measured = h5backend.get_set_group(scan, 'MeasuredPositions')
+    _add_array(h5backend, measured, 'Measured00', np.random.random((2, 5)), data_type='data',
+               label='measured_delay')
+    channel = h5backend.get_set_group(h5backend.get_set_group(h5backend.get_set_group(scan, 'Detector000'),
+                                                              'Data1D'), 'CH00')
+    data = np.arange(2 * 5 * 16, dtype=float).reshape((2, 5, 16))
+    _add_array(h5backend, channel, 'Data00', data, data_type='data', data_dimension='Data1D')
+    _add_array(h5backend, channel, 'Axis00', np.linspace(400, 700, 16), data_type='axis', label='Wavelength',
+               index=2)
+    h5backend.close_file()
+    return path, data
+
+
+def test_export_file(scan_file, tmp_path):
+    path, data = scan_file
+    index = export_file(path, tmp_path.joinpath('export', 'scan.json'), '/RawData/Scan000', block_bytes=256)
+    with open(tmp_path.joinpath('export', 'scan.json')) as f:
+        assert json.load(f) == index
+    assert index['attrs']['type'] == 'scan'
+    assert [axis['attrs']['label'] for axis in index['nav_axes']] == ['delay']
+    assert [axis['attrs']['label'] for axis in index['measured_axes']] == ['measured_delay']
+    assert len(index['datasets']) == 1
+    dataset = index['datasets'][0]
+    assert dataset['shape'] == [2, 5, 16]
+    assert [axis['attrs']['label'] for axis in dataset['axes']] == ['Wavelength']
+    exported = np.load(tmp_path.joinpath('export', dataset['file']), mmap_mode='r')
+    assert isinstance(exported, np.memmap)
+    assert np.array_equal(exported, data)
+
+
+def test_stream_to_npy(tmp_path):
+    array = np.random.random((7, 3, 2))
+    stream_to_npy(array, tmp_path.joinpath('array.npy'), block_bytes=100)
+    assert np.array_equal(np.load(tmp_path.joinpath('array.npy')), array)
+    stream_to_npy(np.array(3.), tmp_path.joinpath('scalar.npy'))
+    assert np.load(tmp_path.joinpath('scalar.npy')) == 3.